@@ -0,0 +1,304 @@
+"""
+Measure request latency, throughput and memory of the publishing service.
+
+Drives the real ASGI app in-process (through `httpx.ASGITransport`, with
+the mock authenticator used by the tests and an in-memory database), so
+results reflect the service itself, not the network or a server.
+
+Each scenario reports the median and 99th percentile latency, requests per
+second, and the peak memory allocated while serving a few more requests
+(measured separately, since tracing allocations slows everything down).
+
+Usage:
+    python benchmarks/load.py [--requests N] [--concurrency N] [--scenario NAME ...]
+                              [--save baseline.json] [--compare baseline.json]
+                              [--threshold 0.25]
+
+With `--compare`, exits with an error if any scenario is slower (or uses more
+memory) than the baseline by more than `--threshold` (a fraction).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+from httpx import ASGITransport, AsyncClient, Response
+from traitlets.config import Config
+
+# Use the mocks the tests use.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jupyter_publishing_service.app import JupyterPublishingService  # noqa: E402
+from jupyter_publishing_service.models.rest import SharedFileRequestModel  # noqa: E402
+from jupyter_publishing_service.models.sql import (  # noqa: E402
+    Collaborator,
+    CollaboratorRole,
+    SharedFileMetadata,
+)
+from tests.mock import (  # noqa: E402
+    MockNoOpAuthenticator,
+    MockNoOpAuthorizer,
+    mock_notebook,
+    mock_shared_notebook_content,
+)
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+AUTHOR = "author@example.com"
+READER = "reader@example.com"
+# Requests served while tracing memory allocations.
+MEMORY_REQUESTS = 5
+
+Send = Callable[[int], Awaitable[Response]]
+
+
+def headers(user: str = AUTHOR) -> dict:
+    return {"Authorization": f"Bearer {user}"}
+
+
+def notebook(size: int) -> dict:
+    """A notebook with about `size` bytes of code, in 1 KiB cells."""
+    cells = [
+        {
+            "id": uuid.uuid4().hex[:8],
+            "cell_type": "code",
+            "source": "x = 1  # " + "." * 1014,
+            "metadata": {},
+            "outputs": [],
+            "execution_count": None,
+        }
+        for _ in range(max(1, size // 1024))
+    ]
+    return mock_notebook(cells)
+
+
+def share_request(collaborators: int = 0, size: int = 0) -> str:
+    metadata, contents = mock_shared_notebook_content(
+        author=AUTHOR, content=notebook(size) if size else None
+    )
+    names = [AUTHOR] + [f"user{i}@example.com" for i in range(collaborators)]
+    return SharedFileRequestModel(
+        metadata=metadata,
+        collaborators=[Collaborator(name=name) for name in names],
+        roles=[{"name": "READER"}],
+        contents=contents,
+    ).model_dump_json()
+
+
+async def publish(client: AsyncClient, collaborators: int = 0, size: int = 0) -> str:
+    resp = await client.post("/sharing", content=share_request(collaborators, size))
+    resp.raise_for_status()
+    return resp.json()["metadata"]["id"]
+
+
+def publish_scenario(collaborators: int, size: int = 0):
+    async def setup(service, client: AsyncClient, n: int) -> Send:
+        requests = [share_request(collaborators, size) for _ in range(n)]
+        return lambda i: client.post("/sharing", content=requests[i])
+
+    return setup
+
+
+def update_scenario(size: int):
+    async def setup(service, client: AsyncClient, n: int) -> Send:
+        metadata, contents = mock_shared_notebook_content(author=AUTHOR, content=notebook(size))
+        request = SharedFileRequestModel(
+            metadata=metadata, collaborators=[Collaborator(name=AUTHOR)], contents=contents
+        )
+        (await client.post("/sharing", content=request.model_dump_json())).raise_for_status()
+        request.collaborators = None
+        requests = []
+        for i in range(n):
+            # Edit one cell, as a user saving their work would.
+            contents.content["cells"][i % len(contents.content["cells"])]["source"] = f"x = {i}"
+            requests.append(request.model_dump_json())
+        return lambda i: client.patch(
+            f"/sharing/{metadata.id}", content=requests[i], headers=headers()
+        )
+
+    return setup
+
+
+def list_scenario(shares: int):
+    async def setup(service, client: AsyncClient, n: int) -> Send:
+        storage_manager = service.storage_manager
+        async with storage_manager.get_session() as session:
+            session.add(Collaborator(name=READER))
+            for i in range(shares):
+                file_id = str(uuid.uuid4())
+                session.add(SharedFileMetadata(id=file_id, author=AUTHOR, name=f"{i}.ipynb"))
+                session.add(CollaboratorRole(name=READER, file=file_id, role="READER"))
+            await session.commit()
+        return lambda i: client.get("/sharing", headers=headers(READER))
+
+    return setup
+
+
+def get_scenario(size: int, contents: bool):
+    async def setup(service, client: AsyncClient, n: int) -> Send:
+        file_id = await publish(client, size=size)
+        params = {"contents": contents}
+        return lambda i: client.get(f"/sharing/{file_id}", params=params, headers=headers())
+
+    return setup
+
+
+def search_scenario(users: int):
+    async def setup(service, client: AsyncClient, n: int) -> Send:
+        names = [Collaborator(name=f"user{i:05d}@example.com") for i in range(users)]
+        async with service.storage_manager.get_session() as session:
+            session.add_all(names)
+            await session.commit()
+        await service.storage_manager.user_store.add_users(names)
+        return lambda i: client.get(
+            "/sharing/users", params={"substring": f"user{i % 100:02d}"}, headers=headers()
+        )
+
+    return setup
+
+
+async def delete_scenario(service, client: AsyncClient, n: int) -> Send:
+    file_ids = [await publish(client, collaborators=2) for _ in range(n)]
+    return lambda i: client.delete(f"/sharing/{file_ids[i]}", headers=headers())
+
+
+KIB = 1024
+MIB = 1024 * KIB
+
+# Scenarios by name: (setup, the most requests to run).
+SCENARIOS = {
+    "publish, 1 collaborator": (publish_scenario(1), None),
+    "publish, 10 collaborators": (publish_scenario(10), None),
+    "publish, 50 collaborators": (publish_scenario(50), 50),
+    "publish, 1 MiB": (publish_scenario(1, MIB), 50),
+    "update, 1 MiB": (update_scenario(MIB), 50),
+    "list, 10 shares": (list_scenario(10), None),
+    "list, 1k shares": (list_scenario(1000), 50),
+    "list, 10k shares": (list_scenario(10000), 10),
+    "get, 10 KiB": (get_scenario(10 * KIB, contents=False), None),
+    "get with contents, 10 KiB": (get_scenario(10 * KIB, contents=True), None),
+    "get with contents, 1 MiB": (get_scenario(MIB, contents=True), 50),
+    "get with contents, 8 MiB": (get_scenario(8 * MIB, contents=True), 10),
+    "search users, 10k users": (search_scenario(10000), None),
+    "delete": (delete_scenario, None),
+}
+
+
+def create_service() -> JupyterPublishingService:
+    service = JupyterPublishingService(
+        authenticator_class=MockNoOpAuthenticator,
+        # Don't time the logging of slow queries.
+        log_level="ERROR",
+        config=Config(
+            {
+                "SQLStorageManager": {
+                    "database_path": "sqlite+aiosqlite://",
+                    "authorization_store_class": MockNoOpAuthorizer,
+                    # Logging every statement would dominate the timings.
+                    "echo": False,
+                }
+            }
+        ),
+    )
+    service.initialize()
+    return service
+
+
+def percentile(values: List[float], q: float) -> float:
+    return (
+        statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+        if len(values) > 1
+        else values[0]
+    )
+
+
+async def run_scenario(setup, requests: int, concurrency: int) -> Dict[str, float]:
+    service = create_service()
+    await service.storage_manager.start()
+    transport = ASGITransport(app=service.app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        send = await setup(service, client, requests + MEMORY_REQUESTS)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def timed(i: int):
+            async with semaphore:
+                start = time.perf_counter()
+                resp = await send(i)
+                latencies.append(time.perf_counter() - start)
+            resp.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(timed(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        for i in range(requests, requests + MEMORY_REQUESTS):
+            (await send(i)).raise_for_status()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    await service.storage_manager.stop()
+    return {
+        "requests": requests,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "rps": round(requests / elapsed, 1),
+        "peak_memory_kib": round(peak / KIB),
+    }
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Describe how each scenario got worse than its baseline by more than `threshold`."""
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ("p50_ms", "p99_ms", "peak_memory_kib"):
+            if result[key] > base[key] * (1 + threshold):
+                found.append(f"{name}: {key} {base[key]} -> {result[key]}")
+        if result["rps"] < base["rps"] / (1 + threshold):
+            found.append(f"{name}: rps {base['rps']} -> {result['rps']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight.")
+    parser.add_argument(
+        "--scenario", action="append", help="Only run scenarios whose names contain this."
+    )
+    parser.add_argument("--save", type=Path, nargs="?", const=DEFAULT_BASELINE)
+    parser.add_argument("--compare", type=Path, nargs="?", const=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'scenario':<28} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9} {'peak KiB':>9}")
+    for name, (setup, max_requests) in SCENARIOS.items():
+        if args.scenario and not any(s in name for s in args.scenario):
+            continue
+        requests = min(args.requests, max_requests or args.requests)
+        result = results[name] = asyncio.run(run_scenario(setup, requests, args.concurrency))
+        print(
+            f"{name:<28} {result['p50_ms']:>9} {result['p99_ms']:>9} "
+            f"{result['rps']:>9} {result['peak_memory_kib']:>9}"
+        )
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2) + "\n")
+    if args.compare:
+        found = regressions(results, json.loads(args.compare.read_text()), args.threshold)
+        if found:
+            print("\nRegressions:\n" + "\n".join(found))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Measure how long the publishing service takes to start.
+
+Runs each step in a fresh interpreter, so imports are not cached:
+
+* import: importing `jupyter_publishing_service.app`.
+* cold setup: initializing the service and setting up an empty database.
+* warm setup: the same, against the database set up by the cold run.
+
+Usage: python benchmarks/startup.py [--repeat N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+IMPORT = """
+import time
+start = time.perf_counter()
+import jupyter_publishing_service.app
+print(time.perf_counter() - start)
+"""
+
+SETUP = """
+import asyncio, sys, time
+start = time.perf_counter()
+from jupyter_publishing_service.app import JupyterPublishingService
+service = JupyterPublishingService()
+service.initialize([f"--SQLStorageManager.database_path=sqlite+aiosqlite:///{sys.argv[1]}"])
+asyncio.run(service._setup_storage())
+print(time.perf_counter() - start)
+"""
+
+
+def run(code: str, *args: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", code, *args], check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    repeat = parser.parse_args().repeat
+
+    timings = {"import": [], "cold setup": [], "warm setup": []}
+    for _ in range(repeat):
+        timings["import"].append(run(IMPORT))
+        with tempfile.TemporaryDirectory() as tmp:
+            database = str(Path(tmp) / "database.db")
+            timings["cold setup"].append(run(SETUP, database))
+            timings["warm setup"].append(run(SETUP, database))
+
+    for name, values in timings.items():
+        print(f"{name:>12}: {statistics.median(values) * 1000:8.1f} ms (median of {repeat})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compare the JSON and MessagePack wire formats of the publishing service.
+
+For a few representative notebooks, reports the size of a file response
+(`GET /sharing/{file_id}?contents=1`) in each format, and the time it
+takes to encode it (as the service does) and to decode it back into a
+model (as `SimpleAsyncClient` does).
+
+Usage: python benchmarks/wire.py [--repeat N]
+
+Requires `msgpack` (`pip install jupyter_publishing_service[msgpack]`).
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+import msgpack
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jupyter_publishing_service.models.rest import SharedFileResponseModel  # noqa: E402
+from jupyter_publishing_service.serialization import (  # noqa: E402
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    encode,
+)
+from tests.mock import mock_notebook, mock_shared_notebook_content  # noqa: E402
+
+DECODERS: Dict[str, Callable[[bytes], object]] = {
+    JSON_MEDIA_TYPE: json.loads,
+    MSGPACK_MEDIA_TYPE: msgpack.unpackb,
+}
+
+
+def code_cell(source: str, outputs=None) -> dict:
+    return {
+        "cell_type": "code",
+        "execution_count": 1,
+        "id": f"{random.getrandbits(64):016x}",
+        "metadata": {},
+        "source": source,
+        "outputs": outputs or [],
+    }
+
+
+def small_notebook() -> dict:
+    return mock_notebook([code_cell("print('hello')")] * 5)
+
+
+def code_notebook(size: int = 1024 * 1024) -> dict:
+    """A notebook of many small cells, with text outputs."""
+    line = "x = [i ** 2 for i in range(100)]  # a line of code\n"
+    cells = []
+    while sum(len(cell["source"]) for cell in cells) < size:
+        output = {"name": "stdout", "output_type": "stream", "text": "0 1 4 9 16\n" * 4}
+        cells.append(code_cell(line * 20, [output]))
+    return mock_notebook(cells)
+
+
+def image_notebook(images: int = 10, size: int = 100 * 1024) -> dict:
+    """A notebook of plots, as base64-encoded PNG outputs."""
+    cells = []
+    for _ in range(images):
+        png = base64.b64encode(os.urandom(size)).decode()
+        output = {
+            "output_type": "display_data",
+            "data": {"image/png": png, "text/plain": "<Figure size 640x480 with 1 Axes>"},
+            "metadata": {},
+        }
+        cells.append(code_cell("plt.plot(x, y)", [output]))
+    return mock_notebook(cells)
+
+
+def timed(function: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    repeat = parser.parse_args().repeat
+
+    notebooks = {
+        "small": small_notebook(),
+        "1 MiB of code": code_notebook(),
+        "1 MiB of images": image_notebook(),
+    }
+    print(f"{'notebook':>16} {'format':>8} {'size':>11} {'encode':>10} {'decode':>10}")
+    for name, notebook in notebooks.items():
+        metadata, contents = mock_shared_notebook_content(content=notebook)
+        response = SharedFileResponseModel(metadata=metadata, contents=contents)
+        for media_type, decoder in DECODERS.items():
+            data = encode(response, media_type)
+            encode_time = timed(lambda: encode(response, media_type), repeat)
+            decode_time = timed(
+                lambda: SharedFileResponseModel.model_validate(decoder(data)), repeat
+            )
+            print(
+                f"{name:>16} {media_type.split('/')[1]:>8} {len(data) / 1024:8.1f} KiB"
+                f" {encode_time * 1000:7.2f} ms {decode_time * 1000:7.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
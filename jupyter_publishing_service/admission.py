@@ -0,0 +1,260 @@
+"""
+Admission control: per-user rate limits, caps on concurrent requests, and
+load shedding, so that one misbehaving client can't slow down everyone.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+
+from .metrics import counter, gauge, histogram
+
+ADMISSION_REJECTIONS = counter(
+    "publishing_admission_rejections",
+    "Requests rejected by admission control, by kind (read, write or subscribe) and reason "
+    "(rate-limited, queue-full, queue-timeout or database-overloaded).",
+    ("kind", "reason"),
+)
+IN_FLIGHT = gauge(
+    "publishing_requests_in_flight",
+    "Requests being handled, by kind (read, write or subscribe).",
+    ("kind",),
+)
+QUEUED = gauge(
+    "publishing_requests_queued",
+    "Requests waiting for a slot to be handled in, by kind (read, write or subscribe).",
+    ("kind",),
+)
+DB_POOL_WAIT = histogram(
+    "publishing_db_pool_wait_seconds", "Time spent waiting for a database connection."
+)
+
+READ = "read"
+WRITE = "write"
+# Change feed requests that wait for changes (streams and long polls).
+SUBSCRIBE = "subscribe"
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+CHANGE_FEED_PATH = "/sharing/changes"
+
+# Health checks and metrics are never rejected, so that an overloaded
+# service isn't restarted (or goes unobserved) because of its load.
+EXEMPT_PATHS = ("/", "/health/live", "/health/ready", "/metrics")
+
+
+def request_kind(method: str) -> str:
+    return READ if method in READ_METHODS else WRITE
+
+
+def admission_kind(scope) -> str:
+    """The kind of a request for admission control. Change feed requests that
+    may be held open for minutes (server-sent event streams, and long polls
+    with `wait`) are subscriptions, capped separately so that they don't
+    take up the slots of short reads.
+    """
+    if scope["method"] != "GET" or scope["path"] != CHANGE_FEED_PATH:
+        return request_kind(scope["method"])
+    headers = dict(scope["headers"])
+    if b"last-event-id" in headers or b"text/event-stream" in headers.get(b"accept", b""):
+        return SUBSCRIBE
+    wait = parse_qs(scope["query_string"].decode("latin-1")).get("wait", ["0"])[-1]
+    try:
+        return SUBSCRIBE if float(wait) > 0 else READ
+    except ValueError:
+        return READ
+
+
+class DecayingAverage:
+    """An exponentially weighted average of observations that also decays
+    (towards 0) with time, so it recovers even when nothing is observed,
+    e.g. while all requests are being shed.
+    """
+
+    def __init__(self, half_life: float = 5, weight: float = 0.2):
+        self.half_life = half_life
+        self.weight = weight
+        self._value = 0.0
+        self._time = time.monotonic()
+
+    def observe(self, value: float):
+        current = self.value()
+        self._value = current + (value - current) * self.weight
+        self._time = time.monotonic()
+
+    def value(self) -> float:
+        elapsed = time.monotonic() - self._time
+        return self._value * 0.5 ** (elapsed / self.half_life)
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, in bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token. Returns 0 if there was one, or else the seconds
+        until there will be one.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class UserRateLimiter:
+    """Token-bucket rate limits per user, for reads and writes separately.
+
+    Buckets of the `max_users` most recently seen users are kept; a user
+    whose bucket was dropped starts again with a full one. A rate of 0
+    disables the limit.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], max_users: int = 10000):
+        self.limits = limits
+        self.max_users = max_users
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def check(self, user: str, method: str) -> float:
+        """Count a request of a user. Returns 0 if it is allowed, or else
+        the seconds after which it would be.
+        """
+        kind = request_kind(method)
+        rate, burst = self.limits.get(kind, (0, 0))
+        if rate <= 0:
+            return 0
+        key = (user, kind)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, max(burst, 1))
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        retry_after = bucket.take()
+        if retry_after:
+            ADMISSION_REJECTIONS.inc(kind=kind, reason="rate-limited")
+        return retry_after
+
+
+class AdmissionGate:
+    """Caps the requests of one kind handled at once (if `limit` is set).
+
+    Up to `max_queue` more wait (at most `queue_timeout` seconds) for a
+    slot. New requests are shed right away when the queue is full, or when
+    waiting for a database connection takes longer than `max_pool_wait`
+    seconds (if set).
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        limit: int = 0,
+        max_queue: int = 0,
+        queue_timeout: float = 5,
+        max_pool_wait: float = 0,
+    ):
+        self.kind = kind
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_pool_wait = max_pool_wait
+        self.in_flight = 0
+        self.waiting = 0
+        # Created on first use, in the event loop serving requests: before
+        # Python 3.10, a semaphore is bound to the loop current when it is created.
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def shed_reason(self, pool_wait: float) -> Optional[str]:
+        if self.max_pool_wait and pool_wait > self.max_pool_wait:
+            return "database-overloaded"
+        if self._slots is not None and self._slots.locked() and self.waiting >= self.max_queue:
+            return "queue-full"
+        return None
+
+    async def acquire(self) -> bool:
+        """Wait for a slot. Returns False if none became free in time."""
+        if self.limit and self._slots is None:
+            self._slots = asyncio.Semaphore(self.limit)
+        if self._slots is not None:
+            self.waiting += 1
+            QUEUED.set(self.waiting, kind=self.kind)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.waiting -= 1
+                QUEUED.set(self.waiting, kind=self.kind)
+        self.in_flight += 1
+        IN_FLIGHT.set(self.in_flight, kind=self.kind)
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        IN_FLIGHT.set(self.in_flight, kind=self.kind)
+        if self._slots is not None:
+            self._slots.release()
+
+
+def overloaded(retry_after: float, detail: str, status_code: int = 503) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionControlMiddleware:
+    """Caps the reads and writes handled at once, and sheds load early.
+
+    Requests that can't be handled soon are answered right away with 503
+    and `Retry-After`, instead of piling up and slowing down everyone:
+    when too many requests of their kind are already waiting, when none
+    finished in time to make room for them, or when the database is
+    overloaded (waiting for a connection takes too long). Writes, which
+    contend for the database the most, are typically shed first, by giving
+    them a lower `max_pool_wait`. Change feed subscriptions have a gate
+    of their own (see `admission_kind`). Health checks and metrics are
+    exempt.
+    """
+
+    def __init__(
+        self,
+        app,
+        gates: Dict[str, AdmissionGate],
+        pool_wait: Callable[[], float] = lambda: 0,
+        retry_after: float = 1,
+    ):
+        self.app = app
+        self.gates = gates
+        self.pool_wait = pool_wait
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+        kind = admission_kind(scope)
+        gate = self.gates.get(kind)
+        if gate is None:
+            return await self.app(scope, receive, send)
+        reason = gate.shed_reason(self.pool_wait())
+        if reason is None and not await gate.acquire():
+            reason = "queue-timeout"
+        if reason is not None:
+            ADMISSION_REJECTIONS.inc(kind=kind, reason=reason)
+            response = overloaded(self.retry_after, "The service is overloaded.")
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
@@ -1,18 +1,44 @@
+import asyncio
+import json
 import os
 import socket
+import tempfile
 
-import uvicorn
 from fastapi import FastAPI
 from fastapi.openapi.utils import get_openapi as _get_openapi
 from jupyter_core.application import JupyterApp
-from traitlets import Instance, Integer, Type, Unicode, default, validate
+from traitlets import (
+    Bool,
+    CaselessStrEnum,
+    Dict,
+    Float,
+    Instance,
+    Integer,
+    Type,
+    Unicode,
+    default,
+    validate,
+)
 
+from jupyter_publishing_service import constants
 from jupyter_publishing_service._version import __version__
+from jupyter_publishing_service.admission import (
+    READ,
+    SUBSCRIBE,
+    WRITE,
+    AdmissionControlMiddleware,
+    AdmissionGate,
+    UserRateLimiter,
+)
 from jupyter_publishing_service.authenticator.abc import AuthenticatorABC
-from jupyter_publishing_service.authenticator.jwt import JWTAuthenticator
+from jupyter_publishing_service.limits import RequestSizeLimitMiddleware
+from jupyter_publishing_service.metrics import MetricsMiddleware
+from jupyter_publishing_service.profiling import ProfilingMiddleware
+from jupyter_publishing_service.queries import QueryAccountingMiddleware
 from jupyter_publishing_service.routes import lifespan, router
+from jupyter_publishing_service.rtc.room import RoomManager
 from jupyter_publishing_service.storage.abc import StorageManagerABC
-from jupyter_publishing_service.storage.sql import SQLStorageManager
+from jupyter_publishing_service.traits import BoolFromEnv, IntFromEnv, UnicodeFromEnv
 
 DEFAULT_JUPYTER_PUBLISHING_PORT = 9000
 
@@ -48,7 +74,8 @@ class JupyterPublishingService(JupyterApp):
 
     @default("authenticator_class")
     def _default_authenticator_class(self):
-        return JWTAuthenticator
+        # Import strings are only imported when used.
+        return "jupyter_publishing_service.authenticator.jwt.JWTAuthenticator"
 
     storage_manager_class = Type(
         kclass="jupyter_publishing_service.storage.abc.StorageManagerABC",
@@ -56,7 +83,7 @@ class JupyterPublishingService(JupyterApp):
 
     @default("storage_manager_class")
     def _default_storage_manager_class(self):
-        return SQLStorageManager
+        return "jupyter_publishing_service.storage.sql.SQLStorageManager"
 
     port = Integer(
         DEFAULT_JUPYTER_PUBLISHING_PORT,
@@ -92,6 +119,192 @@ class JupyterPublishingService(JupyterApp):
             value = ""
         return value
 
+    max_body_size = Integer(
+        64 * 1024 * 1024,
+        config=True,
+        help="The largest request body (in bytes) accepted by any route without its own "
+        "limit in `body_size_limits`. Larger requests are rejected with 413 while "
+        "they are streamed in. Set to 0 to disable.",
+    )
+
+    body_size_limits = Dict(
+        key_trait=Unicode(),
+        value_trait=Integer(),
+        config=True,
+        help="Per-route request body limits (in bytes), keyed by `METHOD /path/pattern` "
+        "(e.g. `PATCH /sharing/*`). The method may be left out, and paths are matched "
+        "with shell-style wildcards. The first matching rule wins.",
+    )
+
+    query_budget = Integer(
+        0,
+        config=True,
+        help="The most SQL queries a request should run. Requests that run more are "
+        "logged with the statements they repeated (e.g. queries run in a loop). "
+        "Set to 0 to disable.",
+    )
+
+    query_budget_strict = Bool(
+        False,
+        config=True,
+        help="Raise an error for requests that exceed `query_budget`, instead of "
+        "logging a warning. Meant for tests and development.",
+    )
+
+    server_timing = Bool(
+        True,
+        config=True,
+        help="Report the number of SQL queries a request ran, and their total time, "
+        "in a `Server-Timing` response header.",
+    )
+
+    profiling_token = UnicodeFromEnv(
+        name=constants.PROFILING_TOKEN,
+        default_value="",
+        help="A secret that operators can send in the `X-Profile-Token` header to "
+        "profile a request with cProfile. "
+        "Profiling is disabled, at no cost, when this is empty.",
+    ).tag(config=True)
+
+    profile_dir = Unicode(config=True, help="The directory where request profiles are saved.")
+
+    @default("profile_dir")
+    def _default_profile_dir(self):
+        return os.path.join(tempfile.gettempdir(), "jupyter-publishing-profiles")
+
+    profiling_interval = Float(
+        60,
+        config=True,
+        help="Profile at most one request every this many seconds.",
+    )
+
+    change_stream_timeout = Float(
+        300,
+        config=True,
+        help="Close change feed streams after this many seconds. Clients reconnect "
+        "with the `Last-Event-ID` they got last, so that no changes are missed.",
+    )
+
+    change_heartbeat_interval = Float(
+        15,
+        config=True,
+        help="Send a comment on idle change feed streams this often (in seconds), so "
+        "that proxies don't close them.",
+    )
+
+    user_rate_limits = Dict(
+        default_value={"read": [0, 0], "write": [0, 0]},
+        config=True,
+        help="Requests per second and burst size allowed per user, for reads (GET, HEAD "
+        "and OPTIONS) and writes, e.g. `{'read': [20, 40], 'write': [5, 10]}`. Users "
+        "over their limit get 429 with `Retry-After`. A rate of 0 disables the limit.",
+    )
+
+    max_concurrent_reads = Integer(
+        100,
+        config=True,
+        help="The most reads handled at once. Set to 0 to disable.",
+    )
+
+    max_concurrent_writes = Integer(
+        16,
+        config=True,
+        help="The most writes handled at once. Set to 0 to disable.",
+    )
+
+    max_change_subscribers = Integer(
+        1000,
+        config=True,
+        help="The most change feed streams and long polls (`GET /sharing/changes` with "
+        "`wait`) open at once. They don't count towards `max_concurrent_reads`. More are "
+        "rejected with 503 and `Retry-After` right away. Set to 0 to disable.",
+    )
+
+    max_queued_requests = Integer(
+        100,
+        config=True,
+        help="The most reads (and, separately, writes) waiting to be handled once "
+        "`max_concurrent_reads` (or `max_concurrent_writes`) are. More are rejected "
+        "with 503 and `Retry-After`.",
+    )
+
+    queue_timeout = Float(
+        5,
+        config=True,
+        help="Reject requests waiting longer than this (in seconds) to be handled with 503.",
+    )
+
+    max_read_pool_wait = Float(
+        2,
+        config=True,
+        help="Reject reads with 503 while waiting for a database connection takes longer "
+        "than this (in seconds, on average). Set to 0 to disable.",
+    )
+
+    max_write_pool_wait = Float(
+        1,
+        config=True,
+        help="Reject writes with 503 while waiting for a database connection takes longer "
+        "than this (in seconds, on average). Lower than `max_read_pool_wait`, so that "
+        "writes are shed first. Set to 0 to disable.",
+    )
+
+    rate_limiter = Instance(UserRateLimiter, allow_none=True)
+
+    workers = IntFromEnv(
+        name=constants.WORKERS,
+        default_value=1,
+        help="The number of worker processes serving requests. Each worker runs its own "
+        "copy of the service; the storage is set up once, before they start.",
+    ).tag(config=True)
+
+    loop = CaselessStrEnum(
+        ["auto", "asyncio", "uvloop"],
+        "auto",
+        config=True,
+        help="The event loop implementation. `auto` uses uvloop when it is installed.",
+    )
+
+    http = CaselessStrEnum(
+        ["auto", "h11", "httptools"],
+        "auto",
+        config=True,
+        help="The HTTP protocol implementation. `auto` uses httptools when it is installed.",
+    )
+
+    keep_alive_timeout = Integer(
+        5, config=True, help="Seconds to keep an idle keep-alive connection open."
+    )
+
+    backlog = Integer(
+        2048, config=True, help="The maximum number of connections waiting to be accepted."
+    )
+
+    graceful_shutdown_timeout = IntFromEnv(
+        name=constants.GRACEFUL_SHUTDOWN_TIMEOUT,
+        default_value=20,
+        help="Seconds to let in-flight requests finish after a shutdown signal. In "
+        "Kubernetes, this should be `terminationGracePeriodSeconds` minus the "
+        "`shutdownDelaySeconds` spent in the preStop hook.",
+    ).tag(config=True)
+
+    metrics_enabled = BoolFromEnv(
+        name=constants.METRICS_ENABLED,
+        default_value=True,
+        help="Record request, storage and cache metrics, and serve them at `/metrics` "
+        "in the Prometheus text format. Each worker process keeps its own metrics.",
+    ).tag(config=True)
+
+    metrics_token = UnicodeFromEnv(
+        name=constants.METRICS_TOKEN,
+        default_value="",
+        help="If set, `/metrics` is only served to requests with this bearer token "
+        "(`Authorization: Bearer <token>`). Otherwise anyone who can reach the service "
+        "can read its metrics.",
+    ).tag(config=True)
+
+    ready = Bool(False, help="Whether the service has started and can serve requests.")
+
     authenticator: AuthenticatorABC = Instance(
         klass="jupyter_publishing_service.authenticator.abc.AuthenticatorABC", allow_none=True
     )
@@ -100,10 +313,24 @@ class JupyterPublishingService(JupyterApp):
         klass="jupyter_publishing_service.storage.abc.StorageManagerABC", allow_none=True
     )
 
+    room_manager: RoomManager = Instance(RoomManager, allow_none=True)
+
     def init_configurables(self):
         self.authenticator = self.authenticator_class(parent=self, log=self.log)
         self.storage_manager = self.storage_manager_class(parent=self, log=self.log)
         self.storage_manager.initialize()
+        self.room_manager = RoomManager(
+            parent=self, log=self.log, storage_manager=self.storage_manager
+        )
+        self.room_manager.initialize()
+        self.rate_limiter = UserRateLimiter(
+            {kind: tuple(limit) for kind, limit in self.user_rate_limits.items()}
+        )
+        # Optional: managers registered as virtual subclasses of
+        # StorageManagerABC don't inherit its no-op.
+        instrument = getattr(self.storage_manager, "instrument", None)
+        if self.metrics_enabled and instrument is not None:
+            instrument()
 
     def init_webapp(self):
         self.app = FastAPI(
@@ -111,18 +338,118 @@ class JupyterPublishingService(JupyterApp):
             description=SUMMARY,
             lifespan=lifespan,
         )
+        self.app.add_middleware(
+            RequestSizeLimitMiddleware,
+            max_body_size=self.max_body_size,
+            limits=self.body_size_limits,
+        )
+        self.app.add_middleware(
+            QueryAccountingMiddleware,
+            budget=self.query_budget,
+            strict=self.query_budget_strict,
+            server_timing=self.server_timing,
+            log=self.log,
+        )
+        if self.profiling_token:
+            self.app.add_middleware(
+                ProfilingMiddleware,
+                token=self.profiling_token,
+                profile_dir=self.profile_dir,
+                interval=self.profiling_interval,
+                log=self.log,
+            )
+        self.app.add_middleware(
+            AdmissionControlMiddleware,
+            gates={
+                READ: AdmissionGate(
+                    READ,
+                    limit=self.max_concurrent_reads,
+                    max_queue=self.max_queued_requests,
+                    queue_timeout=self.queue_timeout,
+                    max_pool_wait=self.max_read_pool_wait,
+                ),
+                WRITE: AdmissionGate(
+                    WRITE,
+                    limit=self.max_concurrent_writes,
+                    max_queue=self.max_queued_requests,
+                    queue_timeout=self.queue_timeout,
+                    max_pool_wait=self.max_write_pool_wait,
+                ),
+                SUBSCRIBE: AdmissionGate(SUBSCRIBE, limit=self.max_change_subscribers),
+            },
+            pool_wait=self._pool_wait,
+        )
+        if self.metrics_enabled:
+            # Added last, so it's outermost and also times rejected requests.
+            self.app.add_middleware(MetricsMiddleware)
         self.app.include_router(router)
         router.app = self
 
+    def _pool_wait(self) -> float:
+        # Optional: managers registered as virtual subclasses of
+        # StorageManagerABC don't inherit its pool_wait.
+        pool_wait = getattr(self.storage_manager, "pool_wait", None)
+        return pool_wait() if pool_wait is not None else 0
+
     def initialize(self, argv=[]):
         super().initialize(argv=argv)
         self.init_configurables()
         self.init_webapp()
 
+    async def _setup_storage(self):
+        # Optional hooks: managers registered as virtual subclasses of
+        # StorageManagerABC don't inherit its no-ops.
+        for hook in ("setup", "stop"):
+            method = getattr(self.storage_manager, hook, None)
+            if method is not None:
+                await method()
+
     def start(self):
+        import uvicorn
+
         super().start()
-        # Make application available from globals
-        uvicorn.run(self.app, host=self.ip, port=self.port)
+        options = dict(
+            host=self.ip,
+            port=self.port,
+            loop=self.loop,
+            http=self.http,
+            timeout_keep_alive=self.keep_alive_timeout,
+            backlog=self.backlog,
+            timeout_graceful_shutdown=self.graceful_shutdown_timeout,
+        )
+        if self.workers <= 1:
+            uvicorn.run(self.app, **options)
+            return
+        # Workers keep caches (group memberships, the collaborator directory,
+        # responses) that a process-local bus can't keep in sync.
+        bus = getattr(self.storage_manager, "invalidation_bus", None)
+        if bus is not None and not getattr(bus, "shared", True):
+            self.log.critical(
+                "Running %d workers requires an invalidation bus shared between processes, "
+                "e.g. SQLStorageManager.invalidation_bus_class = "
+                "'jupyter_publishing_service.invalidation.sql.SQLInvalidationBus'.",
+                self.workers,
+            )
+            self.exit(1)
+        # Set up the storage once, then start workers that each initialize
+        # their own service (from the same command line) and skip it.
+        asyncio.run(self._setup_storage())
+        os.environ[constants.WORKER_ARGV] = json.dumps(self.argv)
+        uvicorn.run(
+            "jupyter_publishing_service.app:create_worker_app",
+            factory=True,
+            workers=self.workers,
+            **options,
+        )
+
+
+def create_worker_app() -> FastAPI:
+    """Create the app in a worker process started by `JupyterPublishingService.start`."""
+    argv = json.loads(os.environ.get(constants.WORKER_ARGV, "[]"))
+    service = JupyterPublishingService.instance()
+    service.initialize(argv)
+    service.storage_manager.setup_on_start = False
+    return service.app
 
 
 main = JupyterPublishingService.launch_instance
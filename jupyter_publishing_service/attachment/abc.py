@@ -0,0 +1,35 @@
+from abc import ABCMeta, abstractmethod
+from typing import List, Optional
+
+from jupyter_publishing_service.models.sql import Attachment
+
+
+class AttachmentStoreABC(metaclass=ABCMeta):
+    @abstractmethod
+    async def get(self, file_id: str, attachment_id: str) -> Optional[Attachment]:
+        """
+        Get a single attachment of the given file
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def list(self, file_id: str, attachment_ids: List[str]) -> List[Attachment]:
+        """
+        Get many attachments of the given file in one request
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def add(self, file_id: str, attachments: List[Attachment]):
+        """
+        Store attachments for the given file. Attachments are
+        content-addressed, so storing an existing one is a no-op.
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def delete(self, file_id: str):
+        """
+        Remove all attachments of the given file
+        """
+        return NotImplemented
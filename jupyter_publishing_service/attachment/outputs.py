@@ -0,0 +1,175 @@
+"""
+Helpers for moving large output bundles out of a notebook's
+contents and back in again.
+
+Each large value in an output's (or a cell attachment's) mimebundle
+is replaced by a reference:
+
+    {"$attachment": "<attachment id>", "size": <size of the value>}
+"""
+import base64
+import binascii
+import hashlib
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from jupyter_publishing_service.models.sql import Attachment
+
+ATTACHMENT_REFERENCE_KEY = "$attachment"
+
+# application/* mimetypes that outputs carry as plain text.
+TEXT_APPLICATION_MIMETYPES = {
+    "application/javascript",
+    "application/ecmascript",
+    "application/x-javascript",
+    "application/x-latex",
+    "application/x-tex",
+    "application/xml",
+    "application/xhtml",
+    "application/x-sh",
+    "application/sql",
+    "application/graphql",
+    "application/x-python",
+    "application/x-yaml",
+    "application/yaml",
+    "application/toml",
+}
+
+
+def _value_to_str(value) -> str:
+    if isinstance(value, list):
+        return "".join(value)
+    return value
+
+
+def is_reference(value) -> bool:
+    return isinstance(value, dict) and ATTACHMENT_REFERENCE_KEY in value
+
+
+def is_base64_mimetype(mimetype: str) -> bool:
+    """nbformat stores binary mimetypes (images, PDFs, ...) as base64
+    encoded strings, and text, JSON, XML and script mimetypes as is.
+    """
+    mimetype = mimetype.split(";")[0].strip().lower()
+    return not (
+        mimetype.startswith("text/")
+        or mimetype == "application/json"
+        or mimetype.endswith(("+json", "+xml"))
+        or mimetype in TEXT_APPLICATION_MIMETYPES
+    )
+
+
+def attachment_to_bytes(attachment: Attachment) -> bytes:
+    data = _value_to_str(attachment.data) or ""
+    if is_base64_mimetype(attachment.mimetype):
+        try:
+            # Some notebooks wrap base64 over lines.
+            return base64.b64decode("".join(data.split()), validate=True)
+        except binascii.Error:
+            # Not base64 after all, e.g. a text mimetype we don't know of.
+            pass
+    return data.encode("utf-8")
+
+
+def _iter_bundles(content: dict) -> Iterator[dict]:
+    """Yield every mimebundle in a notebook that could hold a large value."""
+    for cell in content.get("cells") or []:
+        for output in cell.get("outputs") or []:
+            bundle = output.get("data")
+            if isinstance(bundle, dict):
+                yield bundle
+        for bundle in (cell.get("attachments") or {}).values():
+            if isinstance(bundle, dict):
+                yield bundle
+
+
+def externalize_outputs(
+    file_id: str, content: Optional[dict], threshold: int
+) -> Tuple[Optional[dict], List[Attachment]]:
+    """Replace every mimebundle value larger than `threshold`
+    characters with a reference.
+
+    The notebook is copied where it is modified, so the given
+    `content` is left untouched. Returns the new content and the
+    attachments that need storing.
+    """
+    if not isinstance(content, dict) or threshold <= 0 or not content.get("cells"):
+        return content, []
+    attachments: Dict[str, Attachment] = {}
+    cells = []
+    for cell in content["cells"]:
+        new_cell = None
+        for key in ("outputs", "attachments"):
+            container = cell.get(key)
+            if not container:
+                continue
+            new_container = _externalize_container(file_id, key, container, threshold, attachments)
+            if new_container is not container:
+                new_cell = new_cell or dict(cell)
+                new_cell[key] = new_container
+        cells.append(new_cell or cell)
+    if not attachments:
+        return content, []
+    return dict(content, cells=cells), list(attachments.values())
+
+
+def _externalize_container(file_id, key, container, threshold, attachments):
+    if key == "outputs":
+        items = list(enumerate(container))
+        bundles = [(i, output, output.get("data")) for i, output in items]
+    else:
+        bundles = [(name, bundle, bundle) for name, bundle in container.items()]
+    new_container = None
+    for index, item, bundle in bundles:
+        if not isinstance(bundle, dict):
+            continue
+        new_bundle = _externalize_bundle(file_id, bundle, threshold, attachments)
+        if new_bundle is bundle:
+            continue
+        if new_container is None:
+            new_container = list(container) if key == "outputs" else dict(container)
+        new_container[index] = dict(item, data=new_bundle) if key == "outputs" else new_bundle
+    return container if new_container is None else new_container
+
+
+def _externalize_bundle(file_id, bundle, threshold, attachments):
+    new_bundle = None
+    for mimetype, value in bundle.items():
+        if is_reference(value) or not isinstance(value, (str, list)):
+            continue
+        data = _value_to_str(value)
+        if not isinstance(data, str) or len(data) <= threshold:
+            continue
+        digest = hashlib.sha256(f"{file_id}\0{mimetype}\0".encode("utf-8"))
+        digest.update(data.encode("utf-8"))
+        attachment_id = digest.hexdigest()
+        attachments[attachment_id] = Attachment(
+            id=attachment_id, file=file_id, mimetype=mimetype, size=len(data), data=value
+        )
+        new_bundle = new_bundle or dict(bundle)
+        new_bundle[mimetype] = {ATTACHMENT_REFERENCE_KEY: attachment_id, "size": len(data)}
+    return bundle if new_bundle is None else new_bundle
+
+
+def referenced_attachments(content: Optional[dict]) -> Set[str]:
+    """Collect the IDs of all attachments referenced by a notebook."""
+    if not isinstance(content, dict):
+        return set()
+    return {
+        value[ATTACHMENT_REFERENCE_KEY]
+        for bundle in _iter_bundles(content)
+        for value in bundle.values()
+        if is_reference(value)
+    }
+
+
+def inline_outputs(content: dict, attachments: List[Attachment]) -> dict:
+    """Swap references back for the original values (in place).
+
+    References to attachments that are not given are left as is.
+    """
+    by_id = {attachment.id: attachment for attachment in attachments}
+    for bundle in _iter_bundles(content):
+        for mimetype, value in bundle.items():
+            if is_reference(value) and value[ATTACHMENT_REFERENCE_KEY] in by_id:
+                bundle[mimetype] = by_id[value[ATTACHMENT_REFERENCE_KEY]].data
+    return content
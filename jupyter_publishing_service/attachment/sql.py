@@ -0,0 +1,58 @@
+from typing import List, Optional
+
+from sqlmodel import col, delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from traitlets.config import LoggingConfigurable
+
+from jupyter_publishing_service.models.sql import Attachment
+
+from .abc import AttachmentStoreABC
+
+
+class SQLAttachmentStore(LoggingConfigurable):
+    async def get(self, file_id: str, attachment_id: str) -> Optional[Attachment]:
+        async with self.parent.get_session() as session:
+            stmt = (
+                select(Attachment)
+                .where(Attachment.id == attachment_id)
+                .where(Attachment.file == file_id)
+            )
+            results = await session.exec(stmt)
+            return results.first()
+
+    async def list(self, file_id: str, attachment_ids: List[str]) -> List[Attachment]:
+        if not attachment_ids:
+            return []
+        async with self.parent.get_session() as session:
+            stmt = (
+                select(Attachment)
+                .where(col(Attachment.id).in_(attachment_ids))
+                .where(Attachment.file == file_id)
+            )
+            results = await session.exec(stmt)
+            return results.all()
+
+    async def add(self, file_id: str, attachments: List[Attachment]):
+        if not attachments:
+            return
+        session: AsyncSession
+        async with self.parent.get_session() as session:
+            stmt = select(Attachment.id).where(col(Attachment.id).in_([a.id for a in attachments]))
+            results = await session.exec(stmt)
+            existing = set(results.all())
+            for attachment in attachments:
+                if attachment.id in existing:
+                    continue
+                attachment.file = file_id
+                existing.add(attachment.id)
+                session.add(attachment)
+            await session.commit()
+
+    async def delete(self, file_id: str):
+        session: AsyncSession
+        async with self.parent.get_session() as session:
+            await session.exec(delete(Attachment).where(Attachment.file == file_id))
+            await session.commit()
+
+
+AttachmentStoreABC.register(SQLAttachmentStore)
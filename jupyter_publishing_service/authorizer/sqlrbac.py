@@ -1,5 +1,5 @@
 from fastapi import Depends
-from sqlmodel import select
+from sqlmodel import col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.exceptions import HTTPException
 from traitlets.config import LoggingConfigurable
@@ -8,6 +8,7 @@ from jupyter_publishing_service import constants
 from jupyter_publishing_service.authorizer.abc import AuthorizerABC
 from jupyter_publishing_service.models.sql import (
     CollaboratorRole,
+    GroupRole,
     PermissionRoleLink,
     SharedFileMetadata,
 )
@@ -15,10 +16,15 @@ from jupyter_publishing_service.traits import UnicodeFromEnv
 
 
 class SQLRoleBasedAuthorizer(LoggingConfigurable):
+    """Authorizes users by the roles they have on a file, either
+    directly or through the groups they are a member of.
+    """
+
     async def authorize(self, user, data) -> bool:
         session: AsyncSession
+        name = user.get("name")
+        groups = await self.parent.group_store.get_groups(name)
         async with self.parent.get_session() as session:
-            name = user.get("name")
             required_perms = [perm.name for perm in data["permissions"]]
             file_id = data["file_id"]
             c_stmt = (
@@ -28,6 +34,14 @@ class SQLRoleBasedAuthorizer(LoggingConfigurable):
             )
             results = await session.exec(c_stmt)
             roles = results.all()
+            if groups:
+                g_stmt = (
+                    select(GroupRole.role)
+                    .where(GroupRole.file == file_id)
+                    .where(col(GroupRole.group).in_(groups))
+                )
+                results = await session.exec(g_stmt)
+                roles = [*roles, *results.all()]
             r_stmt = select(PermissionRoleLink.permission_name).where(
                 PermissionRoleLink.role_name.in_(roles)
             )
@@ -36,7 +50,7 @@ class SQLRoleBasedAuthorizer(LoggingConfigurable):
             if all(perms in user_permissions for perms in required_perms):
                 return True
 
-            c_stmt = select(SharedFileMetadata.id).where(CollaboratorRole.id == file_id)
+            c_stmt = select(SharedFileMetadata.id).where(SharedFileMetadata.id == file_id)
             results = await session.exec(c_stmt)
             item_missing = results.one_or_none() is None
             if item_missing:
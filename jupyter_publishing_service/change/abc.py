@@ -0,0 +1,41 @@
+from abc import ABCMeta, abstractmethod
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from jupyter_publishing_service.models.rest import ChangeKind, FileChangeModel
+
+
+class ChangeStoreABC(metaclass=ABCMeta):
+    @abstractmethod
+    async def add(
+        self, file_id: str, kind: ChangeKind, names: Iterable[str], groups: Iterable[str] = ()
+    ) -> int:
+        """
+        Record a change to a file in the feeds of the given collaborators
+        and groups. Returns the change's cursor
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def list(
+        self, name: str, groups: Iterable[str], cursor: int, limit: Optional[int] = None
+    ) -> List[FileChangeModel]:
+        """
+        List the changes after `cursor` in the feed of a collaborator
+        (who is in the given groups), oldest first
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def latest(self) -> int:
+        """
+        The cursor of the latest change (0 if there are none)
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def prune(self, before: datetime):
+        """
+        Remove changes made before the given time
+        """
+        return NotImplemented
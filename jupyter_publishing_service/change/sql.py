@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, delete, func, or_
+from sqlmodel import col, select
+from traitlets.config import LoggingConfigurable
+
+from jupyter_publishing_service.models.rest import ChangeKind, FileChangeModel
+from jupyter_publishing_service.models.sql import FileChange, FileChangeRecipient
+
+from .abc import ChangeStoreABC
+
+
+class SQLChangeStore(LoggingConfigurable):
+    """Stores each change once, with a row for each collaborator
+    or group whose feed it is in.
+    """
+
+    async def add(
+        self, file_id: str, kind: ChangeKind, names: Iterable[str], groups: Iterable[str] = ()
+    ) -> int:
+        recipients = {(name, False) for name in names} | {(group, True) for group in groups}
+        async with self.parent.get_session() as session:
+            change = FileChange(file=file_id, kind=ChangeKind(kind).value)
+            session.add(change)
+            await session.flush()
+            session.add_all(
+                FileChangeRecipient(change=change.id, name=name, group=group)
+                for name, group in recipients
+            )
+            await session.commit()
+            return change.id
+
+    async def list(
+        self, name: str, groups: Iterable[str], cursor: int, limit: Optional[int] = None
+    ) -> List[FileChangeModel]:
+        recipient = and_(
+            FileChangeRecipient.name == name, col(FileChangeRecipient.group).is_(False)
+        )
+        groups = list(groups)
+        if groups:
+            in_groups = and_(
+                col(FileChangeRecipient.name).in_(groups), col(FileChangeRecipient.group).is_(True)
+            )
+            recipient = or_(recipient, in_groups)
+        changes = select(FileChangeRecipient.change).where(recipient)
+        statement = (
+            select(FileChange)
+            .where(FileChange.id > cursor)
+            .where(col(FileChange.id).in_(changes))
+            .order_by(FileChange.id)
+            .limit(limit)
+        )
+        async with self.parent.get_session() as session:
+            results = await session.exec(statement)
+            return [
+                FileChangeModel(
+                    cursor=change.id, file_id=change.file, kind=change.kind, created=change.created
+                )
+                for change in results.all()
+            ]
+
+    async def latest(self) -> int:
+        async with self.parent.get_session() as session:
+            result = await session.exec(select(func.max(FileChange.id)))
+            return result.one() or 0
+
+    async def prune(self, before: datetime):
+        old = select(FileChange.id).where(FileChange.created < before)
+        async with self.parent.get_session() as session:
+            await session.exec(
+                delete(FileChangeRecipient).where(col(FileChangeRecipient.change).in_(old))
+            )
+            await session.exec(delete(FileChange).where(FileChange.created < before))
+            await session.commit()
+
+
+ChangeStoreABC.register(SQLChangeStore)
@@ -1,12 +1,22 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
 from jupyter_publishing_service.models.rest import (
+    FileChangesModel,
+    FileSyncResult,
+    FileVersionModel,
+    GroupModel,
+    OutputsMode,
+    SearchRanking,
     ServiceStatusResponse,
     SharedFileRequestModel,
     SharedFileResponseModel,
 )
-from jupyter_publishing_service.models.sql import Collaborator
+from jupyter_publishing_service.models.sql import (
+    Collaborator,
+    Group,
+    JupyterContentsModel,
+)
 
 
 class ClientABC(ABC):
@@ -20,14 +30,38 @@ class ClientABC(ABC):
 
     @abstractmethod
     async def get_file(
-        self, file_id: str, contents: bool = False, collaborators: bool = False
+        self,
+        file_id: str,
+        contents: bool = False,
+        collaborators: bool = False,
+        outputs: OutputsMode = OutputsMode.inline,
     ) -> SharedFileResponseModel:
         ...
 
+    @abstractmethod
+    async def get_attachment(self, file_id: str, attachment_id: str) -> bytes:
+        ...
+
+    @abstractmethod
+    async def list_versions(self, file_id: str) -> List[FileVersionModel]:
+        ...
+
+    @abstractmethod
+    async def get_version(
+        self, file_id: str, version: int, outputs: OutputsMode = OutputsMode.inline
+    ) -> JupyterContentsModel:
+        ...
+
     @abstractmethod
     async def add_file(self, request: SharedFileRequestModel) -> SharedFileResponseModel:
         ...
 
+    @abstractmethod
+    async def upload_contents(
+        self, file_id: str, contents: JupyterContentsModel, upload_id: Optional[str] = None
+    ) -> SharedFileResponseModel:
+        ...
+
     @abstractmethod
     async def update_file(self, request: SharedFileRequestModel) -> SharedFileResponseModel:
         ...
@@ -37,5 +71,51 @@ class ClientABC(ABC):
         ...
 
     @abstractmethod
-    async def search_users(substring: Optional[str] = None) -> List[Collaborator]:
+    async def search_users(
+        self,
+        substring: Optional[str] = None,
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Collaborator]:
+        ...
+
+    @abstractmethod
+    async def search_groups(
+        self,
+        substring: Optional[str] = None,
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Group]:
+        ...
+
+    @abstractmethod
+    async def get_group(self, name: str) -> GroupModel:
+        ...
+
+    @abstractmethod
+    async def add_group_members(self, name: str, members: List[Collaborator]) -> GroupModel:
+        ...
+
+    @abstractmethod
+    async def get_changes(
+        self, cursor: Optional[int] = None, limit: int = 100, wait: float = 0
+    ) -> FileChangesModel:
+        ...
+
+    @abstractmethod
+    def watch_changes(self, cursor: Optional[int] = None) -> AsyncIterator[FileChangesModel]:
+        ...
+
+    @abstractmethod
+    async def get_cached_file(self, file_id: str) -> Optional[SharedFileResponseModel]:
+        ...
+
+    @abstractmethod
+    def iter_sync_files(self) -> AsyncIterator[FileSyncResult]:
+        ...
+
+    @abstractmethod
+    async def sync_files(self) -> List[FileSyncResult]:
         ...
@@ -0,0 +1,77 @@
+"""
+A local, on-disk copy of shared files, used to sync only what changed.
+"""
+import json
+import re
+import uuid
+from typing import Dict, Optional, Tuple
+
+from anyio import Path
+
+from jupyter_publishing_service.models.rest import SharedFileResponseModel
+from jupyter_publishing_service.models.sql import SharedFileMetadata
+
+INDEX_FILE = "index.json"
+FILE_ID_PATTERN = re.compile(r"^[\w.-]+$")
+
+# What identifies a version of a file: its version number and last modified time.
+Fingerprint = Tuple[Optional[int], Optional[str]]
+
+
+def fingerprint(metadata: SharedFileMetadata) -> Fingerprint:
+    last_modified = metadata.last_modified.isoformat() if metadata.last_modified else None
+    return metadata.version, last_modified
+
+
+class FileCache:
+    """Stores each shared file (with its contents) as `{file_id}.json`,
+    and an index of their fingerprints, so a sync can tell which files
+    changed without reading them.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._index: Optional[Dict[str, Fingerprint]] = None
+
+    def _path(self, file_id: str) -> Path:
+        if not FILE_ID_PATTERN.match(file_id):
+            raise ValueError(f"Invalid file ID: {file_id!r}")
+        return self.root / f"{file_id}.json"
+
+    async def _write(self, path: Path, data: str):
+        # Write next to the file, then swap it in, so readers never see partial files.
+        partial = path.with_name(f"{path.name}.{uuid.uuid4().hex}.partial")
+        await partial.write_text(data)
+        await partial.rename(path)
+
+    async def index(self) -> Dict[str, Fingerprint]:
+        """Get the fingerprints of all cached files."""
+        if self._index is None:
+            path = self.root / INDEX_FILE
+            if await path.exists():
+                data = json.loads(await path.read_text())
+                self._index = {file_id: tuple(value) for file_id, value in data.items()}
+            else:
+                self._index = {}
+        return self._index
+
+    async def save_index(self):
+        await self.root.mkdir(parents=True, exist_ok=True)
+        await self._write(self.root / INDEX_FILE, json.dumps(await self.index()))
+
+    async def get(self, file_id: str) -> Optional[SharedFileResponseModel]:
+        path = self._path(file_id)
+        if not await path.exists():
+            return None
+        return SharedFileResponseModel.model_validate_json(await path.read_text())
+
+    async def put(self, file: SharedFileResponseModel):
+        await self.root.mkdir(parents=True, exist_ok=True)
+        await self._write(self._path(file.metadata.id), file.model_dump_json())
+        (await self.index())[file.metadata.id] = fingerprint(file.metadata)
+
+    async def delete(self, file_id: str):
+        path = self._path(file_id)
+        if await path.exists():
+            await path.unlink()
+        (await self.index()).pop(file_id, None)
@@ -1,26 +1,149 @@
-from typing import List, Optional
+import asyncio
+import hashlib
+import os
+import random
+import time
+from typing import AsyncIterator, Callable, List, Optional
+from urllib.parse import urlparse
 
-from httpx import AsyncClient
-from traitlets import Unicode
+import httpx
+from pydantic import BaseModel
+from traitlets import Any, Bool, CaselessStrEnum, Float, Integer
+from traitlets import List as ListTrait
+from traitlets import Unicode, default, validate
 from traitlets.config import LoggingConfigurable
 
 from jupyter_publishing_service.models.rest import (
+    FileChangesModel,
+    FileSyncResult,
+    FileVersionModel,
+    GroupMembersRequestModel,
+    GroupModel,
+    OutputsMode,
+    SearchRanking,
     ServiceStatusResponse,
     SharedFileRequestModel,
     SharedFileResponseModel,
+    SyncStatus,
+    UploadSessionModel,
+)
+from jupyter_publishing_service.models.sql import (
+    Collaborator,
+    Group,
+    JupyterContentsModel,
 )
-from jupyter_publishing_service.models.sql import Collaborator
 
 from .abc import ClientABC
+from .cache import FileCache, fingerprint
+
+# Requests with these methods can safely be sent again.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+JSON_HEADERS = {"Content-Type": "application/json"}
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# Called after every attempt with the method, path, status code
+# (None if the request failed), elapsed seconds and attempt number.
+LatencyHook = Callable[[str, str, Optional[int], float, int], None]
 
 
 class SimpleAsyncClient(LoggingConfigurable):
-    """Simple Publishing Service Client."""
+    """Simple Publishing Service Client.
+
+    Holds one pooled, keep-alive HTTP client for all calls. Use it
+    as an async context manager, or call `close()` when done.
+    """
 
     service_url = Unicode(default_value="http://localhost:9000").tag(config=True)
     api_token = Unicode(allow_none=True).tag(config=True)
     key_id = Unicode(allow_none=True).tag(config=True)
 
+    upload_chunk_size = Integer(
+        4 * 1024 * 1024, help="The chunk size used for chunked uploads of file contents."
+    ).tag(config=True)
+
+    upload_concurrency = Integer(
+        4, help="The number of chunks uploaded in parallel in a chunked upload."
+    ).tag(config=True)
+
+    max_connections = Integer(100, help="The maximum number of open connections.").tag(config=True)
+
+    max_keepalive_connections = Integer(
+        20, help="The maximum number of idle connections kept open for reuse."
+    ).tag(config=True)
+
+    keepalive_expiry = Float(30.0, help="Seconds an idle connection is kept open.").tag(config=True)
+
+    http2 = Bool(False, help="Use HTTP/2 when the service supports it. Requires `h2`.").tag(
+        config=True
+    )
+
+    timeout = Float(30.0, help="Seconds to wait for a response (or to send a request).").tag(
+        config=True
+    )
+
+    connect_timeout = Float(5.0, help="Seconds to wait for a connection.").tag(config=True)
+
+    max_retries = Integer(
+        3,
+        help="How often idempotent calls are retried after a connection error "
+        "or a 429, 502, 503 or 504 response.",
+    ).tag(config=True)
+
+    retry_backoff = Float(
+        0.5, help="Seconds before the first retry. Doubles with every retry (with jitter)."
+    ).tag(config=True)
+
+    max_retry_backoff = Float(10.0, help="The longest wait between retries, in seconds.").tag(
+        config=True
+    )
+
+    wire_format = CaselessStrEnum(
+        ["json", "msgpack"],
+        default_value="json",
+        help="The format files are sent and received in. MessagePack is smaller and "
+        "faster to parse for large notebooks. Requires `msgpack`.",
+    ).tag(config=True)
+
+    @validate("wire_format")
+    def _validate_wire_format(self, proposal):
+        if proposal.value == "msgpack" and msgpack is None:
+            raise ImportError(
+                "wire_format 'msgpack' requires msgpack: "
+                "pip install jupyter_publishing_service[msgpack]"
+            )
+        return proposal.value
+
+    latency_hooks = ListTrait(
+        help="Callables called after every request attempt with the method, path, "
+        "status code (None if the request failed), elapsed seconds and attempt number."
+    )
+
+    transport = Any(
+        allow_none=True, help="An httpx transport to send requests with, e.g. for testing."
+    )
+
+    sync_cache_dir = Unicode(
+        help="The directory where synced files are kept, to only download files that changed."
+    ).tag(config=True)
+
+    @default("sync_cache_dir")
+    def _default_sync_cache_dir(self):
+        host = urlparse(self.service_url).netloc.replace(":", "_") or "default"
+        return os.path.join(os.path.expanduser("~"), ".cache", "jupyter-publishing", host)
+
+    sync_concurrency = Integer(8, help="The number of files downloaded in parallel by a sync.").tag(
+        config=True
+    )
+
+    _client = Any(allow_none=True)
+    _file_cache = Any(allow_none=True)
+
     @property
     def headers(self) -> dict:
         if self.api_token:
@@ -30,61 +153,363 @@ class SimpleAsyncClient(LoggingConfigurable):
             return headers
         return {}
 
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled HTTP client, created on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.service_url,
+                verify=True,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "SimpleAsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def add_latency_hook(self, hook: LatencyHook):
+        self.latency_hooks = [*self.latency_hooks, hook]
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.isdigit():
+            return min(float(retry_after), self.max_retry_backoff)
+        # "Full jitter": a random wait up to the exponential backoff.
+        return random.uniform(0, min(self.max_retry_backoff, self.retry_backoff * 2**attempt))
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying idempotent ones, and raise for error responses."""
+        headers = dict(self.headers, **kwargs.pop("headers", {}))
+        retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            response = None
+            start = time.monotonic()
+            try:
+                response = await self.client.request(method, path, headers=headers, **kwargs)
+            except httpx.TransportError:
+                if attempt >= retries:
+                    raise
+            finally:
+                elapsed = time.monotonic() - start
+                status = response.status_code if response is not None else None
+                for hook in self.latency_hooks:
+                    hook(method, path, status, elapsed, attempt)
+            if response is not None and (
+                response.status_code not in RETRY_STATUS_CODES or attempt >= retries
+            ):
+                response.raise_for_status()
+                return response
+            await asyncio.sleep(self._backoff(attempt, response))
+            attempt += 1
+
+    @property
+    def _accept_headers(self) -> dict:
+        if self.wire_format == "msgpack":
+            return {"Accept": MSGPACK_MEDIA_TYPE}
+        return {}
+
+    def _encode(self, model: BaseModel) -> dict:
+        """The arguments to send a model as a request body with."""
+        if self.wire_format == "msgpack":
+            return {
+                "content": msgpack.packb(model.model_dump(mode="json")),
+                "headers": {"Content-Type": MSGPACK_MEDIA_TYPE, "Accept": MSGPACK_MEDIA_TYPE},
+            }
+        return {"content": model.model_dump_json(), "headers": JSON_HEADERS}
+
+    def _decode(self, response: httpx.Response):
+        """The body of a response, whichever format the service sent it in."""
+        content_type = response.headers.get("content-type", "")
+        if content_type.split(";", 1)[0].strip() == MSGPACK_MEDIA_TYPE:
+            return msgpack.unpackb(response.content)
+        return response.json()
+
     async def service_status(self) -> ServiceStatusResponse:
-        url = (self.service_url + "/",)
-        async with AsyncClient(verify=True) as client:
-            response = await client.get(url)
-            return ServiceStatusResponse.model_validate(response.json())
+        response = await self._request("GET", "/")
+        return ServiceStatusResponse.model_validate(response.json())
 
     async def list_files(self) -> List[SharedFileResponseModel]:
-        url = (self.service_url + "/sharing",)
-        async with AsyncClient(verify=True) as client:
-            response = await client.get(url, headers=self.headers)
-            data = response.json()
-            return [SharedFileResponseModel.model_validate(item) for item in data]
+        response = await self._request("GET", "/sharing", headers=self._accept_headers)
+        return [SharedFileResponseModel.model_validate(item) for item in self._decode(response)]
+
+    async def get_changes(
+        self, cursor: Optional[int] = None, limit: int = 100, wait: float = 0
+    ) -> FileChangesModel:
+        """Get the changes to files shared with the user after `cursor` (or from
+        now on, if not given), waiting up to `wait` seconds for some.
+        """
+        params = {"limit": limit, "wait": wait}
+        if cursor is not None:
+            params["cursor"] = cursor
+        timeout = httpx.Timeout(self.timeout + wait, connect=self.connect_timeout)
+        response = await self._request("GET", "/sharing/changes", params=params, timeout=timeout)
+        return FileChangesModel.model_validate(response.json())
+
+    async def watch_changes(self, cursor: Optional[int] = None) -> AsyncIterator[FileChangesModel]:
+        """Stream the changes to files shared with the user after `cursor` (or
+        from now on, if not given), as server-sent events.
+
+        Reconnects after connection errors and responses worth retrying (e.g.
+        503 when the service has too many subscribers, waiting as long as
+        their Retry-After asks), and when the service closes the stream,
+        resuming after the last change received.
+        """
+        attempt = 0
+        while True:
+            headers = dict(self.headers, Accept="text/event-stream")
+            if cursor is not None:
+                headers["Last-Event-ID"] = str(cursor)
+            backoff = None
+            try:
+                async with self.client.stream(
+                    "GET", "/sharing/changes", headers=headers
+                ) as response:
+                    if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                        backoff = self._backoff(attempt, response)
+                    else:
+                        response.raise_for_status()
+                        attempt = 0
+                        event, data = None, []
+                        async for line in response.aiter_lines():
+                            if line:
+                                field, _, value = line.partition(":")
+                                value = value[1:] if value.startswith(" ") else value
+                                if field == "event":
+                                    event = value
+                                elif field == "data":
+                                    data.append(value)
+                                continue
+                            # A blank line ends an event.
+                            if event == "changes" and data:
+                                changes = FileChangesModel.model_validate_json("\n".join(data))
+                                cursor = changes.cursor
+                                yield changes
+                            event, data = None, []
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                backoff = self._backoff(attempt, None)
+            if backoff is not None:
+                await asyncio.sleep(backoff)
+                attempt += 1
 
     async def get_file(
-        self, file_id: str, contents: bool = False, collaborators: bool = False
+        self,
+        file_id: str,
+        contents: bool = False,
+        collaborators: bool = False,
+        outputs: OutputsMode = OutputsMode.inline,
     ) -> SharedFileResponseModel:
-        url = (
-            self.service_url
-            + f"/sharing/{file_id}?contents={int(contents)}&collaborators={int(collaborators)}",
+        params = {
+            "contents": int(contents),
+            "collaborators": int(collaborators),
+            "outputs": OutputsMode(outputs).value,
+        }
+        response = await self._request(
+            "GET", f"/sharing/{file_id}", params=params, headers=self._accept_headers
+        )
+        return SharedFileResponseModel.model_validate(self._decode(response))
+
+    async def get_attachment(self, file_id: str, attachment_id: str) -> bytes:
+        response = await self._request("GET", f"/sharing/{file_id}/attachments/{attachment_id}")
+        return response.content
+
+    async def list_versions(self, file_id: str) -> List[FileVersionModel]:
+        response = await self._request("GET", f"/sharing/{file_id}/versions")
+        return [FileVersionModel.model_validate(item) for item in response.json()]
+
+    async def get_version(
+        self, file_id: str, version: int, outputs: OutputsMode = OutputsMode.inline
+    ) -> JupyterContentsModel:
+        params = {"outputs": OutputsMode(outputs).value}
+        response = await self._request(
+            "GET",
+            f"/sharing/{file_id}/versions/{version}",
+            params=params,
+            headers=self._accept_headers,
         )
-        async with AsyncClient(verify=True) as client:
-            response = await client.get(url, headers=self.headers)
-            return SharedFileResponseModel.model_validate(response.json())
+        return JupyterContentsModel.model_validate(self._decode(response))
 
     async def add_file(self, request: SharedFileRequestModel) -> SharedFileResponseModel:
-        url = self.service_url + f"/sharing"
-        async with AsyncClient(verify=True) as client:
-            response = await client.post(url, headers=self.headers, json=request.model_dump())
-            if response.is_client_error:
-                raise Exception()
-            return SharedFileResponseModel.model_validate(response.json())
+        response = await self._request("POST", "/sharing", **self._encode(request))
+        return SharedFileResponseModel.model_validate(self._decode(response))
+
+    async def create_upload(
+        self, size: Optional[int] = None, chunk_size: Optional[int] = None
+    ) -> UploadSessionModel:
+        body = {"size": size, "chunk_size": chunk_size or self.upload_chunk_size}
+        response = await self._request("POST", "/sharing/uploads", json=body)
+        return UploadSessionModel.model_validate(response.json())
+
+    async def get_upload(self, upload_id: str) -> UploadSessionModel:
+        response = await self._request("GET", f"/sharing/uploads/{upload_id}")
+        return UploadSessionModel.model_validate(response.json())
+
+    async def upload_contents(
+        self, file_id: str, contents: JupyterContentsModel, upload_id: Optional[str] = None
+    ) -> SharedFileResponseModel:
+        """Upload a file's contents in chunks, several at a time.
+
+        Pass the `upload_id` of an interrupted upload to resume it;
+        only the chunks the service hasn't received are sent again.
+        """
+        data = contents.model_dump_json().encode("utf-8")
+        if upload_id:
+            upload = await self.get_upload(upload_id)
+        else:
+            upload = await self.create_upload(size=len(data))
+        path = f"/sharing/uploads/{upload.id}"
+        semaphore = asyncio.Semaphore(self.upload_concurrency)
+
+        async def put_chunk(index: int, chunk: bytes, checksum: str):
+            async with semaphore:
+                await self._request(
+                    "PUT",
+                    f"{path}/chunks/{index}",
+                    headers={"X-Checksum-SHA256": checksum},
+                    content=chunk,
+                )
+
+        puts = []
+        for index, start in enumerate(range(0, len(data) or 1, upload.chunk_size)):
+            chunk = data[start : start + upload.chunk_size]
+            checksum = hashlib.sha256(chunk).hexdigest()
+            if upload.chunks.get(index) != checksum:
+                puts.append(put_chunk(index, chunk, checksum))
+        await asyncio.gather(*puts)
+        response = await self._request("POST", f"{path}/commit", json={"file_id": file_id})
+        return SharedFileResponseModel.model_validate(response.json())
 
     async def update_file(self, request: SharedFileRequestModel) -> SharedFileResponseModel:
-        url = (self.service_url + f"/sharing/{request.metadata.id}",)
-        async with AsyncClient(verify=True) as client:
-            response = await client.post(url, headers=self.headers, json=request.model_dump_json())
-            return SharedFileResponseModel.model_validate(response.json())
+        response = await self._request(
+            "PATCH", f"/sharing/{request.metadata.id}", **self._encode(request)
+        )
+        return SharedFileResponseModel.model_validate(self._decode(response))
 
     async def delete_file(self, file_id: str):
-        url = (self.service_url + "/sharing/{file_id}",)
-        async with AsyncClient(verify=True) as client:
-            await client.delete(url, headers=self.headers)
+        await self._request("DELETE", f"/sharing/{file_id}")
+
+    async def search_users(
+        self,
+        substring: Optional[str] = None,
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Collaborator]:
+        params = {"case_sensitive": case_sensitive, "ranking": SearchRanking(ranking).value}
+        if substring:
+            params["substring"] = substring
+        if limit:
+            params["limit"] = limit
+        response = await self._request("GET", "/sharing/users", params=params)
+        return [Collaborator.model_validate(item) for item in response.json()]
 
-    async def search_users(self, substring: Optional[str] = None) -> List[Collaborator]:
-        url = self.service_url + "/sharing/users"
+    async def search_groups(
+        self,
+        substring: Optional[str] = None,
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Group]:
+        params = {"case_sensitive": case_sensitive, "ranking": SearchRanking(ranking).value}
         if substring:
-            url += "?substring={substring}"
-        async with AsyncClient(verify=True) as client:
-            response = await client.get(url, headers=self.headers)
-            print(response)
-            collaborators = []
-            for item in response.json():
-                collab = Collaborator.model_validate(item)
-                collaborators.append(collab)
-            return collaborators
+            params["substring"] = substring
+        if limit:
+            params["limit"] = limit
+        response = await self._request("GET", "/sharing/groups", params=params)
+        return [Group.model_validate(item) for item in response.json()]
+
+    async def get_group(self, name: str) -> GroupModel:
+        response = await self._request("GET", f"/sharing/groups/{name}")
+        return GroupModel.model_validate(response.json())
+
+    async def add_group_members(self, name: str, members: List[Collaborator]) -> GroupModel:
+        body = GroupMembersRequestModel(members=members)
+        response = await self._request(
+            "PUT",
+            f"/sharing/groups/{name}/members",
+            content=body.model_dump_json(),
+            headers=JSON_HEADERS,
+        )
+        return GroupModel.model_validate(response.json())
+
+    @property
+    def file_cache(self) -> FileCache:
+        if self._file_cache is None or str(self._file_cache.root) != self.sync_cache_dir:
+            self._file_cache = FileCache(self.sync_cache_dir)
+        return self._file_cache
+
+    async def get_cached_file(self, file_id: str) -> Optional[SharedFileResponseModel]:
+        """Get a synced file, with its contents, from the local cache."""
+        return await self.file_cache.get(file_id)
+
+    async def iter_sync_files(self) -> AsyncIterator[FileSyncResult]:
+        """Sync the local cache with all files shared with the user,
+        yielding a result for each file as soon as it is synced.
+
+        Only files whose version or last modified time changed are
+        downloaded, `sync_concurrency` at a time.
+        """
+        cache = self.file_cache
+        index = await cache.index()
+        listed = {file.metadata.id: file.metadata for file in await self.list_files()}
+        semaphore = asyncio.Semaphore(self.sync_concurrency)
+
+        async def download(file_id: str, status: SyncStatus) -> FileSyncResult:
+            async with semaphore:
+                try:
+                    file = await self.get_file(file_id, contents=True)
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code != 404:
+                        raise
+                    # Deleted since it was listed.
+                    await cache.delete(file_id)
+                    return FileSyncResult(file_id=file_id, status=SyncStatus.removed)
+                await cache.put(file)
+                return FileSyncResult(file_id=file_id, status=status, metadata=file.metadata)
+
+        tasks = []
+        try:
+            for file_id in set(index) - set(listed):
+                await cache.delete(file_id)
+                yield FileSyncResult(file_id=file_id, status=SyncStatus.removed)
+            changed = []
+            for file_id, metadata in listed.items():
+                if file_id not in index:
+                    changed.append((file_id, SyncStatus.added))
+                elif index[file_id] != fingerprint(metadata):
+                    changed.append((file_id, SyncStatus.updated))
+                else:
+                    yield FileSyncResult(
+                        file_id=file_id, status=SyncStatus.unchanged, metadata=metadata
+                    )
+            tasks = [asyncio.ensure_future(download(*args)) for args in changed]
+            for result in asyncio.as_completed(tasks):
+                yield await result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await cache.save_index()
+
+    async def sync_files(self) -> List[FileSyncResult]:
+        """Sync the local cache with all files shared with the user."""
+        return [result async for result in self.iter_sync_files()]
 
 
 ClientABC.register(SimpleAsyncClient)
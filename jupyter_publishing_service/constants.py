@@ -1,5 +1,12 @@
 SSL_CERT_FILE = "SSL_CERT_FILE"
 JWKS_URI = "JWKS_URI"
 EMAIL_CLAIM_KEY = "EMAIL_CLAIM_KEY"
+WORKERS = "WORKERS"
+GRACEFUL_SHUTDOWN_TIMEOUT = "GRACEFUL_SHUTDOWN_TIMEOUT"
+METRICS_ENABLED = "METRICS_ENABLED"
+METRICS_TOKEN = "METRICS_TOKEN"
+PROFILING_TOKEN = "PROFILING_TOKEN"
+# Used to pass the command line on to worker processes.
+WORKER_ARGV = "JUPYTER_PUBLISHING_WORKER_ARGV"
 
 JUPYTERHUB_SCOPE = "custom:publishing"
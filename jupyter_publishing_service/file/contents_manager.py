@@ -0,0 +1,143 @@
+import base64
+import os
+import re
+from typing import AsyncIterator, Optional
+
+from anyio import open_file, to_thread
+from traitlets import Any, Integer, Type, Unicode, default
+from traitlets.config import LoggingConfigurable
+
+from jupyter_publishing_service.models.sql import JupyterContentsModel
+
+from .abc import FileStoreABC
+
+FILE_ID_PATTERN = re.compile(r"^[\w.-]+$")
+
+
+class ContentsManagerFileStore(LoggingConfigurable):
+    """A file store backed by a jupyter_server contents manager.
+
+    Each file's contents are stored as a single JSON document
+    at `{file_id}.json`. With a large file manager (the default),
+    contents larger than `chunk_size` are saved in chunks, next
+    to the file that is then replaced, and read back in chunks.
+    Other managers save and read each file in one go.
+
+    Requires `jupyter_server`.
+    """
+
+    contents_manager_class = Type(
+        default_value="jupyter_server.services.contents.largefilemanager.AsyncLargeFileManager",
+        klass="jupyter_server.services.contents.manager.AsyncContentsManager",
+        help="The (async) contents manager class used to store files.",
+    ).tag(config=True)
+
+    root_dir = Unicode(help="The directory where files are stored.").tag(config=True)
+
+    @default("root_dir")
+    def _default_root_dir(self):
+        return os.path.join(os.getcwd(), "published")
+
+    chunk_size = Integer(
+        1024 * 1024,
+        help="Contents larger than this many bytes are saved and read in chunks of this size.",
+    ).tag(config=True)
+
+    contents_manager = Any(allow_none=True)
+
+    @default("contents_manager")
+    def _default_contents_manager(self):
+        os.makedirs(self.root_dir, exist_ok=True)
+        return self.contents_manager_class(
+            parent=self, log=self.log, root_dir=self.root_dir, delete_to_trash=False
+        )
+
+    @property
+    def _local(self) -> bool:
+        """Whether files are stored on the local filesystem, under `root_dir`."""
+        from jupyter_server.services.contents.filemanager import AsyncFileContentsManager
+
+        return isinstance(self.contents_manager, AsyncFileContentsManager)
+
+    @property
+    def _saves_chunks(self) -> bool:
+        from jupyter_server.services.contents.largefilemanager import AsyncLargeFileManager
+
+        return isinstance(self.contents_manager, AsyncLargeFileManager)
+
+    def _os_path(self, path: str) -> str:
+        return os.path.join(self.root_dir, path)
+
+    def _path(self, file_id: str, suffix: str = "") -> str:
+        if not FILE_ID_PATTERN.match(file_id):
+            raise ValueError(f"Invalid file ID: {file_id!r}")
+        return f"{file_id}.json{suffix}"
+
+    async def _save_chunks(self, path: str, data: bytes):
+        """Save data larger than `chunk_size`, one chunk at a time."""
+        # Base64 chunks must not split up groups of 3 bytes.
+        chunk_size = max(3, self.chunk_size - self.chunk_size % 3)
+        starts = range(0, len(data), chunk_size)
+        for number, start in enumerate(starts, start=1):
+            chunk = data[start : start + chunk_size]
+            model = {
+                "type": "file",
+                "format": "base64",
+                "content": base64.b64encode(chunk).decode("ascii"),
+                # The first chunk creates the file, the last one is numbered -1.
+                "chunk": -1 if start + chunk_size >= len(data) else number,
+            }
+            await self.contents_manager.save(model, path)
+
+    async def _save(self, file_id: str, file: JupyterContentsModel):
+        file.id = file_id
+        data = file.model_dump_json().encode("utf-8")
+        path = self._path(file_id)
+        cm = self.contents_manager
+        if len(data) <= self.chunk_size or not self._saves_chunks:
+            await cm.save({"type": "file", "format": "text", "content": data.decode()}, path)
+            return
+        # Write the chunks next to the file, then swap it in (atomically),
+        # so readers never see a partially written file, or none.
+        partial = self._path(file_id, ".partial")
+        await self._save_chunks(partial, data)
+        await to_thread.run_sync(os.replace, self._os_path(partial), self._os_path(path))
+
+    async def read_chunks(self, file_id: str) -> AsyncIterator[bytes]:
+        """Stream the stored contents of a file."""
+        path = self._path(file_id)
+        if not self._local:
+            model = await self.contents_manager.get(path, content=True, type="file", format="text")
+            yield model["content"].encode("utf-8")
+            return
+        async with await open_file(self._os_path(path), "rb") as f:
+            while True:
+                data = await f.read(self.chunk_size)
+                if not data:
+                    break
+                yield data
+
+    async def get(self, file_id: str) -> Optional[JupyterContentsModel]:
+        if not await self.contents_manager.file_exists(self._path(file_id)):
+            return None
+        data = bytearray()
+        async for chunk in self.read_chunks(file_id):
+            data += chunk
+        return JupyterContentsModel.model_validate_json(data)
+
+    async def add(self, file_id: str, file: JupyterContentsModel) -> JupyterContentsModel:
+        await self._save(file_id, file)
+        return file
+
+    async def delete(self, file_id: str):
+        path = self._path(file_id)
+        if await self.contents_manager.file_exists(path):
+            await self.contents_manager.delete_file(path)
+
+    async def update(self, file_id: str, file: JupyterContentsModel):
+        await self._save(file_id, file)
+
+
+# Register this class a virtual subclass
+# to pass instance check when used as a traitlet.
+FileStoreABC.register(ContentsManagerFileStore)
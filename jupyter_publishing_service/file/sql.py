@@ -2,7 +2,7 @@ from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from traitlets.config import LoggingConfigurable
 
-from jupyter_publishing_service.models.sql import JupyterContentsModel
+from jupyter_publishing_service.models.sql import JupyterContentsModel, apply_validated
 
 from .abc import FileStoreABC
 
@@ -11,12 +11,8 @@ async def create_or_update_jupyter_contents(session, file_id: str, file: Jupyter
     current_model = await session.get(JupyterContentsModel, file_id)
     if current_model is None:
         current_model = file
-    data = file.model_dump(exclude_unset=True)
-    for key, val in data.items():
-        setattr(current_model, key, val)
-    session.add(current_model)
+    session.add(apply_validated(current_model, file))
     await session.commit()
-    await session.refresh(current_model)
 
 
 class SQLFileStore(LoggingConfigurable):
@@ -0,0 +1,103 @@
+from abc import ABCMeta, abstractmethod
+from typing import FrozenSet, Iterable, List, Optional
+
+from jupyter_publishing_service.models.rest import SearchRanking
+from jupyter_publishing_service.models.sql import Group, GroupRole, Role
+
+
+class GroupStoreABC(metaclass=ABCMeta):
+    async def start(self):
+        """
+        Prepare the store, e.g. warm a cache. Called when the service starts,
+        if the store has it (stores registered with `GroupStoreABC.register`
+        don't inherit this no-op).
+        """
+        ...
+
+    @abstractmethod
+    async def get(self, group: str) -> Optional[Group]:
+        """
+        Get a group, or None if it doesn't exist
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def add(self, group: Group) -> Group:
+        """
+        Create a group without members
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def list_members(self, group: str) -> List[str]:
+        """
+        List the names of all members of the group
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def add_members(self, group: str, names: List[str]):
+        """
+        Add collaborators to the group
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def remove_member(self, group: str, name: str):
+        """
+        Remove a collaborator from the group
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def get_groups(self, name: str) -> FrozenSet[str]:
+        """
+        Get the names of all groups the collaborator is a member of
+
+        This is called on every authorization, so it should be cached
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def grant(self, file_id: str, group: str, roles: List[Role]):
+        """
+        Give every member of the group the given roles on the file
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def get_grants(
+        self, file_id: str, groups: Optional[Iterable[str]] = None
+    ) -> List[GroupRole]:
+        """
+        Get the roles granted to groups on the file, optionally
+        only those granted to the given groups
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def delete_grants(self, file_id: str):
+        """
+        Remove all group grants on the file
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def list_files(self, groups: Iterable[str]) -> List[str]:
+        """
+        List all files that any of the given groups has access to
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def search(
+        self,
+        search_string: Optional[str],
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Group]:
+        """
+        Search groups by name
+        """
+        return NotImplemented
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlmodel import col, select
+from traitlets import Any, Float, Instance, Integer
+from traitlets.config import LoggingConfigurable
+
+from jupyter_publishing_service.invalidation.local import GROUPS
+from jupyter_publishing_service.metrics import counter
+from jupyter_publishing_service.models.rest import SearchRanking
+from jupyter_publishing_service.models.sql import (
+    Collaborator,
+    Group,
+    GroupMember,
+    GroupRole,
+    Role,
+)
+from jupyter_publishing_service.user.index import CollaboratorDirectory
+
+from .abc import GroupStoreABC
+
+INDEX_LOOKUPS = counter(
+    "publishing_group_index_lookups",
+    "Lookups served by the group membership index. A miss had to load it first.",
+    ("result",),
+)
+
+# A change to the membership index: (group, member, added?).
+# A member of None records a new (empty) group.
+Change = Tuple[str, Optional[str], bool]
+
+
+class MembershipIndex:
+    """Maps each collaborator to the (interned) names of their groups,
+    and indexes group names for search.
+    """
+
+    def __init__(self, groups: Iterable[str] = (), members: Iterable[Tuple[str, str]] = ()):
+        self.directory = CollaboratorDirectory(groups)
+        memberships: Dict[str, Set[str]] = defaultdict(set)
+        for group, name in members:
+            memberships[name].add(sys.intern(group))
+        self._groups: Dict[str, FrozenSet[str]] = {
+            name: frozenset(groups) for name, groups in memberships.items()
+        }
+
+    def get(self, name: str) -> FrozenSet[str]:
+        return self._groups.get(name, frozenset())
+
+    def apply(self, change: Change):
+        group, name, added = change
+        group = sys.intern(group)
+        self.directory.add(group)
+        if name is None:
+            return
+        groups = self.get(name)
+        groups = groups | {group} if added else groups - {group}
+        if groups:
+            self._groups[name] = groups
+        else:
+            self._groups.pop(name, None)
+
+
+class SQLGroupStore(LoggingConfigurable):
+    """Stores groups, their members and the roles granted to them.
+
+    Sharing a file with a group takes one row per role, however
+    many members the group has. Group memberships are resolved
+    from an in-memory index that is loaded when the service starts,
+    updated as members change (here or, through the invalidation
+    bus, in other service processes), and reloaded in the
+    background every `refresh_interval` seconds.
+    """
+
+    refresh_interval = Integer(
+        600,
+        help="Reload the group membership index from the database in the background "
+        "when it is older than this many seconds. Set to 0 to never reload.",
+    ).tag(config=True)
+
+    _index = Instance(MembershipIndex, allow_none=True)
+    _loaded_at = Float(0)
+    _load_lock = Instance(asyncio.Lock, args=())
+    _refresh_task = Any(allow_none=True)
+    # Changes made while the index is loading, applied to the new index.
+    _pending = Any(allow_none=True)
+
+    async def start(self):
+        self.parent.invalidation_bus.subscribe(GROUPS, self._apply)
+        await self.get_index()
+
+    async def _reload(self):
+        self._pending = []
+        try:
+            async with self.parent.get_session() as session:
+                groups = (await session.exec(select(Group.name))).all()
+                members = (await session.exec(select(GroupMember.group, GroupMember.name))).all()
+            index = MembershipIndex(groups, members)
+            for change in self._pending:
+                index.apply(change)
+        finally:
+            self._pending = None
+        self._index = index
+        self._loaded_at = time.monotonic()
+
+    async def _refresh(self):
+        try:
+            await self._reload()
+        except Exception:
+            self.log.exception("Failed to refresh the group membership index.")
+        finally:
+            self._refresh_task = None
+
+    async def get_index(self) -> MembershipIndex:
+        if self._index is None:
+            INDEX_LOOKUPS.inc(result="miss")
+            async with self._load_lock:
+                if self._index is None:
+                    await self._reload()
+            return self._index
+        INDEX_LOOKUPS.inc(result="hit")
+        expired = time.monotonic() - self._loaded_at > self.refresh_interval
+        if self.refresh_interval > 0 and expired and self._refresh_task is None:
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+        return self._index
+
+    def _changed(self, changes: List[Change]):
+        self.parent.invalidation_bus.publish(GROUPS, [json.dumps(change) for change in changes])
+
+    def _apply(self, keys):
+        changes = [tuple(json.loads(key)) for key in keys]
+        if len({change[:2] for change in changes}) < len(changes):
+            # The same member was added and removed, and changes from other
+            # processes don't say in which order, so reload the index.
+            if self._refresh_task is None:
+                self._refresh_task = asyncio.ensure_future(self._refresh())
+            return
+        if self._pending is not None:
+            self._pending.extend(changes)
+        if self._index is not None:
+            for change in changes:
+                self._index.apply(change)
+
+    async def get(self, group: str) -> Optional[Group]:
+        async with self.parent.get_session() as session:
+            return await session.get(Group, group)
+
+    async def add(self, group: Group) -> Group:
+        async with self.parent.get_session() as session:
+            session.add(group)
+            await session.commit()
+            await session.refresh(group)
+        self._changed([(group.name, None, True)])
+        return group
+
+    async def list_members(self, group: str) -> List[str]:
+        async with self.parent.get_session() as session:
+            statement = (
+                select(GroupMember.name)
+                .where(GroupMember.group == group)
+                .order_by(GroupMember.name)
+            )
+            results = await session.exec(statement)
+            return results.all()
+
+    async def add_members(self, group: str, names: List[str]):
+        names = list(dict.fromkeys(names))
+        async with self.parent.get_session() as session:
+            results = await session.exec(
+                select(Collaborator.name).where(col(Collaborator.name).in_(names))
+            )
+            existing = set(results.all())
+            session.add_all(Collaborator(name=name) for name in names if name not in existing)
+            results = await session.exec(
+                select(GroupMember.name)
+                .where(GroupMember.group == group)
+                .where(col(GroupMember.name).in_(names))
+            )
+            members = set(results.all())
+            session.add_all(
+                GroupMember(group=group, name=name) for name in names if name not in members
+            )
+            await session.commit()
+        self._changed([(group, name, True) for name in names])
+
+    async def remove_member(self, group: str, name: str):
+        async with self.parent.get_session() as session:
+            member = await session.get(GroupMember, (group, name))
+            if member is not None:
+                await session.delete(member)
+                await session.commit()
+        self._changed([(group, name, False)])
+
+    async def get_groups(self, name: str) -> FrozenSet[str]:
+        index = await self.get_index()
+        return index.get(name)
+
+    async def grant(self, file_id: str, group: str, roles: List[Role]):
+        async with self.parent.get_session() as session:
+            statement = (
+                select(GroupRole.role)
+                .where(GroupRole.group == group)
+                .where(GroupRole.file == file_id)
+            )
+            granted = set((await session.exec(statement)).all())
+            session.add_all(
+                GroupRole(group=group, file=file_id, role=role.name)
+                for role in roles
+                if role.name not in granted
+            )
+            await session.commit()
+
+    async def get_grants(
+        self, file_id: str, groups: Optional[Iterable[str]] = None
+    ) -> List[GroupRole]:
+        statement = select(GroupRole).where(GroupRole.file == file_id)
+        if groups is not None:
+            statement = statement.where(col(GroupRole.group).in_(list(groups)))
+        async with self.parent.get_session() as session:
+            results = await session.exec(statement)
+            return results.all()
+
+    async def delete_grants(self, file_id: str):
+        async with self.parent.get_session() as session:
+            results = await session.exec(select(GroupRole).where(GroupRole.file == file_id))
+            for group_role in results:
+                await session.delete(group_role)
+            await session.commit()
+
+    async def list_files(self, groups: Iterable[str]) -> List[str]:
+        groups = list(groups)
+        if not groups:
+            return []
+        async with self.parent.get_session() as session:
+            statement = select(GroupRole.file).where(col(GroupRole.group).in_(groups)).distinct()
+            results = await session.exec(statement)
+            return results.all()
+
+    async def search(
+        self,
+        search_string: Optional[str],
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Group]:
+        index = await self.get_index()
+        names = index.directory.search(
+            search_string or "", limit=limit, case_sensitive=case_sensitive, ranking=ranking
+        )
+        if not names:
+            return []
+        # The index only holds names; load the groups, in ranked order.
+        async with self.parent.get_session() as session:
+            results = await session.exec(select(Group).where(col(Group.name).in_(names)))
+            groups = {group.name: group for group in results.all()}
+        return [groups[name] for name in names if name in groups]
+
+
+GroupStoreABC.register(SQLGroupStore)
@@ -0,0 +1,42 @@
+from abc import ABCMeta, abstractmethod
+from typing import Callable, Iterable, Set
+
+# Called with the keys invalidated in a topic.
+Subscriber = Callable[[Set[str]], None]
+
+
+class InvalidationBusABC(metaclass=ABCMeta):
+    """Tells caches when the data they hold changed, in this process and
+    (depending on the implementation) in other processes of the service.
+
+    Implementations that reach other processes set `shared = True`; the
+    service refuses to start several workers with a bus that sets it to False.
+    """
+
+    async def start(self):
+        """
+        Start delivering changes from other processes, if supported.
+        Optional, like `stop`: only called if the bus has it
+        """
+        ...
+
+    async def stop(self):
+        """
+        Send changes that are still pending, and stop
+        """
+        ...
+
+    @abstractmethod
+    def subscribe(self, topic: str, callback: Subscriber):
+        """
+        Call `callback` with the keys of every change published to a topic
+        """
+        return NotImplemented
+
+    @abstractmethod
+    def publish(self, topic: str, keys: Iterable[str]):
+        """
+        Publish changes to the given keys (e.g. file IDs) of a topic. Subscribers
+        in this process are called right away.
+        """
+        return NotImplemented
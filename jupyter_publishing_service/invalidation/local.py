@@ -0,0 +1,60 @@
+from collections import defaultdict
+from typing import Iterable, Set
+
+from traitlets import Instance
+from traitlets.config import LoggingConfigurable
+
+from jupyter_publishing_service.metrics import counter
+
+from .abc import InvalidationBusABC, Subscriber
+
+INVALIDATIONS = counter(
+    "publishing_invalidations",
+    "Cache invalidations delivered to subscribers, by topic and where they came from.",
+    ("topic", "source"),
+)
+
+# Topics published by the storage manager and its stores.
+FILES = "files"
+USERS = "users"
+GROUPS = "groups"
+# Keyed by the change feeds changed: `user:{name}` or `group:{name}`.
+CHANGES = "changes"
+
+
+class LocalInvalidationBus(LoggingConfigurable):
+    """Delivers changes to the caches of this process only.
+
+    Enough for a single process. With several workers or replicas,
+    use a bus that reaches the other processes, like `SQLInvalidationBus`.
+    """
+
+    # Whether changes reach the other processes of the service.
+    shared = False
+
+    _subscribers = Instance(defaultdict, args=(list,))
+
+    async def start(self):
+        ...
+
+    async def stop(self):
+        ...
+
+    def subscribe(self, topic: str, callback: Subscriber):
+        self._subscribers[topic].append(callback)
+
+    def publish(self, topic: str, keys: Iterable[str]):
+        self._deliver(topic, set(keys), "local")
+
+    def _deliver(self, topic: str, keys: Set[str], source: str):
+        if not keys:
+            return
+        INVALIDATIONS.inc(topic=topic, source=source)
+        for callback in self._subscribers.get(topic, ()):
+            try:
+                callback(keys)
+            except Exception:
+                self.log.exception("Failed to invalidate %s in %s.", topic, callback)
+
+
+InvalidationBusABC.register(LocalInvalidationBus)
@@ -0,0 +1,137 @@
+import asyncio
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Set
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import select
+from traitlets import Any, Float, Instance, Unicode, default
+
+from jupyter_publishing_service.models.sql import InvalidationEvent
+
+from .abc import InvalidationBusABC
+from .local import LocalInvalidationBus
+
+
+class SQLInvalidationBus(LocalInvalidationBus):
+    """Shares changes between processes through a table in the service's database,
+    so it needs no other services.
+
+    Changes are delivered in this process right away. For other processes,
+    they are collected for `flush_interval` seconds, with duplicates coalesced,
+    and written in one batch. Every process polls the table for changes from
+    the others every `poll_interval` seconds, and delivers each topic's
+    changes to its subscribers at once.
+
+    Events are removed after `retention` seconds. With databases where
+    transactions may commit out of ID order (not SQLite), a change can be
+    missed; caches should still expire entries (e.g. `response_cache_ttl`).
+    """
+
+    shared = True
+
+    poll_interval = Float(1, help="Seconds between checks for changes.").tag(config=True)
+
+    flush_interval = Float(
+        0.1, help="Seconds to collect changes before sending them to other processes."
+    ).tag(config=True)
+
+    retention = Float(3600, help="Seconds to keep sent changes in the database.").tag(config=True)
+
+    origin = Unicode(help="A unique ID for this process.")
+
+    @default("origin")
+    def _default_origin(self):
+        return uuid.uuid4().hex
+
+    _outbox = Instance(defaultdict, args=(set,))
+    _last_id = Any(None)
+    _poll_task = Any(None)
+    _flush_task = Any(None)
+
+    async def start(self):
+        async with self.parent.get_session() as session:
+            result = await session.exec(select(func.max(InvalidationEvent.id)))
+            self._last_id = result.one() or 0
+        self._poll_task = asyncio.ensure_future(self._poll_forever())
+
+    async def stop(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def publish(self, topic: str, keys: Iterable[str]):
+        keys = set(keys)
+        super().publish(topic, keys)
+        if not keys:
+            return
+        self._outbox[topic].update(keys)
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception:
+            self.log.exception("Failed to send cache invalidations.")
+
+    async def flush(self):
+        """Send the changes collected so far to other processes."""
+        outbox, self._outbox = self._outbox, defaultdict(set)
+        rows = [
+            dict(origin=self.origin, topic=topic, key=key, created=datetime.now())
+            for topic, keys in outbox.items()
+            for key in keys
+        ]
+        if not rows:
+            return
+        async with self.parent.get_session() as session:
+            await session.exec(insert(InvalidationEvent), params=rows)
+            await session.commit()
+
+    async def poll(self):
+        """Deliver the changes other processes made since the last poll."""
+        async with self.parent.get_session() as session:
+            statement = (
+                select(InvalidationEvent)
+                .where(InvalidationEvent.id > self._last_id)
+                .order_by(InvalidationEvent.id)
+            )
+            events = (await session.exec(statement)).all()
+        changes: Dict[str, Set[str]] = defaultdict(set)
+        for event in events:
+            self._last_id = event.id
+            if event.origin != self.origin:
+                changes[event.topic].add(event.key)
+        for topic, keys in changes.items():
+            self._deliver(topic, keys, "remote")
+
+    async def _remove_old_events(self):
+        expired = datetime.now() - timedelta(seconds=self.retention)
+        async with self.parent.get_session() as session:
+            await session.exec(delete(InvalidationEvent).where(InvalidationEvent.created < expired))
+            await session.commit()
+
+    async def _poll_forever(self):
+        polls = 0
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+                polls += 1
+                # Clean up about once a minute.
+                if polls * self.poll_interval >= 60:
+                    polls = 0
+                    await self._remove_old_events()
+            except Exception:
+                self.log.exception("Failed to receive cache invalidations.")
+
+
+InvalidationBusABC.register(SQLInvalidationBus)
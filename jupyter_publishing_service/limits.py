@@ -0,0 +1,86 @@
+"""
+Request size limits, enforced while the request body is streamed in.
+"""
+from fnmatch import fnmatchcase
+from typing import Dict, List, Tuple
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+from .metrics import counter
+
+LIMIT_BREACHES = counter(
+    "publishing_request_size_limit_breaches",
+    "Requests rejected because they were larger than a configured limit.",
+    ("limit", "rule"),
+)
+
+DEFAULT_RULE = "*"
+
+
+def too_large(limit: int, what: str = "Request body") -> HTTPException:
+    return HTTPException(
+        status_code=413, detail=f"{what} is larger than the limit of {limit} bytes."
+    )
+
+
+def parse_limits(limits: Dict[str, int]) -> List[Tuple[str, str, str, int]]:
+    """Parse rules like `{"PUT /sharing/uploads/*": 1024}` into
+    `(rule, method, path pattern, limit)` tuples. Rules without a
+    method apply to every method.
+    """
+    parsed = []
+    for rule, limit in limits.items():
+        method, _, path = rule.strip().rpartition(" ")
+        parsed.append((rule, method.upper() or "*", path, limit))
+    return parsed
+
+
+class RequestSizeLimitMiddleware:
+    """Rejects requests whose body is larger than the limit of the first
+    rule matching the request (or `max_body_size` if none match) with 413.
+
+    Requests that declare a larger Content-Length are rejected before their
+    body is read. All other bodies are counted as they are streamed into the
+    application, and reading fails as soon as the limit is crossed, so an
+    oversized body is never buffered in full. A limit of 0 disables the check.
+    """
+
+    def __init__(self, app, max_body_size: int = 0, limits: Dict[str, int] = None):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.limits = parse_limits(limits or {})
+
+    def get_limit(self, method: str, path: str) -> Tuple[str, int]:
+        for rule, rule_method, pattern, limit in self.limits:
+            if rule_method in ("*", method) and fnmatchcase(path, pattern):
+                return rule, limit
+        return DEFAULT_RULE, self.max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rule, limit = self.get_limit(scope["method"], scope["path"])
+        if limit <= 0:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                LIMIT_BREACHES.inc(limit="body", rule=rule)
+                error = too_large(limit)
+                response = JSONResponse({"detail": error.detail}, status_code=413)
+                return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    LIMIT_BREACHES.inc(limit="body", rule=rule)
+                    raise too_large(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -4,7 +4,7 @@ from sqlmodel import col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from traitlets.config import LoggingConfigurable
 
-from jupyter_publishing_service.models.sql import SharedFileMetadata
+from jupyter_publishing_service.models.sql import SharedFileMetadata, apply_validated
 
 from .abc import MetadataStoreABC
 
@@ -15,10 +15,7 @@ async def create_or_update_file(
     current_file = await session.get(SharedFileMetadata, metadata.id)
     if current_file is None:
         current_file = metadata
-    data = metadata.model_dump(exclude_unset=True)
-    for key, val in data.items():
-        setattr(current_file, key, val)
-    session.add(current_file)
+    session.add(apply_validated(current_file, metadata))
     await session.commit()
     await session.refresh(current_file)
     return current_file
@@ -0,0 +1,305 @@
+"""
+Lightweight, in-process metrics for the publishing service,
+exposed in the Prometheus text format.
+"""
+import functools
+import inspect
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Tuple
+
+LabelValues = Tuple[str, ...]
+# A sample's name, its labels as (name, value) pairs, and its value.
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+
+# Request and store call latencies, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Request and response sizes, in bytes.
+SIZE_BUCKETS = tuple(4**n for n in range(2, 14))
+
+
+class Metric:
+    """Base class for all metrics. A metric holds one value
+    per unique combination of label values.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> Tuple[Tuple[str, str], ...]:
+        return tuple(zip(self.labelnames, key))
+
+    def samples(self) -> Iterator[Sample]:
+        raise NotImplementedError("Must be implemented in a subclass.")
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        for key, value in list(self._values.items()):
+            yield self.name + "_total", self._labels(key), value
+
+
+class Gauge(Metric):
+    """A value that can go up and down."""
+
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        for key, value in list(self._values.items()):
+            yield self.name, self._labels(key), value
+
+
+class Histogram(Metric):
+    """Counts observed values (e.g. latencies) in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: a count for each bucket (and +Inf), and the sum.
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[i] += 1
+            self._sums[key] = self._sums.get(key, 0) + value
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._label_values(labels), ()))
+
+    def sum(self, **labels) -> float:
+        return self._sums.get(self._label_values(labels), 0)
+
+    def samples(self) -> Iterator[Sample]:
+        for key, counts in list(self._counts.items()):
+            labels = self._labels(key)
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                total += count
+                yield self.name + "_bucket", labels + (("le", _format_value(bound)),), total
+            yield self.name + "_sum", labels, self._sums[key]
+            yield self.name + "_count", labels, total
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[weakref.WeakMethod] = []
+
+    def register(self, metric: Metric) -> Metric:
+        # Return the existing metric, so that modules can
+        # declare the metrics they use at import time.
+        return self._metrics.setdefault(metric.name, metric)
+
+    @property
+    def metrics(self) -> List[Metric]:
+        return list(self._metrics.values())
+
+    def add_collector(self, collect: Callable[[], None]):
+        """Call a (bound) method before each scrape, e.g. to update gauges that are
+        cheaper to read when scraped than to keep up to date. Only a weak reference
+        is kept, so the collector stops being called once its object is gone.
+        """
+        self._collectors.append(weakref.WeakMethod(collect))
+
+    def collect(self):
+        alive = []
+        for ref in self._collectors:
+            collect = ref()
+            if collect is not None:
+                collect()
+                alive.append(ref)
+        self._collectors = alive
+
+    def render(self) -> str:
+        """All metrics, in the Prometheus text exposition format."""
+        self.collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    pairs = ",".join(f'{label}="{_escape(v)}"' for label, v in labels)
+                    name = f"{name}{{{pairs}}}"
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Tuple[str, ...] = (),
+    buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+
+REQUEST_DURATION = histogram(
+    "publishing_http_request_duration_seconds",
+    "Time spent handling HTTP requests, by route and status code.",
+    ("method", "route", "status"),
+)
+REQUEST_SIZE = histogram(
+    "publishing_http_request_size_bytes",
+    "Sizes of HTTP request bodies, by route.",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+RESPONSE_SIZE = histogram(
+    "publishing_http_response_size_bytes",
+    "Sizes of HTTP response bodies, by route.",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+STORE_CALL_DURATION = histogram(
+    "publishing_store_call_duration_seconds",
+    "Time spent in storage calls, by store and method (e.g. metadata_store.get).",
+    ("store", "method"),
+)
+
+# Requests that didn't match a route share one label value, so that
+# scanners probing random paths don't create a series per path.
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Records the latency, status code and body sizes of every HTTP request,
+    labeled by the route pattern that handled it (e.g. `/sharing/{file_id}`).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+        received = sent = 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            method, route = scope["method"], _route(scope)
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start, method=method, route=route, status=status
+            )
+            REQUEST_SIZE.observe(received, method=method, route=route)
+            RESPONSE_SIZE.observe(sent, method=method, route=route)
+
+
+def _timed(method: Callable, store: str, name: str) -> Callable:
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            STORE_CALL_DURATION.observe(time.perf_counter() - start, store=store, method=name)
+
+    return wrapper
+
+
+def time_methods(obj: object, store: str):
+    """Time every public coroutine method of `obj` (e.g. a store), labeled with
+    `store` and the method name. The methods are wrapped on the instance only.
+    """
+    for name, method in inspect.getmembers(obj, inspect.iscoroutinefunction):
+        if not name.startswith("_"):
+            setattr(obj, name, _timed(method, store, name))
@@ -1,13 +1,17 @@
 """
 Pydantic models describing the REST API for this service.
 """
-from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_serializer
 
 from .sql import (
     Collaborator,
     CollaboratorRole,
+    Group,
+    GroupRole,
     JupyterContentsModel,
     Role,
     SharedFileMetadata,
@@ -19,6 +23,30 @@ class ServiceStatusResponse(BaseModel):
     status: str
 
 
+class OutputsMode(str, Enum):
+    """How large outputs are returned with a file's contents.
+
+    * inline: outputs are returned as part of the contents.
+    * reference: large outputs are replaced with references that
+      can be fetched from `/sharing/{file_id}/attachments/{attachment_id}`.
+    """
+
+    inline = "inline"
+    reference = "reference"
+
+
+class SearchRanking(str, Enum):
+    """How user and group search results are matched and ordered.
+
+    * prefix: names starting with the search string, in alphabetical order.
+    * fuzzy: names similar to the search string (by trigram similarity),
+      best match first. Names starting with the search string rank highest.
+    """
+
+    prefix = "prefix"
+    fuzzy = "fuzzy"
+
+
 class SharedFileRequestModel(BaseModel):
     """
     NOTE: There is a slight difference between the
@@ -29,6 +57,7 @@ class SharedFileRequestModel(BaseModel):
 
     metadata: SharedFileMetadata
     collaborators: Optional[List[Collaborator]] = None
+    groups: Optional[List[Group]] = None
     roles: Optional[List[Role]] = None
     contents: Optional[JupyterContentsModel] = None
 
@@ -43,4 +72,102 @@ class SharedFileResponseModel(BaseModel):
 
     metadata: SharedFileMetadata
     collaborator_roles: Optional[List[CollaboratorRole]] = None
+    group_roles: Optional[List[GroupRole]] = None
     contents: Optional[JupyterContentsModel] = None
+
+
+class SyncStatus(str, Enum):
+    """What a sync did with a shared file's local copy."""
+
+    added = "added"
+    updated = "updated"
+    unchanged = "unchanged"
+    removed = "removed"
+
+
+class FileSyncResult(BaseModel):
+    """The outcome of syncing a single shared file."""
+
+    file_id: str
+    status: SyncStatus
+    metadata: Optional[SharedFileMetadata] = None
+
+
+class ChangeKind(str, Enum):
+    """How a shared file changed, for the people it is shared with."""
+
+    created = "created"
+    updated = "updated"
+    # Shared with a collaborator (or group) that didn't have access before.
+    shared = "shared"
+    deleted = "deleted"
+
+
+class FileChangeModel(BaseModel):
+    cursor: int = Field(description="Resume the change feed after this change with this cursor.")
+    file_id: str
+    kind: ChangeKind
+    created: datetime
+
+
+class FileChangesModel(BaseModel):
+    cursor: int = Field(description="The cursor to ask for the changes after these with.")
+    changes: List[FileChangeModel] = []
+
+
+class GroupMembersRequestModel(BaseModel):
+    members: List[Collaborator]
+
+
+class GroupModel(BaseModel):
+    name: str
+    owner: Optional[str] = None
+    members: List[str] = []
+
+
+class FileVersionModel(BaseModel):
+    """A single entry in a shared file's version history."""
+
+    version: int
+    created: datetime
+    size: int
+
+    @field_serializer("created", when_used="always")
+    def serialize_created(self, val: datetime):
+        return val.isoformat()
+
+
+class UploadSessionRequestModel(BaseModel):
+    size: Optional[int] = Field(
+        default=None, description="The total size (in bytes) of the contents to upload."
+    )
+    chunk_size: Optional[int] = Field(
+        default=None, description="The size of every chunk but the last one."
+    )
+
+
+class UploadSessionModel(BaseModel):
+    """A chunked upload of a file's contents.
+
+    The contents are the JSON serialized `JupyterContentsModel`,
+    split into chunks that are PUT (in any order) to
+    `/sharing/uploads/{id}/chunks/{index}`.
+    """
+
+    id: str
+    owner: str
+    size: Optional[int] = None
+    chunk_size: int
+    created: datetime
+    chunks: Dict[int, str] = Field(
+        default_factory=dict,
+        description="The SHA-256 checksum of every chunk received so far, by index.",
+    )
+
+    @field_serializer("created", when_used="always")
+    def serialize_created(self, val: datetime):
+        return val.isoformat()
+
+
+class UploadCommitRequestModel(BaseModel):
+    file_id: str = Field(description="The shared file that the uploaded contents belong to.")
@@ -2,13 +2,22 @@
 SQL models for storing publishing data.
 """
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Union
 
 from pydantic import field_serializer
 from sqlalchemy import JSON, Column, UniqueConstraint
+from sqlalchemy.orm.attributes import set_attribute
 from sqlmodel import Field, Relationship, SQLModel
 
 
+class SchemaVersion(SQLModel, table=True):
+    """Records which version of the schema (and seed data) a database was set up with."""
+
+    id: int = Field(default=1, primary_key=True)
+    version: str
+    updated: datetime = Field(default_factory=datetime.now, nullable=False)
+
+
 class Collaborator(SQLModel, table=True):
     name: str = Field(primary_key=True)
     # display_name: Optional[str]
@@ -42,6 +51,30 @@ class CollaboratorRole(SQLModel, table=True):
     __table_args__ = (UniqueConstraint("name", "file", "role", name="unique_cfr"),)
 
 
+class Group(SQLModel, table=True):
+    """A named set of collaborators that files can be shared with."""
+
+    name: str = Field(primary_key=True)
+    owner: Optional[str] = Field(
+        default=None, description="The collaborator who can change the group's members."
+    )
+
+
+class GroupMember(SQLModel, table=True):
+    group: str = Field(foreign_key="group.name", primary_key=True)
+    name: str = Field(foreign_key="collaborator.name", primary_key=True, index=True)
+
+
+class GroupRole(SQLModel, table=True):
+    """A role granted on a file to every member of a group."""
+
+    id: int = Field(default=None, primary_key=True)
+    group: str = Field(foreign_key="group.name", index=True)
+    file: str = Field(foreign_key="sharedfilemetadata.id", index=True)
+    role: str = Field(foreign_key="role.name")
+    __table_args__ = (UniqueConstraint("group", "file", "role", name="unique_gfr"),)
+
+
 class JupyterContentsModel(SQLModel, table=True):
     class Config:
         validate_assignment = True
@@ -64,6 +97,38 @@ class JupyterContentsModel(SQLModel, table=True):
         return val.isoformat()
 
 
+class Attachment(SQLModel, table=True):
+    """A large output (e.g. a base64 PNG) extracted from a
+    notebook's contents and stored separately.
+    """
+
+    id: str = Field(primary_key=True, description="A content hash of the attachment.")
+    file: str = Field(foreign_key="sharedfilemetadata.id", index=True)
+    mimetype: str
+    size: int
+    # Keep the original JSON value (string or list of strings)
+    # so the output can be inlined back unchanged.
+    data: Optional[Union[str, List[str]]] = Field(default=None, sa_column=Column(JSON))
+
+
+class FileVersion(SQLModel, table=True):
+    """A version of a shared file's contents.
+
+    Keyframes hold the full contents; every other version holds
+    a delta against the nearest earlier keyframe (`base`).
+    """
+
+    id: int = Field(default=None, primary_key=True)
+    file: str = Field(foreign_key="sharedfilemetadata.id", index=True)
+    version: int
+    base: int = Field(description="The keyframe version this version is stored against.")
+    keyframe: bool = False
+    size: int = Field(description="The size of the full contents of this version.")
+    created: datetime = Field(default_factory=datetime.now, nullable=False)
+    data: Optional[Union[dict, list]] = Field(default=None, sa_column=Column(JSON))
+    __table_args__ = (UniqueConstraint("file", "version", name="unique_file_version"),)
+
+
 class SharedFileMetadata(SQLModel, table=True):
     class Config:
         validate_assignment = True
@@ -91,3 +156,47 @@ class SharedFileMetadata(SQLModel, table=True):
     @field_serializer("created", "last_modified", when_used="always")
     def serialize_courses_in_order(self, val: datetime):
         return val.isoformat()
+
+
+class InvalidationEvent(SQLModel, table=True):
+    """A change that other service processes should drop from their caches."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # The process (invalidation bus) that published the change.
+    origin: str
+    topic: str
+    key: str
+    created: datetime = Field(default_factory=datetime.now, nullable=False, index=True)
+
+
+class FileChange(SQLModel, table=True):
+    """A change to a shared file, in the change feed of everyone it is shared with."""
+
+    # The feed's cursor.
+    id: Optional[int] = Field(default=None, primary_key=True)
+    file: str = Field(index=True)
+    kind: str
+    created: datetime = Field(default_factory=datetime.now, nullable=False, index=True)
+
+
+class FileChangeRecipient(SQLModel, table=True):
+    """A collaborator (or group) whose change feed includes a change."""
+
+    change: int = Field(foreign_key="filechange.id", primary_key=True)
+    name: str = Field(primary_key=True, index=True)
+    group: bool = Field(default=False, primary_key=True)
+
+
+def apply_validated(target: SQLModel, source: SQLModel) -> SQLModel:
+    """Copy the fields set on `source` onto the row `target`, as they are.
+
+    Only for values that were already validated, e.g. by FastAPI as part of
+    a request body. Unlike a `setattr` loop over `source.model_dump()`, this
+    neither copies values (like a notebook's contents) nor validates them
+    again (for models with `validate_assignment`).
+    """
+    if target is not source:
+        for name in source.model_fields_set:
+            set_attribute(target, name, getattr(source, name))
+        target.__pydantic_fields_set__.update(source.model_fields_set)
+    return target
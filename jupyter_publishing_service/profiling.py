@@ -0,0 +1,130 @@
+"""
+On-demand profiling of single requests, for operators.
+"""
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import re
+import time
+from datetime import datetime
+from typing import Optional
+
+from anyio import to_thread
+
+from .metrics import counter
+
+PROFILES = counter(
+    "publishing_profiled_requests",
+    "Requests that asked to be profiled, by outcome (profiled or rate-limited).",
+    ("result",),
+)
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """Profiles a request with cProfile when it carries the profiling token
+    in the `X-Profile-Token` header. (Not in the query string, where it would
+    end up in access logs.)
+
+    The profile is saved to `profile_dir` as `{id}.pstats` (for e.g.
+    `python -m pstats` or snakeviz), next to `{id}.txt`, a summary of the
+    `top` functions by cumulative time, in a worker thread so as not to
+    block the event loop. The ID is returned in the `X-Profile-Id`
+    response header.
+
+    Only one request is profiled at a time, and at most one every `interval`
+    seconds; other requests with the token are served without profiling.
+    The profiler sees everything running on the event loop meanwhile, so a
+    profile may include other requests served at the same time.
+    """
+
+    def __init__(
+        self,
+        app,
+        token: str,
+        profile_dir: str,
+        interval: float = 60,
+        top: int = 25,
+        keep: int = 20,
+        log: logging.Logger = logger,
+    ):
+        self.app = app
+        self.token = token.encode()
+        self.profile_dir = profile_dir
+        self.interval = interval
+        self.top = top
+        self.keep = keep
+        self.log = log
+        self._profiling = False
+        self._last_profile = -float("inf")
+
+    def _get_token(self, scope) -> Optional[bytes]:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return value
+        return None
+
+    def _requested(self, scope) -> bool:
+        token = self._get_token(scope)
+        return token is not None and hmac.compare_digest(token, self.token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            return await self.app(scope, receive, send)
+        now = time.monotonic()
+        if self._profiling or now - self._last_profile < self.interval:
+            PROFILES.inc(result="rate-limited")
+            self.log.info("Not profiling %s: profiled too recently.", scope["path"])
+            return await self.app(scope, receive, send)
+        PROFILES.inc(result="profiled")
+        self._profiling = True
+        self._last_profile = now
+        profile_id = self._profile_id(scope)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER, profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                profiler.disable()
+            await to_thread.run_sync(self._save, profile_id, profiler)
+        finally:
+            self._profiling = False
+
+    def _profile_id(self, scope) -> str:
+        path = re.sub(r"[^\w.-]+", "_", scope["path"]).strip("_") or "root"
+        return f"{datetime.now():%Y%m%dT%H%M%S%f}-{scope['method']}-{path}"[:128]
+
+    def _save(self, profile_id: str, profiler: cProfile.Profile):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, profile_id)
+        profiler.dump_stats(path + ".pstats")
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(self.top)
+        with open(path + ".txt", "w") as f:
+            f.write(summary.getvalue())
+        self.log.info("Saved the profile of a request to %s.pstats", path)
+        self._remove_old_profiles()
+
+    def _remove_old_profiles(self):
+        profiles = sorted(name for name in os.listdir(self.profile_dir) if name.endswith(".pstats"))
+        for name in profiles[: max(0, len(profiles) - self.keep)]:
+            for suffix in (".pstats", ".txt"):
+                path = os.path.join(self.profile_dir, name[: -len(".pstats")] + suffix)
+                if os.path.exists(path):
+                    os.remove(path)
@@ -0,0 +1,148 @@
+"""
+Per-request accounting of SQL queries, built on SQLAlchemy engine events.
+"""
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import counter
+
+QUERY_BUDGET_BREACHES = counter(
+    "publishing_query_budget_breaches",
+    "Requests that ran more SQL queries than the query budget.",
+)
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """The number of queries run while handling one request, how long
+    they took, and how often each statement ran.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self) -> List[Tuple[str, int]]:
+        """Statements that ran more than once, most frequent first. A
+        statement run once per item in a loop (an N+1 query) shows up here.
+        """
+        return [(s, n) for s, n in self.statements.most_common() if n > 1]
+
+    def server_timing(self) -> str:
+        """A `Server-Timing` header value, e.g. `db;dur=12.5;desc="3 queries"`."""
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+# The stats of the request being handled, if any.
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """The shape of a statement's parameters (their types, not their
+    values), so that they can be logged without leaking data.
+    """
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, list):
+        shapes = {repr(parameter_shape(p)) for p in parameters}
+        return f"{len(parameters)} x {' | '.join(sorted(shapes))}"
+    if isinstance(parameters, tuple):
+        return tuple(type(value).__name__ for value in parameters)
+    return type(parameters).__name__
+
+
+def track_queries(engine: Engine, slow_query_threshold: float = 0, log: logging.Logger = logger):
+    """Record every query run by `engine` in the current request's stats,
+    and log queries slower than `slow_query_threshold` seconds (if set).
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start"].pop()
+        stats = current_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+        if slow_query_threshold and duration > slow_query_threshold:
+            log.warning(
+                "Slow query (%.1f ms): %s; parameters: %s",
+                duration * 1000,
+                statement,
+                parameter_shape(parameters),
+            )
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised (in strict mode) when a request runs more queries than its budget."""
+
+
+class QueryAccountingMiddleware:
+    """Counts the SQL queries run while handling each request, and reports
+    their number and total time in a `Server-Timing` response header.
+
+    Requests that run more than `budget` queries (if set) are logged with
+    the statements they repeated. In strict mode (e.g. in tests), they
+    also raise `QueryBudgetExceeded` once the response is sent.
+    """
+
+    def __init__(
+        self,
+        app,
+        budget: int = 0,
+        strict: bool = False,
+        server_timing: bool = True,
+        log: logging.Logger = logger,
+    ):
+        self.app = app
+        self.budget = budget
+        self.strict = strict
+        self.server_timing = server_timing
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = QueryStats()
+        token = current_stats.set(stats)
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            current_stats.reset(token)
+        if self.budget and stats.count > self.budget:
+            self._over_budget(scope, stats)
+
+    def _over_budget(self, scope, stats: QueryStats):
+        QUERY_BUDGET_BREACHES.inc()
+        request = f"{scope['method']} {scope['path']}"
+        repeated = "; ".join(f"{n} x {statement}" for statement, n in stats.repeated()[:5])
+        message = (
+            f"{request} ran {stats.count} queries (budget: {self.budget}). "
+            f"Repeated statements: {repeated or 'none'}"
+        )
+        if self.strict:
+            raise QueryBudgetExceeded(message)
+        self.log.warning(message)
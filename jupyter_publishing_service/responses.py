@@ -0,0 +1,100 @@
+"""
+Fast JSON responses, for models the storage manager already validated,
+and MessagePack as an alternative wire format.
+
+FastAPI validates what a route returns against its `response_model` again,
+and converts it with `jsonable_encoder` before serializing it. Routes that
+return a `FastJSONResponse` skip both: pydantic models are serialized
+straight to bytes by their own (compiled) serializers, with the same output,
+e.g. the ISO datetimes of their `field_serializer`s. Other content is
+serialized with `orjson`, if installed (`pip install jupyter_publishing_service[fast]`).
+
+Clients that send `Accept: application/msgpack` get MessagePack instead
+(from routes that `respond` with it), and can send MessagePack request
+bodies with `Content-Type: application/msgpack`. Both need `msgpack`
+(`pip install jupyter_publishing_service[msgpack]`). The MessagePack form
+holds exactly what the JSON form does, so both decode to the same models.
+"""
+from typing import Any, Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+from .serialization import (  # noqa: F401
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPES,
+    dumps,
+    encode,
+    msgpack,
+)
+
+
+def _media_type(header: str) -> str:
+    return header.split(";", 1)[0].strip().lower()
+
+
+def negotiate(request: Request) -> str:
+    """The media type to respond to a request with."""
+    if msgpack is not None:
+        for accepted in request.headers.get("accept", "").split(","):
+            if _media_type(accepted) in MSGPACK_MEDIA_TYPES:
+                return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return encode(content, MSGPACK_MEDIA_TYPE)
+
+
+# Responses vary with the request's Accept header.
+VARY_HEADERS = {"Vary": "Accept"}
+
+
+def respond(request: Request, content: Any) -> Response:
+    """Respond with content, in the format the client asked for."""
+    if negotiate(request) == MSGPACK_MEDIA_TYPE:
+        return MsgPackResponse(content, headers=VARY_HEADERS)
+    return FastJSONResponse(content, headers=VARY_HEADERS)
+
+
+class MsgPackRequest(Request):
+    """A request with a MessagePack body, presented to FastAPI as JSON."""
+
+    def __init__(self, request: Request, body: bytes):
+        headers = [(k, v) for k, v in request.scope["headers"] if k != b"content-type"]
+        headers.append((b"content-type", JSON_MEDIA_TYPE.encode()))
+        super().__init__({**request.scope, "headers": headers}, request.receive)
+        self._body = body
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(self._body)
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    """Accepts MessagePack request bodies wherever JSON ones are."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type")
+            if content_type and _media_type(content_type) in MSGPACK_MEDIA_TYPES:
+                if msgpack is None:
+                    raise HTTPException(status_code=415, detail="MessagePack isn't supported.")
+                request = MsgPackRequest(request, await request.body())
+            return await handler(request)
+
+        return route_handler
@@ -1,24 +1,67 @@
+import asyncio
+import hmac
+import math
+import time
 from contextlib import asynccontextmanager
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer
 from starlette.exceptions import HTTPException
 
 from ._version import __version__
+from .attachment.outputs import attachment_to_bytes
 from .authorizer.service import require_read_permissions, require_read_write_permissions
+from .metrics import REGISTRY
 from .models.rest import (
     Collaborator,
+    FileChangesModel,
+    FileVersionModel,
+    GroupMembersRequestModel,
+    GroupModel,
+    OutputsMode,
+    SearchRanking,
     ServiceStatusResponse,
     SharedFileRequestModel,
     SharedFileResponseModel,
+    UploadCommitRequestModel,
+    UploadSessionModel,
+    UploadSessionRequestModel,
+)
+from .models.sql import Collaborator, Group, JupyterContentsModel, Permission
+from .responses import (
+    VARY_HEADERS,
+    FastJSONResponse,
+    NegotiatedRoute,
+    negotiate,
+    respond,
 )
-from .models.sql import Collaborator
+from .rtc.room import Connection
 from .storage.base import BaseStorageManager
 
 httpBearer = HTTPBearer()
 
-router = APIRouter()
+# Attachments are content-addressed, so they never change.
+ATTACHMENT_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+EVENT_STREAM_CONTENT_TYPE = "text/event-stream"
+# Milliseconds SSE clients wait before reconnecting.
+EVENT_STREAM_RETRY = 1000
+
+router = APIRouter(route_class=NegotiatedRoute)
 
 
 async def authorize(request: Request):
@@ -49,15 +92,42 @@ async def authenticate(request: Request) -> dict:
     user = await authenticator.authenticate(data)
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized")
+    retry_after = router.app.rate_limiter.check(user["name"], request.method)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
     request.state.user = user  # type: ignore
     return user
 
 
+async def authenticate_websocket(websocket: WebSocket) -> Optional[dict]:
+    """Token based authentication, with the token in the `Authorization` header
+    or (since browsers can't set headers on WebSockets) the `token` query parameter.
+    """
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        token = websocket.query_params.get("token", "")
+    if not token:
+        return None
+    return await router.app.authenticator.authenticate({"token": token})
+
+
 @asynccontextmanager
 async def lifespan(app):
     storage_manager: BaseStorageManager = router.app.storage_manager
     await storage_manager.start()
+    router.app.ready = True
     yield
+    router.app.ready = False
+    await router.app.room_manager.stop()
+    # Optional: managers registered as virtual subclasses of
+    # StorageManagerABC don't inherit its no-op.
+    stop = getattr(storage_manager, "stop", None)
+    if stop is not None:
+        await stop()
 
 
 @router.get("/", response_model=ServiceStatusResponse)
@@ -66,6 +136,35 @@ async def service_status():
     return ServiceStatusResponse(version=__version__, status="healthy")
 
 
+@router.get("/health/live", response_model=ServiceStatusResponse)
+async def liveness():
+    """Check that the service process is up (for liveness probes)."""
+    return ServiceStatusResponse(version=__version__, status="alive")
+
+
+@router.get("/health/ready", response_model=ServiceStatusResponse)
+async def readiness(response: Response):
+    """Check that the service has started and can serve requests (for readiness probes)."""
+    if not router.app.ready:
+        response.status_code = 503
+        return ServiceStatusResponse(version=__version__, status="starting")
+    return ServiceStatusResponse(version=__version__, status="ready")
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Metrics in the Prometheus text format."""
+    if not router.app.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    token = router.app.metrics_token
+    if token:
+        expected = f"Bearer {token}".encode()
+        given = request.headers.get("authorization", "").encode()
+        if not hmac.compare_digest(given, expected):
+            raise HTTPException(status_code=401, detail="Not authenticated")
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @router.get(
     "/sharing",
     dependencies=[Depends(authenticate)],
@@ -76,7 +175,65 @@ async def list_files(
 ):
     storage_manager: BaseStorageManager = router.app.storage_manager
     user = request.state.user
-    return await storage_manager.list(user["name"])
+    return respond(request, await storage_manager.list(user["name"]))
+
+
+async def stream_changes(
+    request: Request, user_id: str, cursor: Optional[int], limit: int
+) -> AsyncIterator[str]:
+    """Server-sent events with the changes after `cursor`, until the client
+    disconnects or the stream times out.
+    """
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    heartbeat = router.app.change_heartbeat_interval
+    deadline = time.monotonic() + router.app.change_stream_timeout
+    yield f"retry: {EVENT_STREAM_RETRY}\n\n"
+    while not await request.is_disconnected():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        page = await storage_manager.list_changes(
+            user_id, cursor=cursor, limit=limit, wait=min(heartbeat, remaining)
+        )
+        cursor = page.cursor
+        if page.changes:
+            yield f"id: {cursor}\nevent: changes\ndata: {page.model_dump_json()}\n\n"
+        else:
+            yield ": keepalive\n\n"
+
+
+@router.get(
+    "/sharing/changes",
+    dependencies=[Depends(authenticate)],
+    response_model=FileChangesModel,
+)
+async def list_changes(
+    request: Request,
+    cursor: Optional[int] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    wait: float = Query(default=0, ge=0, le=60),
+    accept: Optional[str] = Header(default=None),
+    last_event_id: Optional[int] = Header(default=None),
+):
+    """Changes to the files shared with the user after `cursor` (or from now on).
+
+    Streams them as server-sent events if asked to (with `Accept: text/event-stream`).
+    Otherwise, waits up to `wait` seconds for changes (a long poll), and returns
+    the cursor to ask for the next ones with.
+    """
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    user_id = request.state.user["name"]
+    if last_event_id is not None:
+        cursor = last_event_id
+    if last_event_id is not None or EVENT_STREAM_CONTENT_TYPE in (accept or ""):
+        return StreamingResponse(
+            stream_changes(request, user_id, cursor, limit),
+            media_type=EVENT_STREAM_CONTENT_TYPE,
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    return FastJSONResponse(
+        await storage_manager.list_changes(user_id, cursor=cursor, limit=limit, wait=wait)
+    )
 
 
 @router.get(
@@ -85,9 +242,155 @@ async def list_files(
         Depends(authenticate),
     ],
 )
-async def search_users(substring: Optional[str] = None) -> List[Collaborator]:
+async def search_users(
+    substring: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=1000),
+    case_sensitive: bool = True,
+    ranking: SearchRanking = SearchRanking.prefix,
+) -> List[Collaborator]:
+    """Search collaborators by name. Use `ranking=fuzzy` for typeahead."""
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    users = await storage_manager.search_users(
+        substring, limit=limit, case_sensitive=case_sensitive, ranking=ranking
+    )
+    return FastJSONResponse(users)
+
+
+@router.get(
+    "/sharing/groups",
+    dependencies=[Depends(authenticate)],
+)
+async def search_groups(
+    substring: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=1000),
+    case_sensitive: bool = True,
+    ranking: SearchRanking = SearchRanking.prefix,
+) -> List[Group]:
+    """Search groups by name."""
     storage_manager: BaseStorageManager = router.app.storage_manager
-    return await storage_manager.search_users(substring)
+    groups = await storage_manager.search_groups(
+        substring, limit=limit, case_sensitive=case_sensitive, ranking=ranking
+    )
+    return FastJSONResponse(groups)
+
+
+@router.get(
+    "/sharing/groups/{name}",
+    dependencies=[Depends(authenticate)],
+    response_model=GroupModel,
+)
+async def get_group(name: str) -> GroupModel:
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    return FastJSONResponse(await storage_manager.get_group(name))
+
+
+@router.put(
+    "/sharing/groups/{name}/members",
+    dependencies=[Depends(authenticate)],
+    response_model=GroupModel,
+)
+async def add_group_members(
+    name: str, body: GroupMembersRequestModel, request: Request
+) -> GroupModel:
+    """Add members to a group. The group is created, owned by the
+    current user, if it doesn't exist. Only its owner can change it.
+    """
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    group = await storage_manager.add_group_members(name, request.state.user["name"], body.members)
+    return FastJSONResponse(group)
+
+
+@router.delete(
+    "/sharing/groups/{name}/members/{member}",
+    dependencies=[Depends(authenticate)],
+    response_model=GroupModel,
+)
+async def remove_group_member(name: str, member: str, request: Request) -> GroupModel:
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    group = await storage_manager.remove_group_member(name, request.state.user["name"], member)
+    return FastJSONResponse(group)
+
+
+async def get_upload(upload_id: str, request: Request) -> UploadSessionModel:
+    """Get an upload that belongs to the current user."""
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    upload = await storage_manager.upload_store.get(upload_id)
+    if upload is None or upload.owner != request.state.user["name"]:
+        raise HTTPException(status_code=404, detail="The upload requested does not exist.")
+    return upload
+
+
+@router.post(
+    "/sharing/uploads",
+    dependencies=[Depends(authenticate)],
+    response_model=UploadSessionModel,
+)
+async def create_upload(body: UploadSessionRequestModel, request: Request) -> UploadSessionModel:
+    """Start a chunked upload of a file's contents."""
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    return await storage_manager.upload_store.create(
+        request.state.user["name"], size=body.size, chunk_size=body.chunk_size
+    )
+
+
+@router.get(
+    "/sharing/uploads/{upload_id}",
+    dependencies=[Depends(authenticate)],
+    response_model=UploadSessionModel,
+)
+async def get_upload_status(upload: UploadSessionModel = Depends(get_upload)):
+    """Get an upload, including the checksums of the chunks received so far."""
+    return upload
+
+
+@router.put(
+    "/sharing/uploads/{upload_id}/chunks/{index}",
+    dependencies=[Depends(authenticate)],
+)
+async def add_upload_chunk(
+    index: int,
+    request: Request,
+    upload: UploadSessionModel = Depends(get_upload),
+    checksum: str = Header(alias="X-Checksum-SHA256"),
+):
+    """Upload a single chunk. The body is streamed straight to the upload store."""
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    checksum = await storage_manager.upload_store.add_chunk(
+        upload.id, index, request.stream(), checksum
+    )
+    return {"index": index, "checksum": checksum}
+
+
+@router.post(
+    "/sharing/uploads/{upload_id}/commit",
+    dependencies=[Depends(authenticate)],
+    response_model=SharedFileResponseModel,
+)
+async def commit_upload(
+    body: UploadCommitRequestModel,
+    request: Request,
+    upload: UploadSessionModel = Depends(get_upload),
+) -> SharedFileResponseModel:
+    """Attach the assembled upload to a file as its new contents."""
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    data = {
+        "permissions": [Permission(name="READ"), Permission(name="WRITE")],
+        "file_id": body.file_id,
+    }
+    allowed = await storage_manager.authorization_store.authorize(request.state.user, data)
+    if not allowed:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return respond(request, await storage_manager.commit_upload(upload.id, body.file_id))
+
+
+@router.delete(
+    "/sharing/uploads/{upload_id}",
+    dependencies=[Depends(authenticate)],
+)
+async def delete_upload(upload: UploadSessionModel = Depends(get_upload)):
+    """Abort an upload."""
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    await storage_manager.upload_store.delete(upload.id)
 
 
 @router.get(
@@ -100,18 +403,130 @@ async def get_file(
     request: Request,
     contents: bool = False,
     collaborators: bool = False,
+    outputs: OutputsMode = OutputsMode.inline,
 ) -> SharedFileResponseModel:
     storage_manager: BaseStorageManager = router.app.storage_manager
-    return await storage_manager.get(file_id, contents=contents, collaborators=collaborators)
+    get_serialized = getattr(storage_manager, "get_serialized", None)
+    if get_serialized is None:
+        # Managers registered as virtual subclasses of
+        # StorageManagerABC don't inherit its get_serialized.
+        file = await storage_manager.get(
+            file_id, contents=contents, collaborators=collaborators, outputs=outputs
+        )
+        return respond(request, file)
+    media_type = negotiate(request)
+    # Serialized (and cached) by the storage manager.
+    data = await get_serialized(
+        file_id,
+        contents=contents,
+        collaborators=collaborators,
+        outputs=outputs,
+        media_type=media_type,
+    )
+    return Response(data, media_type=media_type, headers=VARY_HEADERS)
+
+
+async def send_messages(websocket: WebSocket, connection: Connection):
+    while True:
+        message = await connection.queue.get()
+        if message is None:
+            # Fell too far behind.
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
+        await websocket.send_text(message)
+
+
+@router.websocket("/sharing/{file_id}/rtc")
+async def collaborate(websocket: WebSocket, file_id: str):
+    """Edit a file in real time with its other collaborators.
+
+    Authenticated and authorized once, when connecting. Collaborators
+    without write permissions receive updates, but can't send them.
+    """
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    authorizer = storage_manager.authorization_store
+    user = await authenticate_websocket(websocket)
+    read = {"permissions": [Permission(name="READ")], "file_id": file_id}
+    if not user or not await authorizer.authorize(user, read):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Not authorized")
+        return
+    write = {"permissions": [Permission(name="READ"), Permission(name="WRITE")], "file_id": file_id}
+    writable = await authorizer.authorize(user, write)
+    rooms = router.app.room_manager
+    try:
+        room = await rooms.get_room(file_id)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+        return
+    connection = rooms.join(room, user["name"], writable)
+    sender = None
+    try:
+        await websocket.accept()
+        sender = asyncio.ensure_future(send_messages(websocket, connection))
+        while not sender.done():
+            room.receive(connection, await websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if sender is not None:
+            sender.cancel()
+        rooms.leave(room, connection)
+
+
+@router.get(
+    "/sharing/{file_id}/attachments/{attachment_id}",
+    dependencies=[Depends(authenticate), Depends(require_read_permissions), Depends(authorize)],
+    response_class=Response,
+)
+async def get_attachment(file_id: str, attachment_id: str, request: Request) -> Response:
+    """Get a large output that was moved out of a file's contents."""
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    attachment = await storage_manager.attachment_store.get(file_id, attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="The attachment requested does not exist.")
+    etag = f'"{attachment_id}"'
+    headers = {"Cache-Control": ATTACHMENT_CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=attachment_to_bytes(attachment), media_type=attachment.mimetype, headers=headers
+    )
+
+
+@router.get(
+    "/sharing/{file_id}/versions",
+    dependencies=[Depends(authenticate), Depends(require_read_permissions), Depends(authorize)],
+    response_model=List[FileVersionModel],
+)
+async def list_versions(file_id: str) -> List[FileVersionModel]:
+    """List the version history of a file, newest first."""
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    return FastJSONResponse(await storage_manager.list_versions(file_id))
+
+
+@router.get(
+    "/sharing/{file_id}/versions/{version}",
+    dependencies=[Depends(authenticate), Depends(require_read_permissions), Depends(authorize)],
+    response_model=JupyterContentsModel,
+)
+async def get_version(
+    file_id: str, version: int, request: Request, outputs: OutputsMode = OutputsMode.inline
+) -> JupyterContentsModel:
+    """Get the contents of a file at a given version."""
+    storage_manager: BaseStorageManager = router.app.storage_manager
+    file = await storage_manager.get_version(file_id, version, outputs=outputs)
+    if file is None:
+        raise HTTPException(status_code=404, detail="The version requested does not exist.")
+    return respond(request, file)
 
 
 @router.post(
     "/sharing",
     response_model=SharedFileResponseModel,
 )
-async def add_file(body: SharedFileRequestModel) -> SharedFileResponseModel:
+async def add_file(body: SharedFileRequestModel, request: Request) -> SharedFileResponseModel:
     storage_manager: BaseStorageManager = router.app.storage_manager
-    return await storage_manager.add(body)
+    return respond(request, await storage_manager.add(body))
 
 
 @router.patch(
@@ -123,9 +538,11 @@ async def add_file(body: SharedFileRequestModel) -> SharedFileResponseModel:
     ],
     response_model=SharedFileResponseModel,
 )
-async def update_file(file_id: str, body: SharedFileRequestModel) -> SharedFileResponseModel:
+async def update_file(
+    file_id: str, body: SharedFileRequestModel, request: Request
+) -> SharedFileResponseModel:
     storage_manager: BaseStorageManager = router.app.storage_manager
-    return await storage_manager.update(file_id, body)
+    return respond(request, await storage_manager.update(file_id, body))
 
 
 @router.delete(
@@ -0,0 +1,101 @@
+"""
+Incremental updates to JSON documents, as JSON Patch (RFC 6902) operations.
+
+Only the `add`, `remove` and `replace` operations are supported, which is
+all a notebook editor needs (e.g. `replace` a cell's source, `add` a cell).
+"""
+from typing import Any, Callable, List, Optional
+
+
+class PatchError(ValueError):
+    """Raised when a patch can't be applied to a document."""
+
+
+def _parse_path(path: Any) -> List[str]:
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise PatchError(f"Invalid path: {path!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _index(container: list, token: str, insert: bool = False) -> int:
+    if insert and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise PatchError(f"Invalid list index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not insert):
+        raise PatchError(f"List index out of range: {index}")
+    return index
+
+
+def _apply(document: dict, operation: Any) -> Callable[[], None]:
+    """Apply one operation, and return a function that undoes it."""
+    if not isinstance(operation, dict):
+        raise PatchError(f"Invalid operation: {operation!r}")
+    op = operation.get("op")
+    path = operation.get("path")
+    tokens = _parse_path(path)
+    if op in ("add", "replace") and "value" not in operation:
+        raise PatchError(f"Missing value for {op} at {path!r}")
+    value = operation.get("value")
+    parent: Any = document
+    for token in tokens[:-1]:
+        if isinstance(parent, dict) and token in parent:
+            parent = parent[token]
+        elif isinstance(parent, list):
+            parent = parent[_index(parent, token)]
+        else:
+            raise PatchError(f"Path not found: {path!r}")
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        existed = key in parent
+        old = parent.get(key)
+        if op == "add" or (op == "replace" and existed):
+            parent[key] = value
+            if existed:
+                return lambda: parent.__setitem__(key, old)
+            return lambda: parent.pop(key)
+        if op == "remove" and existed:
+            del parent[key]
+            return lambda: parent.__setitem__(key, old)
+        if op in ("replace", "remove"):
+            raise PatchError(f"Path not found: {path!r}")
+    elif isinstance(parent, list):
+        if op == "add":
+            index = _index(parent, key, insert=True)
+            parent.insert(index, value)
+            return lambda: parent.pop(index)
+        if op in ("replace", "remove"):
+            index = _index(parent, key)
+            old = parent[index]
+            if op == "replace":
+                parent[index] = value
+                return lambda: parent.__setitem__(index, old)
+            del parent[index]
+            return lambda: parent.insert(index, old)
+    else:
+        raise PatchError(f"Path not found: {path!r}")
+    raise PatchError(f"Unsupported operation: {op!r}")
+
+
+def apply_patch(
+    document: dict, operations: List[dict], check: Optional[Callable[[dict], None]] = None
+):
+    """Apply JSON Patch operations to a document in place.
+
+    Either all operations are applied or, if one of them fails, none are.
+    The patched document is then passed to `check`, which raises a
+    `PatchError` (undoing the operations) if it isn't valid.
+    """
+    if not isinstance(operations, list):
+        raise PatchError("A patch must be a list of operations.")
+    undo: List[Callable[[], None]] = []
+    try:
+        for operation in operations:
+            undo.append(_apply(document, operation))
+        if check is not None:
+            check(document)
+    except PatchError:
+        for undo_operation in reversed(undo):
+            undo_operation()
+        raise
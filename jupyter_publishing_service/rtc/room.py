@@ -0,0 +1,425 @@
+"""
+Rooms for real-time collaboration on shared files.
+
+Collaborators connected to the same file share a room, which holds the
+file's contents in memory. They send incremental updates (JSON Patch
+operations on the notebook), which the room applies in the order it
+receives them, numbering them with a revision, and forwards to the other
+collaborators. The merged contents are saved every `save_interval` seconds
+while they change, and when the last collaborator leaves. The room stays
+open until that save succeeds (or keeps failing), so collaborators who reconnect meanwhile
+rejoin it, edits included.
+
+Messages are JSON objects with a `type`:
+
+- `state` (sent on connect, and when the file was changed by someone
+  outside the room): the `revision`, the notebook `content`, and whether
+  the connection is `writable`.
+- `update` (sent by collaborators): the `ops` to apply, and an optional
+  `id`, echoed in the `ack`.
+- `update` (sent to the other collaborators): the `revision`, the `ops` and
+  the `user` who made them.
+- `ack` (sent to the collaborator who made an update): its `revision` and `id`.
+- `error`: a `detail`, e.g. when an update can't be applied, or would
+  leave a notebook that isn't one any more.
+"""
+import asyncio
+import copy
+import json
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from starlette.exceptions import HTTPException
+from traitlets import Float, Instance, Integer
+from traitlets.config import LoggingConfigurable
+
+from jupyter_publishing_service.invalidation.local import FILES
+from jupyter_publishing_service.metrics import counter, gauge
+from jupyter_publishing_service.models.sql import JupyterContentsModel
+
+from .patch import PatchError, apply_patch
+
+RTC_CONNECTIONS = gauge("publishing_rtc_connections", "Open real-time collaboration connections.")
+RTC_UPDATES = counter(
+    "publishing_rtc_updates",
+    "Updates sent by collaborators, by result (applied or rejected).",
+    ("result",),
+)
+RTC_SAVES = counter("publishing_rtc_saves", "Saves of files edited in collaboration rooms.")
+
+CELL_TYPES = ("code", "markdown", "raw")
+
+
+def _check(valid: bool, detail: str):
+    if not valid:
+        raise PatchError(detail)
+
+
+def check_notebook(content: dict):
+    """Check that updated contents still have a notebook's structure, so
+    that they can be saved (and opened). Raises a `PatchError` if not.
+
+    Only the structure is checked, not the full nbformat schema.
+    """
+    _check(isinstance(content.get("cells"), list), "A notebook's cells must be a list.")
+    _check(isinstance(content.get("metadata"), dict), "A notebook's metadata must be an object.")
+    for key in ("nbformat", "nbformat_minor"):
+        _check(isinstance(content.get(key, 0), int), f"A notebook's {key} must be an integer.")
+    for cell in content["cells"]:
+        _check(isinstance(cell, dict), "Cells must be objects.")
+        _check(cell.get("cell_type") in CELL_TYPES, f"Cell types must be one of {CELL_TYPES}.")
+        source = cell.get("source", "")
+        _check(
+            isinstance(source, str)
+            or (isinstance(source, list) and all(isinstance(line, str) for line in source)),
+            "A cell's source must be a string or a list of strings.",
+        )
+        _check(isinstance(cell.get("metadata", {}), dict), "A cell's metadata must be an object.")
+        outputs = cell.get("outputs", [])
+        _check(
+            isinstance(outputs, list)
+            and all(
+                isinstance(output, dict) and isinstance(output.get("data", {}), dict)
+                for output in outputs
+            ),
+            "A cell's outputs must be a list of objects.",
+        )
+        attachments = cell.get("attachments", {})
+        _check(
+            isinstance(attachments, dict)
+            and all(isinstance(bundle, dict) for bundle in attachments.values()),
+            "A cell's attachments must be an object of mimebundles.",
+        )
+
+
+class Connection:
+    """A collaborator's connection to a room.
+
+    Messages to it are queued, so that a slow collaborator doesn't hold up
+    the others. A connection that falls too far behind is closed: `None`
+    is queued, after which its messages should no longer be sent.
+    """
+
+    def __init__(self, user: str, writable: bool, max_pending: int):
+        self.user = user
+        self.writable = writable
+        self.closed = False
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(max_pending)
+
+    def send(self, message: str):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.close()
+
+    def close(self):
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class Room:
+    """The collaborators editing one file, and its contents."""
+
+    def __init__(
+        self,
+        manager: "RoomManager",
+        file_id: str,
+        contents: JupyterContentsModel,
+        version: Optional[int] = None,
+    ):
+        self.manager = manager
+        self.file_id = file_id
+        self.contents = contents
+        self.revision = 0
+        self.connections: Set[Connection] = set()
+        # The stored version the contents were loaded from, or last saved as.
+        self.version = version
+        self.dirty = False
+        # Saves that failed in a row.
+        self.failures = 0
+        self._saving = asyncio.Lock()
+        self._save_task: Optional[asyncio.Task] = None
+
+    def state(self, connection: Connection) -> str:
+        return json.dumps(
+            {
+                "type": "state",
+                "revision": self.revision,
+                "content": self.contents.content,
+                "writable": connection.writable,
+            }
+        )
+
+    def broadcast(self, message: str, exclude: Optional[Connection] = None):
+        for connection in self.connections:
+            if connection is not exclude:
+                connection.send(message)
+
+    def receive(self, connection: Connection, message: str):
+        """Handle a message from a collaborator."""
+        if len(message) > self.manager.max_message_size:
+            return self._reject(connection, "The update is too large.")
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return self._reject(connection, "Messages must be JSON.")
+        if not isinstance(data, dict) or data.get("type") != "update":
+            return self._reject(connection, "Unsupported message.")
+        if not connection.writable:
+            return self._reject(connection, "Not authorized to edit this file.")
+        ops = data.get("ops")
+        check = check_notebook if self.contents.type == "notebook" else None
+        try:
+            apply_patch(self.contents.content, ops, check)
+        except PatchError as e:
+            return self._reject(connection, str(e), data.get("id"))
+        RTC_UPDATES.inc(result="applied")
+        self.revision += 1
+        self.broadcast(
+            json.dumps(
+                {"type": "update", "revision": self.revision, "ops": ops, "user": connection.user}
+            ),
+            exclude=connection,
+        )
+        connection.send(
+            json.dumps({"type": "ack", "revision": self.revision, "id": data.get("id")})
+        )
+        self._schedule_save()
+
+    def _reject(self, connection: Connection, detail: str, update_id=None):
+        RTC_UPDATES.inc(result="rejected")
+        connection.send(json.dumps({"type": "error", "detail": detail, "id": update_id}))
+
+    def _schedule_save(self):
+        self.dirty = True
+        if self._save_task is None:
+            self._save_task = asyncio.ensure_future(self._save_later())
+
+    async def _save_later(self):
+        await asyncio.sleep(self.manager.save_interval)
+        self._save_task = None
+        await self.save()
+
+    async def save(self):
+        """Save the contents, if they changed since they were last saved.
+
+        Failed saves are retried by the next save, up to
+        `max_save_failures` times in a row.
+        """
+        async with self._saving:
+            await self._save()
+
+    async def _save(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        # Saving moves large outputs out of the contents, so save a copy.
+        contents = JupyterContentsModel.model_validate(self.contents.model_dump())
+        contents.content = copy.deepcopy(self.contents.content)
+        log = self.manager.log
+        try:
+            response = await self.manager.storage_manager.update_contents(self.file_id, contents)
+        except HTTPException as e:
+            # e.g. the file was deleted: saving again won't help.
+            log.error("Can't save the file %s: %s", self.file_id, e.detail)
+        except asyncio.CancelledError:
+            self.dirty = True
+            raise
+        except Exception:
+            self.failures += 1
+            if self.failures < self.manager.max_save_failures:
+                self.dirty = True
+                log.exception("Failed to save the file %s.", self.file_id)
+            else:
+                log.exception(
+                    "Failed to save the file %s %d times, giving up.", self.file_id, self.failures
+                )
+        else:
+            self.failures = 0
+            self.version = response.metadata.version
+            RTC_SAVES.inc()
+
+    async def changed(self):
+        """Reload the contents if they were changed outside the room."""
+        # The room's own saves change the file too: wait for the one in
+        # progress, to know the version it saved.
+        async with self._saving:
+            try:
+                response = await self.manager.storage_manager.get(self.file_id)
+            except HTTPException:
+                # Deleted.
+                response = None
+            if response is not None and response.metadata.version == self.version:
+                return
+            await self.reload()
+
+    async def reload(self):
+        """Load contents changed outside the room (e.g. by a PATCH), and send
+        them to everyone. Edits made in the room since the last save are lost.
+        """
+        if self._save_task is not None:
+            self._save_task.cancel()
+            self._save_task = None
+        self.dirty = False
+        try:
+            self.contents, self.version = await self.manager.load(self.file_id)
+        except HTTPException:
+            # Deleted.
+            for connection in self.connections:
+                connection.close()
+            return
+        self.revision += 1
+        for connection in self.connections:
+            connection.send(self.state(connection))
+
+    async def close(self):
+        if self._save_task is not None:
+            self._save_task.cancel()
+            self._save_task = None
+        await self.save()
+
+
+class RoomManager(LoggingConfigurable):
+    """Opens a room for each file collaborators are connected to, and closes
+    it (saving the file) when the last one leaves. A room is closed once it
+    is saved, and saving is retried every `save_interval` seconds until it
+    succeeds, so that edits aren't lost while the storage is briefly
+    unavailable, or until it failed `max_save_failures` times.
+
+    Rooms live in the process serving their connections. When running
+    several workers or replicas, route the connections to a file to the
+    same process (e.g. by hashing the path), so that its collaborators
+    share a room.
+    """
+
+    storage_manager = Instance(
+        klass="jupyter_publishing_service.storage.abc.StorageManagerABC", allow_none=True
+    )
+
+    save_interval = Float(
+        5, help="Save files edited in collaboration at most this often (in seconds)."
+    ).tag(config=True)
+
+    max_save_failures = Integer(
+        60,
+        help="Give up saving the edits of a room after this many failed saves in a row "
+        "(retried every `save_interval` seconds). The edits are then lost.",
+    ).tag(config=True)
+
+    max_message_size = Integer(
+        1024 * 1024, help="The largest update (in bytes) collaborators can send."
+    ).tag(config=True)
+
+    max_pending = Integer(
+        256,
+        help="The most messages queued for a collaborator. Collaborators that fall "
+        "further behind are disconnected, and can reconnect to get the latest state.",
+    ).tag(config=True)
+
+    _rooms: Dict[str, Room] = Instance(dict, args=())
+    _loading: Dict[str, asyncio.Future] = Instance(dict, args=())
+    # Rooms nobody is connected to any more, being saved before they close.
+    _closing: Dict[str, asyncio.Task] = Instance(dict, args=())
+    # Reloads and saves of closed rooms, in the background.
+    _tasks: Set[asyncio.Task] = Instance(set, args=())
+
+    def initialize(self):
+        self.storage_manager.invalidation_bus.subscribe(FILES, self._files_changed)
+
+    def _files_changed(self, file_ids: Iterable[str]):
+        for file_id in file_ids:
+            room = self._rooms.get(file_id)
+            if room is not None:
+                self._run(room.changed())
+
+    def _run(self, coroutine) -> asyncio.Task:
+        task = asyncio.ensure_future(coroutine)
+        # The event loop only keeps weak references to tasks.
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def load(self, file_id: str) -> Tuple[JupyterContentsModel, Optional[int]]:
+        """Load the contents of a file, and their version."""
+        response = await self.storage_manager.get(file_id, contents=True)
+        contents = response.contents
+        if contents is None or not isinstance(contents.content, dict):
+            raise HTTPException(status_code=400, detail="The file can't be edited.")
+        return contents, response.metadata.version
+
+    async def get_room(self, file_id: str) -> Room:
+        """Get the room of a file, opening it if needed. A room that is
+        closing is reopened as is, with the edits it is still saving.
+        """
+        room = self._rooms.get(file_id)
+        if room is not None:
+            return room
+        # Concurrent connections to a file share one load.
+        loading = self._loading.get(file_id)
+        if loading is None:
+            loading = self._loading[file_id] = asyncio.ensure_future(self._open(file_id))
+        return await asyncio.shield(loading)
+
+    async def _open(self, file_id: str) -> Room:
+        try:
+            contents, version = await self.load(file_id)
+        finally:
+            del self._loading[file_id]
+        room = self._rooms[file_id] = Room(self, file_id, contents, version)
+        return room
+
+    def join(self, room: Room, user: str, writable: bool) -> Connection:
+        connection = Connection(user, writable, self.max_pending)
+        room.connections.add(connection)
+        connection.send(room.state(connection))
+        RTC_CONNECTIONS.inc()
+        return connection
+
+    def leave(self, room: Room, connection: Connection):
+        """Remove a connection from its room, closing (and saving) the
+        room in the background if it was the last one.
+        """
+        room.connections.discard(connection)
+        RTC_CONNECTIONS.inc(-1)
+        if (
+            not room.connections
+            and self._rooms.get(room.file_id) is room
+            and room.file_id not in self._closing
+        ):
+            self._closing[room.file_id] = self._run(self._close(room))
+
+    async def _close(self, room: Room):
+        try:
+            while True:
+                await room.close()
+                if room.connections:
+                    # Reopened while it was being saved.
+                    if room.dirty:
+                        room._schedule_save()
+                    return
+                if not room.dirty:
+                    break
+                await asyncio.sleep(self.save_interval)
+            if self._rooms.get(room.file_id) is room:
+                del self._rooms[room.file_id]
+        finally:
+            del self._closing[room.file_id]
+
+    async def stop(self):
+        """Save all rooms, e.g. on shutdown."""
+        # Stop retrying saves of closing rooms; they are saved once more below.
+        closing = list(self._closing.values())
+        for task in closing:
+            task.cancel()
+        await asyncio.gather(*closing, return_exceptions=True)
+        rooms = list(self._rooms.values())
+        self._rooms.clear()
+        for room in rooms:
+            for connection in room.connections:
+                connection.close()
+            self._run(room.close())
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
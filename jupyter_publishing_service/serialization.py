@@ -0,0 +1,53 @@
+"""
+Serialization of models (and other content) to the service's wire formats:
+JSON, with `orjson` if installed, and MessagePack, if `msgpack` is installed.
+
+Kept free of web framework imports, so that storage managers can serialize
+(and cache) responses without depending on FastAPI.
+"""
+from typing import Any
+
+import pydantic_core
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack"}
+
+
+def _contains_models(content: Any) -> bool:
+    if isinstance(content, BaseModel):
+        return True
+    if isinstance(content, (list, tuple)):
+        return bool(content) and isinstance(content[0], BaseModel)
+    if isinstance(content, dict):
+        return any(isinstance(value, BaseModel) for value in content.values())
+    return False
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content (e.g. models, or lists of models) to JSON."""
+    if orjson is not None and not _contains_models(content):
+        try:
+            return orjson.dumps(content)
+        except TypeError:
+            # e.g. integers larger than 64 bits.
+            pass
+    return pydantic_core.to_json(content)
+
+
+def encode(content: Any, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    """Serialize content to JSON or, if asked to, MessagePack."""
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(pydantic_core.to_jsonable_python(content))
+    return dumps(content)
@@ -1,8 +1,16 @@
 from abc import ABC, abstractmethod
 from typing import List, Optional
 
-from ..models.rest import SharedFileRequestModel, SharedFileResponseModel
-from ..models.sql import Collaborator
+from ..models.rest import (
+    FileVersionModel,
+    GroupModel,
+    OutputsMode,
+    SearchRanking,
+    SharedFileRequestModel,
+    SharedFileResponseModel,
+)
+from ..models.sql import Collaborator, Group, JupyterContentsModel
+from ..serialization import JSON_MEDIA_TYPE, encode
 
 
 class StorageManagerABC(ABC):
@@ -17,6 +25,16 @@ class StorageManagerABC(ABC):
     def initialize(self):
         raise NotImplementedError("Must be implemented in a subclass.")
 
+    async def setup(self):
+        """Create what the storage needs, e.g. a database schema.
+        Runs once, even when the service runs several worker processes.
+
+        Optional, like `stop`: the service only calls it if the manager
+        has it (managers registered with `StorageManagerABC.register`
+        don't inherit this no-op).
+        """
+        ...
+
     @abstractmethod
     async def start(
         self,
@@ -24,16 +42,53 @@ class StorageManagerABC(ABC):
     ):
         raise NotImplementedError("Must be implemented in a subclass.")
 
+    async def stop(self):
+        """Release resources, e.g. database connections, when the service stops.
+        Optional.
+        """
+        ...
+
+    def instrument(self):
+        """Record metrics, e.g. how long calls to each store take. Optional."""
+        ...
+
+    def pool_wait(self) -> float:
+        """How long (in seconds) getting a database connection takes lately.
+        Optional; used to shed load when the database is overloaded.
+        """
+        return 0
+
     @abstractmethod
     async def authorize(self, user: Collaborator, file_id: str):
         raise NotImplementedError("Must be implemented in a subclass.")
 
     @abstractmethod
     async def get(
-        self, file_id: str, collaborators: bool = False, contents: bool = False
+        self,
+        file_id: str,
+        collaborators: bool = False,
+        contents: bool = False,
+        outputs: OutputsMode = OutputsMode.inline,
     ) -> SharedFileResponseModel:
         raise NotImplementedError("Must be implemented in a subclass.")
 
+    async def get_serialized(
+        self,
+        file_id: str,
+        collaborators: bool = False,
+        contents: bool = False,
+        outputs: OutputsMode = OutputsMode.inline,
+        media_type: str = JSON_MEDIA_TYPE,
+    ) -> bytes:
+        """Like `get`, but returns the response serialized as JSON (or
+        MessagePack). Implementations can cache these for files fetched often.
+        Optional: without it, responses are serialized from `get`.
+        """
+        response = await self.get(
+            file_id, collaborators=collaborators, contents=contents, outputs=outputs
+        )
+        return encode(response, media_type)
+
     @abstractmethod
     async def add(self, request_model: SharedFileRequestModel) -> SharedFileResponseModel:
         raise NotImplementedError("Must be implemented in a subclass.")
@@ -46,10 +101,60 @@ class StorageManagerABC(ABC):
     async def update(self, request_model: SharedFileRequestModel) -> SharedFileResponseModel:
         raise NotImplementedError("Must be implemented in a subclass.")
 
+    @abstractmethod
+    async def update_contents(
+        self, file_id: str, contents: JupyterContentsModel
+    ) -> SharedFileResponseModel:
+        raise NotImplementedError("Must be implemented in a subclass.")
+
+    @abstractmethod
+    async def commit_upload(self, upload_id: str, file_id: str) -> SharedFileResponseModel:
+        raise NotImplementedError("Must be implemented in a subclass.")
+
+    @abstractmethod
+    async def list_versions(self, file_id: str) -> List[FileVersionModel]:
+        raise NotImplementedError("Must be implemented in a subclass.")
+
+    @abstractmethod
+    async def get_version(
+        self, file_id: str, version: int, outputs: OutputsMode = OutputsMode.inline
+    ) -> Optional[JupyterContentsModel]:
+        raise NotImplementedError("Must be implemented in a subclass.")
+
     @abstractmethod
     async def list(self, user_id: str) -> List[SharedFileResponseModel]:
         raise NotImplementedError("Must be implemented in a subclass.")
 
     @abstractmethod
-    async def search_users(self, substring: Optional[str]) -> List[Collaborator]:
+    async def search_users(
+        self,
+        substring: Optional[str],
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Collaborator]:
+        raise NotImplementedError("Must be implemented in a subclass.")
+
+    @abstractmethod
+    async def search_groups(
+        self,
+        substring: Optional[str],
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Group]:
+        raise NotImplementedError("Must be implemented in a subclass.")
+
+    @abstractmethod
+    async def get_group(self, name: str) -> GroupModel:
+        raise NotImplementedError("Must be implemented in a subclass.")
+
+    @abstractmethod
+    async def add_group_members(
+        self, name: str, user_id: str, members: List[Collaborator]
+    ) -> GroupModel:
+        raise NotImplementedError("Must be implemented in a subclass.")
+
+    @abstractmethod
+    async def remove_group_member(self, name: str, user_id: str, member: str) -> GroupModel:
         raise NotImplementedError("Must be implemented in a subclass.")
@@ -1,28 +1,83 @@
-from typing import List, Optional
-
-from traitlets import Instance, Type, default
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+
+from starlette.exceptions import HTTPException
+from traitlets import Any, Bool, Float, Instance, Integer, Type, default
 from traitlets.config import LoggingConfigurable
 
+from jupyter_publishing_service.attachment.abc import AttachmentStoreABC
+from jupyter_publishing_service.attachment.outputs import (
+    externalize_outputs,
+    inline_outputs,
+    referenced_attachments,
+)
 from jupyter_publishing_service.authorizer.abc import AuthorizerABC
-from jupyter_publishing_service.authorizer.sqlrbac import SQLRoleBasedAuthorizer
+from jupyter_publishing_service.change.abc import ChangeStoreABC
 from jupyter_publishing_service.collaborator.abc import CollaboratorStoreABC
-from jupyter_publishing_service.collaborator.sql import SQLCollaboratorStore
 from jupyter_publishing_service.file.abc import FileStoreABC
-from jupyter_publishing_service.file.sql import SQLFileStore
+from jupyter_publishing_service.group.abc import GroupStoreABC
+from jupyter_publishing_service.invalidation.abc import InvalidationBusABC
+from jupyter_publishing_service.invalidation.local import CHANGES, FILES
+from jupyter_publishing_service.limits import LIMIT_BREACHES, too_large
 from jupyter_publishing_service.metadata.abc import MetadataStoreABC
-from jupyter_publishing_service.metadata.sql import SQLMetadataStore
+from jupyter_publishing_service.metrics import time_methods
+from jupyter_publishing_service.upload.abc import UploadStoreABC
 from jupyter_publishing_service.user.abc import UserStoreABC
-from jupyter_publishing_service.user.sql import SQLUserStore
-
-from ..models.rest import SharedFileRequestModel, SharedFileResponseModel
+from jupyter_publishing_service.version.abc import VersionStoreABC
+
+from ..models.rest import (
+    ChangeKind,
+    FileChangesModel,
+    FileVersionModel,
+    GroupModel,
+    OutputsMode,
+    SearchRanking,
+    SharedFileRequestModel,
+    SharedFileResponseModel,
+)
 from ..models.sql import (
     Collaborator,
     CollaboratorRole,
+    Group,
+    GroupRole,
     JupyterContentsModel,
     Role,
     SharedFileMetadata,
 )
+from ..serialization import JSON_MEDIA_TYPE, dumps, encode
 from .abc import StorageManagerABC
+from .cache import ResponseCache
+
+# The stores timed by `instrument`, by name.
+STORES = (
+    "authorization_store",
+    "metadata_store",
+    "collaborator_store",
+    "file_store",
+    "user_store",
+    "attachment_store",
+    "version_store",
+    "upload_store",
+    "group_store",
+    "change_store",
+)
+
+
+def _feeds(names: Iterable[str], groups: Iterable[str]) -> Set[str]:
+    """The change feeds of the given collaborators and groups."""
+    return {f"user:{name}" for name in names} | {f"group:{group}" for group in groups}
+
+
+async def _call_hook(obj, name: str):
+    """Call an optional hook (e.g. `start`) if `obj` has it. Stores registered
+    as virtual subclasses of their ABC don't inherit the ABC's no-op.
+    """
+    hook = getattr(obj, name, None)
+    if hook is not None:
+        await hook()
 
 
 class BaseStorageManager(LoggingConfigurable):
@@ -31,31 +86,31 @@ class BaseStorageManager(LoggingConfigurable):
 
     @default("authorization_store_class")
     def _default_authorization_store_class(self):
-        return SQLRoleBasedAuthorizer
+        return "jupyter_publishing_service.authorizer.sqlrbac.SQLRoleBasedAuthorizer"
 
     metadata_store_class = Type(klass=MetadataStoreABC).tag(config=True)
 
     @default("metadata_store_class")
     def _default_metadata_store_class(self):
-        return SQLMetadataStore
+        return "jupyter_publishing_service.metadata.sql.SQLMetadataStore"
 
     collaborator_store_class = Type(klass=CollaboratorStoreABC).tag(config=True)
 
     @default("collaborator_store_class")
     def _default_collaborator_store_class(self):
-        return SQLCollaboratorStore
+        return "jupyter_publishing_service.collaborator.sql.SQLCollaboratorStore"
 
     file_store_class = Type(klass=FileStoreABC).tag(config=True)
 
     @default("file_store_class")
     def _default_file_store_class(self):
-        return SQLFileStore
+        return "jupyter_publishing_service.file.sql.SQLFileStore"
 
     user_store_class = Type(klass=UserStoreABC).tag(config=True)
 
     @default("user_store_class")
     def _default_user_store_class(self):
-        return SQLUserStore
+        return "jupyter_publishing_service.user.sql.SQLUserStore"
 
     authorization_store: AuthorizerABC = Instance(
         klass="jupyter_publishing_service.authorizer.abc.AuthorizerABC",
@@ -82,40 +137,297 @@ class BaseStorageManager(LoggingConfigurable):
         allow_none=True,
     )
 
+    attachment_store_class = Type(klass=AttachmentStoreABC).tag(config=True)
+
+    @default("attachment_store_class")
+    def _default_attachment_store_class(self):
+        return "jupyter_publishing_service.attachment.sql.SQLAttachmentStore"
+
+    attachment_store: AttachmentStoreABC = Instance(
+        klass="jupyter_publishing_service.attachment.abc.AttachmentStoreABC",
+        allow_none=True,
+    )
+
+    version_store_class = Type(klass=VersionStoreABC).tag(config=True)
+
+    @default("version_store_class")
+    def _default_version_store_class(self):
+        return "jupyter_publishing_service.version.sql.SQLVersionStore"
+
+    version_store: VersionStoreABC = Instance(
+        klass="jupyter_publishing_service.version.abc.VersionStoreABC",
+        allow_none=True,
+    )
+
+    upload_store_class = Type(klass=UploadStoreABC).tag(config=True)
+
+    @default("upload_store_class")
+    def _default_upload_store_class(self):
+        return "jupyter_publishing_service.upload.local.LocalUploadStore"
+
+    upload_store: UploadStoreABC = Instance(
+        klass="jupyter_publishing_service.upload.abc.UploadStoreABC",
+        allow_none=True,
+    )
+
+    group_store_class = Type(klass=GroupStoreABC).tag(config=True)
+
+    @default("group_store_class")
+    def _default_group_store_class(self):
+        return "jupyter_publishing_service.group.sql.SQLGroupStore"
+
+    group_store: GroupStoreABC = Instance(
+        klass="jupyter_publishing_service.group.abc.GroupStoreABC",
+        allow_none=True,
+    )
+
+    change_store_class = Type(klass=ChangeStoreABC).tag(config=True)
+
+    @default("change_store_class")
+    def _default_change_store_class(self):
+        return "jupyter_publishing_service.change.sql.SQLChangeStore"
+
+    change_store: ChangeStoreABC = Instance(
+        klass="jupyter_publishing_service.change.abc.ChangeStoreABC",
+        allow_none=True,
+    )
+
+    change_retention = Float(
+        7 * 24 * 60 * 60,
+        help="Seconds to keep changes in the change feed. Clients that were away "
+        "for longer should list their files again.",
+    ).tag(config=True)
+
+    change_batch_delay = Float(
+        0.1,
+        help="Seconds to wait after a change before sending it to change feed "
+        "subscribers, so that changes made at about the same time go out together.",
+    ).tag(config=True)
+
+    change_poll_interval = Float(
+        60,
+        help="Check for changes at least this often (in seconds) while a change feed "
+        "subscriber waits, in case the invalidation bus missed one. Changes made in this "
+        "process, or delivered by the invalidation bus, wake up their recipients right "
+        "away. Lower this when running several processes with a bus that doesn't reach "
+        "the others (like the default `LocalInvalidationBus`). Set to 0 to disable.",
+    ).tag(config=True)
+
+    change_prune_interval = Float(
+        60 * 60,
+        help="Seconds between removals of changes older than `change_retention`.",
+    ).tag(config=True)
+
+    # The events of waiting change feed subscribers, by the feeds they follow.
+    _change_waiters = Instance(defaultdict, args=(set,))
+    _prune_task = Any(None)
+
+    invalidation_bus_class = Type(klass=InvalidationBusABC).tag(config=True)
+
+    @default("invalidation_bus_class")
+    def _default_invalidation_bus_class(self):
+        return "jupyter_publishing_service.invalidation.local.LocalInvalidationBus"
+
+    invalidation_bus: InvalidationBusABC = Instance(
+        klass="jupyter_publishing_service.invalidation.abc.InvalidationBusABC",
+        allow_none=True,
+    )
+
+    setup_on_start = Bool(
+        True,
+        help="Run `setup` (e.g. create the database schema) when the storage manager "
+        "starts. Turned off in worker processes, where it already ran once before "
+        "the workers were started.",
+    ).tag(config=True)
+
+    attachment_threshold = Integer(
+        64 * 1024,
+        help="Outputs larger than this many characters (e.g. base64 images) are "
+        "moved out of the notebook contents into the attachment store. "
+        "Set to 0 to keep all outputs inline.",
+    ).tag(config=True)
+
+    max_contents_size = Integer(
+        256 * 1024 * 1024,
+        help="The largest contents (in bytes, serialized as JSON) that can be stored, "
+        "whether they are sent with `POST`/`PATCH /sharing` or uploaded in chunks. "
+        "Larger contents are rejected with 413. Set to 0 to disable.",
+    ).tag(config=True)
+
+    response_cache_size = Integer(
+        64 * 1024 * 1024,
+        help="The total size (in bytes) of the serialized file responses cached in memory, "
+        "so that a file fetched by many users at once is only loaded once. "
+        "Set to 0 to disable.",
+    ).tag(config=True)
+
+    response_cache_ttl = Float(
+        10,
+        help="Seconds to keep a cached file response. Changes made through this process "
+        "invalidate its cache right away; this bounds how long changes made through "
+        "other processes (workers or replicas) can take to show. Set to 0 to keep "
+        "responses until they are evicted or invalidated.",
+    ).tag(config=True)
+
+    response_cache = Instance(ResponseCache, allow_none=True)
+
+    @default("response_cache")
+    def _default_response_cache(self):
+        if self.response_cache_size <= 0:
+            return None
+        return ResponseCache(self.response_cache_size, ttl=self.response_cache_ttl)
+
+    def _invalidate(self, file_id: str):
+        self.invalidation_bus.publish(FILES, [file_id])
+
+    def _files_changed(self, file_ids):
+        if self.response_cache is not None:
+            for file_id in file_ids:
+                self.response_cache.invalidate(file_id)
+
+    def _feeds_changed(self, feeds):
+        for feed in feeds:
+            for event in self._change_waiters.get(feed, ()):
+                event.set()
+
+    async def _add_change(
+        self, file_id: str, kind: ChangeKind, names: Iterable[str], groups: Iterable[str] = ()
+    ):
+        """Record a change, and wake up the change feed subscribers it is for."""
+        await self.change_store.add(file_id, kind, names, groups)
+        self.invalidation_bus.publish(CHANGES, _feeds(names, groups))
+
     def initialize(self):
+        self.invalidation_bus = self.invalidation_bus_class(parent=self, log=self.log)
+        self.invalidation_bus.subscribe(FILES, self._files_changed)
+        self.invalidation_bus.subscribe(CHANGES, self._feeds_changed)
         self.authorization_store = self.authorization_store_class(parent=self, log=self.log)
         self.metadata_store = self.metadata_store_class(parent=self, log=self.log)
         self.collaborator_store = self.collaborator_store_class(parent=self, log=self.log)
         self.file_store = self.file_store_class(parent=self, log=self.log)
         self.user_store = self.user_store_class(parent=self, log=self.log)
+        self.attachment_store = self.attachment_store_class(parent=self, log=self.log)
+        self.version_store = self.version_store_class(parent=self, log=self.log)
+        self.upload_store = self.upload_store_class(parent=self, log=self.log)
+        self.group_store = self.group_store_class(parent=self, log=self.log)
+        self.change_store = self.change_store_class(parent=self, log=self.log)
+
+    def instrument(self):
+        for name in STORES:
+            time_methods(getattr(self, name), name)
+
+    async def setup(self):
+        # Subclasses can use this to initialize a e.g. database.
+        ...
 
     async def start(self):
-        # Don't do anything here. Subclasses can use this to initialize a e.g. database.
-        ...
+        if self.setup_on_start:
+            await self.setup()
+        await _call_hook(self.invalidation_bus, "start")
+        self._prune_task = asyncio.ensure_future(self._prune_changes_forever())
+        await _call_hook(self.user_store, "start")
+        await _call_hook(self.group_store, "start")
+
+    async def stop(self):
+        # Subclasses can extend this to e.g. close database connections.
+        if self._prune_task is not None:
+            self._prune_task.cancel()
+            self._prune_task = None
+        await _call_hook(self.invalidation_bus, "stop")
+
+    async def _prune_changes_forever(self):
+        while True:
+            try:
+                before = datetime.now() - timedelta(seconds=self.change_retention)
+                await self.change_store.prune(before)
+            except Exception:
+                self.log.exception("Failed to remove old changes.")
+            await asyncio.sleep(self.change_prune_interval)
 
     async def authorize(self, user: Collaborator, file_id: str) -> bool:
         return await self.authorization_store.authorize(user, file_id)
 
+    async def _store_contents(self, file_id: str, contents: JupyterContentsModel) -> int:
+        """Move large outputs to the attachment store, then store the contents
+        and record them as a new version.
+
+        Returns the new version number.
+        """
+        content, attachments = externalize_outputs(
+            file_id, contents.content, self.attachment_threshold
+        )
+        if attachments:
+            await self.attachment_store.add(file_id, attachments)
+            contents.content = content
+        await self.file_store.add(file_id, contents)
+        return await self.version_store.add(file_id, contents)
+
+    async def _inline_contents(self, file_id: str, contents: JupyterContentsModel):
+        attachment_ids = referenced_attachments(contents.content)
+        if attachment_ids:
+            attachments = await self.attachment_store.list(file_id, list(attachment_ids))
+            inline_outputs(contents.content, attachments)
+
     async def get(
-        self, file_id: str, collaborators: bool = False, contents: bool = False
+        self,
+        file_id: str,
+        collaborators: bool = False,
+        contents: bool = False,
+        outputs: OutputsMode = OutputsMode.inline,
     ) -> SharedFileResponseModel:
         metadata: SharedFileMetadata = await self.metadata_store.get(file_id)
-        collaborator_roles = None
+        if metadata is None:
+            raise HTTPException(status_code=404, detail="The file ID requested does not exist.")
+        collaborator_roles = group_roles = None
         if collaborators:
             collaborator_roles: List[CollaboratorRole] = await self.collaborator_store.get(file_id)
+            group_roles: List[GroupRole] = await self.group_store.get_grants(file_id)
         file = None
         if contents:
             file: JupyterContentsModel = await self.file_store.get(file_id=file_id)
+            if file and outputs == OutputsMode.inline:
+                await self._inline_contents(file_id, file)
         return SharedFileResponseModel(
-            metadata=metadata, collaborator_roles=collaborator_roles, contents=file
+            metadata=metadata,
+            collaborator_roles=collaborator_roles,
+            group_roles=group_roles,
+            contents=file,
         )
 
+    async def get_serialized(
+        self,
+        file_id: str,
+        collaborators: bool = False,
+        contents: bool = False,
+        outputs: OutputsMode = OutputsMode.inline,
+        media_type: str = JSON_MEDIA_TYPE,
+    ) -> bytes:
+        """Like `get`, but returns the response serialized as JSON (or
+        MessagePack), from the response cache when possible.
+        """
+
+        async def load() -> bytes:
+            response = await self.get(
+                file_id, collaborators=collaborators, contents=contents, outputs=outputs
+            )
+            return encode(response, media_type)
+
+        if self.response_cache is None:
+            return await load()
+        key = (file_id, collaborators, contents, outputs, media_type)
+        return await self.response_cache.get(key, load)
+
     async def add(self, request_model: SharedFileRequestModel) -> SharedFileResponseModel:
         """
         Store a new shared file.
 
         Returns a SharedFileResponse without contents and collaborators.
         """
+        await self._check_groups(request_model)
+        self._check_contents_size(request_model, "add")
+        if request_model.contents:
+            # The first version of the contents.
+            request_model.metadata.version = 1
         metadata = await self.metadata_store.add(request_model.metadata)
         if request_model.collaborators:
             for collaborator in request_model.collaborators:
@@ -128,39 +440,272 @@ class BaseStorageManager(LoggingConfigurable):
                 await self.collaborator_store.add(
                     request_model.metadata.id, collaborator, request_model.roles
                 )
+            await self.user_store.add_users(request_model.collaborators)
+        await self._grant_groups(metadata.id, request_model)
         if request_model.contents:
-            await self.file_store.add(metadata.id, request_model.contents)
+            version = await self._store_contents(metadata.id, request_model.contents)
+            if version != metadata.version:
+                metadata.version = version
+                metadata = await self.metadata_store.update(metadata)
+        # A new file is shared with exactly who the request grants roles to.
+        names, groups = self._granted(request_model, author=metadata.author)
+        await self._add_change(metadata.id, ChangeKind.created, names | {metadata.author}, groups)
+        self._invalidate(metadata.id)
         return SharedFileResponseModel(metadata=metadata)
 
     async def delete(self, file_id: str):
+        try:
+            await self._delete(file_id)
+        finally:
+            self._invalidate(file_id)
+
+    async def _delete(self, file_id: str):
         # Need to remove collaborators for this file.
         collaborator_roles = await self.collaborator_store.get(file_id=file_id)
+        group_roles = await self.group_store.get_grants(file_id)
         # NOTE: we should refactor this to delete as a batch, not one-by-one.
         for cr in collaborator_roles:
             await self.collaborator_store.delete(file_id, Collaborator(name=cr.name))
-        # Delete file and metadata
+        await self.group_store.delete_grants(file_id)
+        # Delete file, its attachments and metadata
         await self.file_store.delete(file_id)
+        await self.attachment_store.delete(file_id)
+        await self.version_store.delete(file_id)
         await self.metadata_store.delete(file_id)
+        names = {cr.name for cr in collaborator_roles}
+        groups = {gr.group for gr in group_roles}
+        await self._add_change(file_id, ChangeKind.deleted, names, groups)
 
     async def update(
         self, file_id: str, request_model: SharedFileRequestModel
     ) -> SharedFileResponseModel:
+        try:
+            return await self._update(file_id, request_model)
+        finally:
+            self._invalidate(file_id)
+
+    async def _recipients(self, file_id: str) -> Tuple[Set[str], Set[str]]:
+        """The collaborators and groups a file is shared with."""
+        collaborator_roles = await self.collaborator_store.get(file_id)
+        group_roles = await self.group_store.get_grants(file_id)
+        return {cr.name for cr in collaborator_roles}, {gr.group for gr in group_roles}
+
+    def _granted(
+        self, request_model: SharedFileRequestModel, author: Optional[str] = None
+    ) -> Tuple[Set[str], Set[str]]:
+        """The collaborators and groups a request grants roles to (the
+        author always gets one). Roles are only ever added by requests, so
+        these are who a file is shared with after it, besides whom before.
+        """
+        roles = bool(request_model.roles)
+        names = {
+            collaborator.name
+            for collaborator in request_model.collaborators or []
+            if roles or collaborator.name == author
+        }
+        groups = {group.name for group in request_model.groups or []} if roles else set()
+        return names, groups
+
+    async def _update(
+        self, file_id: str, request_model: SharedFileRequestModel
+    ) -> SharedFileResponseModel:
+        await self._check_groups(request_model)
+        self._check_contents_size(request_model, "update")
+        names, groups = await self._recipients(file_id)
+        if request_model.contents:
+            version = await self._store_contents(file_id, request_model.contents)
+            request_model.metadata.version = version
+        else:
+            # Only contents make a new version; keep the stored one, whatever was sent.
+            stored = await self.metadata_store.get(file_id)
+            if stored is not None:
+                request_model.metadata.version = stored.version
         metadata = await self.metadata_store.update(request_model.metadata)
         if request_model.collaborators:
-            await self.collaborator_store.update(
-                file_id, request_model.collaborators, request_model.roles
-            )
-        if request_model.contents:
-            await self.file_store.add(file_id, request_model.contents)
+            for collaborator in request_model.collaborators:
+                await self.collaborator_store.update(
+                    file_id, collaborator, request_model.roles or []
+                )
+            await self.user_store.add_users(request_model.collaborators)
+        await self._grant_groups(file_id, request_model)
+        await self._add_change(file_id, ChangeKind.updated, names, groups)
+        new_names, new_groups = self._granted(request_model)
+        new_names, new_groups = new_names - names, new_groups - groups
+        if new_names or new_groups:
+            await self._add_change(file_id, ChangeKind.shared, new_names, new_groups)
         return SharedFileResponseModel(metadata=metadata)
 
+    def _check_contents_size(self, request_model: SharedFileRequestModel, rule: str):
+        """Reject contents larger than `max_contents_size`, before any of the
+        request is written.
+        """
+        if not self.max_contents_size or not request_model.contents:
+            return
+        if len(dumps(request_model.contents)) > self.max_contents_size:
+            LIMIT_BREACHES.inc(limit="contents", rule=rule)
+            raise too_large(self.max_contents_size, "Contents")
+
+    async def _check_groups(self, request_model: SharedFileRequestModel):
+        """Reject a request sharing with groups that don't exist,
+        before any of it is written.
+        """
+        for group in request_model.groups or []:
+            if await self.group_store.get(group.name) is None:
+                raise HTTPException(
+                    status_code=400, detail=f"The group {group.name!r} does not exist."
+                )
+
+    async def _grant_groups(self, file_id: str, request_model: SharedFileRequestModel):
+        for group in request_model.groups or []:
+            await self.group_store.grant(file_id, group.name, request_model.roles or [])
+
+    async def update_contents(
+        self, file_id: str, contents: JupyterContentsModel
+    ) -> SharedFileResponseModel:
+        """Store new contents for an existing file."""
+        metadata: SharedFileMetadata = await self.metadata_store.get(file_id)
+        if metadata is None:
+            raise HTTPException(status_code=404, detail="The file ID requested does not exist.")
+        try:
+            metadata.version = await self._store_contents(file_id, contents)
+            metadata.last_modified = datetime.now()
+            metadata = await self.metadata_store.update(metadata)
+            await self._add_change(file_id, ChangeKind.updated, *await self._recipients(file_id))
+        finally:
+            self._invalidate(file_id)
+        return SharedFileResponseModel(metadata=metadata)
+
+    async def commit_upload(self, upload_id: str, file_id: str) -> SharedFileResponseModel:
+        """Assemble a chunked upload into the contents of an existing file.
+
+        The upload is assembled in memory rather than streamed to the file
+        store: its contents are validated, their large outputs moved to the
+        attachment store and diffed against the previous version before
+        they are stored. So it takes the upload's size in raw bytes (freed
+        before storing) plus the parsed contents, and is bounded by
+        `max_contents_size` whether or not the upload store enforces it.
+        """
+        data = bytearray()
+        async for chunk in self.upload_store.read(upload_id):
+            data += chunk
+            if self.max_contents_size and len(data) > self.max_contents_size:
+                LIMIT_BREACHES.inc(limit="contents", rule="upload")
+                raise too_large(self.max_contents_size, "Upload")
+        contents = JupyterContentsModel.model_validate_json(data)
+        del data
+        response = await self.update_contents(file_id, contents)
+        await self.upload_store.delete(upload_id)
+        return response
+
+    async def list_changes(
+        self, user_id: str, cursor: Optional[int] = None, limit: int = 100, wait: float = 0
+    ) -> FileChangesModel:
+        """List the changes to files shared with a user after `cursor` (or from now,
+        if not given). Waits up to `wait` seconds for changes, if there are none yet.
+        """
+        if cursor is None:
+            cursor = await self.change_store.latest()
+        deadline = time.monotonic() + wait
+        while True:
+            groups = await self.group_store.get_groups(user_id)
+            feeds = _feeds([user_id], groups)
+            # Wait for changes to the user's feeds only, starting before
+            # looking for changes, so none are missed.
+            event = asyncio.Event()
+            for feed in feeds:
+                self._change_waiters[feed].add(event)
+            try:
+                changes = await self.change_store.list(user_id, groups, cursor, limit)
+                remaining = deadline - time.monotonic()
+                if changes or remaining <= 0:
+                    break
+                if self.change_poll_interval:
+                    remaining = min(remaining, self.change_poll_interval)
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=remaining)
+                    await asyncio.sleep(self.change_batch_delay)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                for feed in feeds:
+                    waiters = self._change_waiters[feed]
+                    waiters.discard(event)
+                    if not waiters:
+                        del self._change_waiters[feed]
+        if changes:
+            cursor = changes[-1].cursor
+        return FileChangesModel(cursor=cursor, changes=changes)
+
+    async def list_versions(self, file_id: str) -> List[FileVersionModel]:
+        return await self.version_store.list(file_id)
+
+    async def get_version(
+        self, file_id: str, version: int, outputs: OutputsMode = OutputsMode.inline
+    ) -> Optional[JupyterContentsModel]:
+        file = await self.version_store.get(file_id, version)
+        if file and outputs == OutputsMode.inline:
+            await self._inline_contents(file_id, file)
+        return file
+
     async def list(self, user_id: str) -> List[SharedFileResponseModel]:
-        file_ids = await self.collaborator_store.list(user_id)
-        metadatas = await self.metadata_store.list(file_ids)
+        file_ids = set(await self.collaborator_store.list(user_id))
+        groups = await self.group_store.get_groups(user_id)
+        file_ids.update(await self.group_store.list_files(groups))
+        metadatas = await self.metadata_store.list(list(file_ids))
         return [SharedFileResponseModel(metadata=m) for m in metadatas]
 
-    async def search_users(self, substring: Optional[str]) -> List[Collaborator]:
-        return await self.user_store.search_users(substring)
+    async def search_users(
+        self,
+        substring: Optional[str],
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Collaborator]:
+        return await self.user_store.search_users(
+            substring, limit=limit, case_sensitive=case_sensitive, ranking=ranking
+        )
+
+    async def search_groups(
+        self,
+        substring: Optional[str],
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Group]:
+        return await self.group_store.search(
+            substring, limit=limit, case_sensitive=case_sensitive, ranking=ranking
+        )
+
+    async def get_group(self, name: str) -> GroupModel:
+        group = await self.group_store.get(name)
+        if group is None:
+            raise HTTPException(status_code=404, detail="The group requested does not exist.")
+        members = await self.group_store.list_members(name)
+        return GroupModel(name=group.name, owner=group.owner, members=members)
+
+    async def _get_owned_group(self, name: str, user_id: str) -> Group:
+        group = await self.group_store.get(name)
+        if group is None:
+            raise HTTPException(status_code=404, detail="The group requested does not exist.")
+        if group.owner != user_id:
+            raise HTTPException(status_code=403, detail="Only the group's owner can change it.")
+        return group
+
+    async def add_group_members(
+        self, name: str, user_id: str, members: List[Collaborator]
+    ) -> GroupModel:
+        """Add members to a group, creating it (owned by `user_id`) if it doesn't exist."""
+        if await self.group_store.get(name) is None:
+            await self.group_store.add(Group(name=name, owner=user_id))
+        await self._get_owned_group(name, user_id)
+        await self.group_store.add_members(name, [member.name for member in members])
+        await self.user_store.add_users(members)
+        return await self.get_group(name)
+
+    async def remove_group_member(self, name: str, user_id: str, member: str) -> GroupModel:
+        await self._get_owned_group(name, user_id)
+        await self.group_store.remove_member(name, member)
+        return await self.get_group(name)
 
 
 StorageManagerABC.register(BaseStorageManager)
@@ -0,0 +1,114 @@
+"""
+A cache of serialized `get` responses, for files that many users fetch at once.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Set, Tuple
+
+from jupyter_publishing_service.metrics import counter, gauge
+
+CACHE_REQUESTS = counter(
+    "publishing_response_cache_requests",
+    "Requests for cached file responses. A miss loaded the response; a shared "
+    "miss waited for a load that was already in flight.",
+    ("result",),
+)
+CACHE_SIZE = gauge("publishing_response_cache_size_bytes", "Size of the cached file responses.")
+
+# A cache key starts with the ID of the file it belongs to.
+Key = Tuple[Hashable, ...]
+
+
+class ResponseCache:
+    """An LRU cache of serialized responses, bounded by their total size.
+
+    Concurrent misses for the same key share one load. Invalidating a file
+    drops its entries and detaches loads in flight for it, so a load that
+    may have read the old data is never cached. Entries also expire after
+    `ttl` seconds (if set), which bounds how long other processes, whose
+    writes this cache doesn't see, can serve stale responses.
+    """
+
+    def __init__(self, max_size: int, ttl: float = 0):
+        self.max_size = max_size
+        self.ttl = ttl
+        # Responses larger than this are not cached, so that a few
+        # huge files can't evict everything else.
+        self.max_entry_size = max_size // 4
+        self.size = 0
+        self._entries: "OrderedDict[Key, Tuple[bytes, float]]" = OrderedDict()
+        self._keys: Dict[Hashable, Set[Key]] = {}
+        self._loading: Dict[Key, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self._entries
+
+    async def get(self, key: Key, load: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Get a response from the cache, or load (and cache) it."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            data, expires = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                CACHE_REQUESTS.inc(result="hit")
+                return data
+            self._remove(key)
+        task = self._loading.get(key)
+        if task is None:
+            CACHE_REQUESTS.inc(result="miss")
+            task = self._loading[key] = asyncio.ensure_future(self._load(key, load))
+        else:
+            CACHE_REQUESTS.inc(result="shared")
+        # Don't cancel the load for everyone when one request is cancelled.
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Key, load: Callable[[], Awaitable[bytes]]) -> bytes:
+        task = asyncio.current_task()
+        try:
+            data = await load()
+        finally:
+            # Still current, unless the file was invalidated meanwhile.
+            current = self._loading.get(key) is task
+            if current:
+                del self._loading[key]
+        if current:
+            self._put(key, data)
+        return data
+
+    def _put(self, key: Key, data: bytes):
+        if len(data) > self.max_entry_size:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else float("inf")
+        self._entries[key] = (data, expires)
+        self._keys.setdefault(key[0], set()).add(key)
+        self.size += len(data)
+        while self.size > self.max_size:
+            self._remove(next(iter(self._entries)))
+        CACHE_SIZE.set(self.size)
+
+    def _remove(self, key: Key):
+        data, _ = self._entries.pop(key)
+        self.size -= len(data)
+        keys = self._keys[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys[key[0]]
+        CACHE_SIZE.set(self.size)
+
+    def invalidate(self, file_id: Hashable):
+        """Drop all cached responses for a file, e.g. after it changed."""
+        for key in list(self._keys.get(file_id, ())):
+            self._remove(key)
+        for key in [key for key in self._loading if key[0] == file_id]:
+            del self._loading[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._keys.clear()
+        self._loading.clear()
+        self.size = 0
+        CACHE_SIZE.set(0)
@@ -1,30 +1,59 @@
+import hashlib
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from datetime import datetime
+from typing import AsyncGenerator, Optional
 
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
 from sqlmodel import SQLModel, select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from traitlets import Instance, Unicode
+from traitlets import Bool, Float, Instance, Unicode
 
-from jupyter_publishing_service.models.sql import Permission, Role
+from jupyter_publishing_service.admission import DB_POOL_WAIT, DecayingAverage
+from jupyter_publishing_service.metrics import REGISTRY, gauge
+from jupyter_publishing_service.models.sql import Permission, Role, SchemaVersion
+from jupyter_publishing_service.queries import track_queries
 
 from .abc import StorageManagerABC
 from .base import BaseStorageManager
 
+# Bump this when the seeded roles and permissions change.
+SEED_VERSION = "1"
+
+POOL_SIZE = gauge("publishing_db_pool_size", "Connections the database pool keeps open.")
+POOL_CHECKED_OUT = gauge("publishing_db_pool_checked_out", "Database connections currently in use.")
+POOL_OVERFLOW = gauge(
+    "publishing_db_pool_overflow", "Database connections open beyond the pool size."
+)
+
 
 class SQLStorageManager(BaseStorageManager):
 
-    database_path = Unicode(default_value="sqlite+aiosqlite:///database.db")
+    database_path = Unicode(
+        default_value="sqlite+aiosqlite:///database.db", help="The SQLAlchemy database URL."
+    ).tag(config=True)
+    echo = Bool(True, help="Log every SQL statement.").tag(config=True)
+
+    slow_query_threshold = Float(
+        0.1,
+        help="Log queries that take longer than this many seconds, with the types "
+        "(not the values) of their parameters. Set to 0 to disable.",
+    ).tag(config=True)
+
     _async_engine = Instance(AsyncEngine, allow_none=True)
+    _pool_wait = Instance(DecayingAverage, args=())
 
     def initialize(self):
         self._async_engine = create_async_engine(
             self.database_path,
-            echo=True,
+            echo=self.echo,
             future=True,
             connect_args={"check_same_thread": False},
         )
+        track_queries(self._async_engine.sync_engine, self.slow_query_threshold, self.log)
         super().initialize()
 
     @asynccontextmanager
@@ -33,8 +62,17 @@ class SQLStorageManager(BaseStorageManager):
             self._async_engine, class_=AsyncSession, expire_on_commit=False
         )
         async with async_session() as session:
+            # Connect right away, to measure how long that takes.
+            start = time.perf_counter()
+            await session.connection()
+            wait = time.perf_counter() - start
+            DB_POOL_WAIT.observe(wait)
+            self._pool_wait.observe(wait)
             yield session
 
+    def pool_wait(self) -> float:
+        return self._pool_wait.value()
+
     async def _create_roles_and_permissions(self):
         reader = Role(name="READER")
         writer = Role(name="WRITER")
@@ -56,10 +94,57 @@ class SQLStorageManager(BaseStorageManager):
             session.add(execute)
             await session.commit()
 
-    async def start(self):
+    def schema_version(self) -> str:
+        """A fingerprint of the schema (as created by this dialect) and the seed data."""
+        dialect = self._async_engine.dialect
+        digest = hashlib.sha256(SEED_VERSION.encode())
+        for table in SQLModel.metadata.sorted_tables:
+            digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _get_schema_version(connection) -> Optional[str]:
+        if not inspect(connection).has_table(SchemaVersion.__tablename__):
+            return None
+        row = connection.execute(select(SchemaVersion.version)).first()
+        return row[0] if row else None
+
+    async def setup(self):
+        """Create the schema and seed roles and permissions, unless
+        the database was already set up with the same schema version.
+        """
+        version = self.schema_version()
         async with self._async_engine.begin() as conn:
+            if await conn.run_sync(self._get_schema_version) == version:
+                self.log.debug("Database schema is up to date (%s).", version)
+                return
             await conn.run_sync(SQLModel.metadata.create_all)
-            await self._create_roles_and_permissions()
+        await self._create_roles_and_permissions()
+        async with self.get_session() as session:
+            marker = await session.get(SchemaVersion, 1) or SchemaVersion()
+            marker.version = version
+            marker.updated = datetime.now()
+            session.add(marker)
+            await session.commit()
+
+    async def stop(self):
+        await super().stop()
+        await self._async_engine.dispose()
+
+    def instrument(self):
+        super().instrument()
+        REGISTRY.add_collector(self._collect_pool_metrics)
+
+    def _collect_pool_metrics(self):
+        # Not every pool (e.g. SQLite's StaticPool) has a size.
+        pool = self._async_engine.pool
+        for metric, stat in (
+            (POOL_SIZE, "size"),
+            (POOL_CHECKED_OUT, "checkedout"),
+            (POOL_OVERFLOW, "overflow"),
+        ):
+            if hasattr(pool, stat):
+                metric.set(getattr(pool, stat)())
 
 
 StorageManagerABC.register(SQLStorageManager)
@@ -27,16 +27,17 @@ class FromEnvMixin:
             help = help_prefix
         else:
             help = help_prefix + help
-        # The actual traittype is second in the MRO.
-        traittype = self.__class__.mro()[2]
-        # traittype.__init__(self, help=help, *args, **kwargs)
+        # Initialize the actual traittype (next in the MRO) without a
+        # default value, so the dynamic default below is used.
+        super().__init__(*args, help=help, **kwargs)
 
     def make_dynamic_default(self):
         # Make sure to dynamically load the default when the
         # the trait is called.
         env_value = os.environ.get(self.envvar_name, None)
         if type(env_value) == str:
-            env_value = env_value
+            # Cast e.g. "4" to an int for integer traits.
+            env_value = self.from_string(env_value)
         if env_value is None and self._default_value_if_no_envvar is not Undefined:
             return self._default_value_if_no_envvar
 
@@ -48,8 +49,8 @@ class UnicodeFromEnv(FromEnvMixin, Unicode):
 
 
 class IntFromEnv(FromEnvMixin, Int):
-    """Unicode Trait that pulls default value from environment variable."""
+    """Int Trait that pulls default value from environment variable."""
 
 
 class BoolFromEnv(FromEnvMixin, Bool):
-    """Unicode Trait that pulls default value from environment variable."""
+    """Bool Trait that pulls default value from environment variable."""
@@ -0,0 +1,48 @@
+from abc import ABCMeta, abstractmethod
+from typing import AsyncIterator, Optional
+
+from jupyter_publishing_service.models.rest import UploadSessionModel
+
+
+class UploadStoreABC(metaclass=ABCMeta):
+    @abstractmethod
+    async def create(
+        self, owner: str, size: Optional[int] = None, chunk_size: Optional[int] = None
+    ) -> UploadSessionModel:
+        """
+        Start a new chunked upload owned by the given user
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def get(self, upload_id: str) -> Optional[UploadSessionModel]:
+        """
+        Get an upload, including the chunks received so far
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def add_chunk(
+        self, upload_id: str, index: int, chunk: AsyncIterator[bytes], checksum: str
+    ) -> str:
+        """
+        Store a chunk, streaming it from the given iterator
+
+        The chunk is rejected if its SHA-256 checksum doesn't
+        match the given hex digest. Returns the checksum.
+        """
+        return NotImplemented
+
+    @abstractmethod
+    def read(self, upload_id: str) -> AsyncIterator[bytes]:
+        """
+        Stream the assembled upload, chunk by chunk
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def delete(self, upload_id: str):
+        """
+        Remove the upload and all its chunks
+        """
+        return NotImplemented
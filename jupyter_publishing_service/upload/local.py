@@ -0,0 +1,205 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from anyio import Path, open_file
+from starlette.exceptions import HTTPException
+from traitlets import Integer, Unicode, default
+from traitlets.config import LoggingConfigurable
+
+from jupyter_publishing_service.limits import LIMIT_BREACHES, too_large
+from jupyter_publishing_service.models.rest import UploadSessionModel
+
+from .abc import UploadStoreABC
+
+SESSION_FILE = "session.json"
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Chunks are read back from disk in blocks of this size.
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class LocalUploadStore(LoggingConfigurable):
+    """Stores upload chunks as files on the local filesystem.
+
+    Each chunk is streamed to disk as it arrives, so a chunk is
+    never held in memory in full.
+    """
+
+    upload_dir = Unicode(help="The directory that holds uploads in progress.").tag(config=True)
+
+    @default("upload_dir")
+    def _default_upload_dir(self):
+        return os.path.join(tempfile.gettempdir(), "jupyter-publishing-uploads")
+
+    default_chunk_size = Integer(
+        4 * 1024 * 1024, help="The chunk size used when the client doesn't ask for one."
+    ).tag(config=True)
+
+    max_chunk_size = Integer(
+        16 * 1024 * 1024, help="The largest chunk size a client can ask for."
+    ).tag(config=True)
+
+    max_contents_size = Integer(
+        help="The largest contents (in bytes) that can be uploaded in chunks. "
+        "Defaults to the storage manager's `max_contents_size`. Set to 0 to disable.",
+    ).tag(config=True)
+
+    @default("max_contents_size")
+    def _default_max_contents_size(self):
+        return getattr(self.parent, "max_contents_size", 256 * 1024 * 1024)
+
+    upload_expiry = Integer(
+        24 * 60 * 60,
+        help="Uploads that are not committed within this many seconds are removed.",
+    ).tag(config=True)
+
+    def _path(self, upload_id: str, name: Optional[str] = None) -> Path:
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            raise HTTPException(status_code=404, detail="The upload requested does not exist.")
+        path = Path(self.upload_dir) / upload_id
+        return path / name if name else path
+
+    async def _remove_expired(self):
+        root = Path(self.upload_dir)
+        if not await root.exists():
+            return
+        expired = time.time() - self.upload_expiry
+        async for path in root.iterdir():
+            session = path / SESSION_FILE
+            if await session.exists() and (await session.stat()).st_mtime < expired:
+                await self.delete(path.name)
+
+    async def create(
+        self, owner: str, size: Optional[int] = None, chunk_size: Optional[int] = None
+    ) -> UploadSessionModel:
+        await self._remove_expired()
+        chunk_size = chunk_size or self.default_chunk_size
+        if self.max_contents_size and size and size > self.max_contents_size:
+            self._contents_too_large()
+        if not 0 < chunk_size <= self.max_chunk_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"The chunk size must be between 1 and {self.max_chunk_size} bytes.",
+            )
+        upload = UploadSessionModel(
+            id=uuid.uuid4().hex,
+            owner=owner,
+            size=size,
+            chunk_size=chunk_size,
+            created=datetime.now(),
+        )
+        path = self._path(upload.id)
+        await path.mkdir(parents=True)
+        await (path / SESSION_FILE).write_text(upload.model_dump_json(exclude={"chunks"}))
+        return upload
+
+    def _contents_too_large(self):
+        LIMIT_BREACHES.inc(limit="contents", rule="upload")
+        raise too_large(self.max_contents_size, "Upload")
+
+    async def _checksums(self, upload_id: str) -> dict:
+        checksums = {}
+        async for path in self._path(upload_id).glob("*.sha256"):
+            checksums[int(path.stem)] = await path.read_text()
+        return checksums
+
+    async def get(self, upload_id: str) -> Optional[UploadSessionModel]:
+        session = self._path(upload_id, SESSION_FILE)
+        if not await session.exists():
+            return None
+        upload = UploadSessionModel.model_validate_json(await session.read_text())
+        upload.chunks = await self._checksums(upload_id)
+        return upload
+
+    def _number_of_chunks(self, upload: UploadSessionModel) -> Optional[int]:
+        if upload.size is None:
+            return None
+        return max(1, -(-upload.size // upload.chunk_size))
+
+    async def add_chunk(
+        self, upload_id: str, index: int, chunk: AsyncIterator[bytes], checksum: str
+    ) -> str:
+        upload = await self.get(upload_id)
+        if upload is None:
+            raise HTTPException(status_code=404, detail="The upload requested does not exist.")
+        number_of_chunks = self._number_of_chunks(upload)
+        if index < 0 or (number_of_chunks is not None and index >= number_of_chunks):
+            raise HTTPException(status_code=400, detail=f"Invalid chunk index {index}.")
+        name = f"{index:06d}"
+        partial = self._path(upload_id, f"{name}.{uuid.uuid4().hex}.partial")
+        digest = hashlib.sha256()
+        size = 0
+        # Where this chunk starts in the assembled contents.
+        offset = index * upload.chunk_size
+        try:
+            async with await open_file(partial, "wb") as f:
+                async for data in chunk:
+                    size += len(data)
+                    if size > upload.chunk_size:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"Chunks must not be larger than {upload.chunk_size} bytes.",
+                        )
+                    if self.max_contents_size and offset + size > self.max_contents_size:
+                        self._contents_too_large()
+                    digest.update(data)
+                    await f.write(data)
+            if digest.hexdigest() != checksum.lower():
+                raise HTTPException(status_code=400, detail="The chunk's checksum doesn't match.")
+            await partial.rename(self._path(upload_id, f"{name}.chunk"))
+        finally:
+            if await partial.exists():
+                await partial.unlink()
+        await self._path(upload_id, f"{name}.sha256").write_text(digest.hexdigest())
+        return digest.hexdigest()
+
+    async def _chunk_paths(self, upload: UploadSessionModel) -> List[Path]:
+        indices = sorted(upload.chunks)
+        number_of_chunks = self._number_of_chunks(upload)
+        if number_of_chunks is None:
+            number_of_chunks = len(indices)
+        missing = sorted(set(range(number_of_chunks)) - set(indices))
+        if missing or not indices:
+            raise HTTPException(
+                status_code=400, detail=f"The upload is missing chunks: {missing or [0]}."
+            )
+        paths = [self._path(upload.id, f"{index:06d}.chunk") for index in indices]
+        if upload.size is not None:
+            total = 0
+            for path in paths:
+                total += (await path.stat()).st_size
+            if total != upload.size:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Received {total} bytes, but the upload is {upload.size} bytes.",
+                )
+        return paths
+
+    async def read(self, upload_id: str) -> AsyncIterator[bytes]:
+        upload = await self.get(upload_id)
+        if upload is None:
+            raise HTTPException(status_code=404, detail="The upload requested does not exist.")
+        for path in await self._chunk_paths(upload):
+            async with await open_file(path, "rb") as f:
+                while True:
+                    data = await f.read(READ_BLOCK_SIZE)
+                    if not data:
+                        break
+                    yield data
+
+    async def delete(self, upload_id: str):
+        path = self._path(upload_id)
+        if not await path.exists():
+            return
+        async for child in path.iterdir():
+            await child.unlink()
+        await path.rmdir()
+
+
+UploadStoreABC.register(LocalUploadStore)
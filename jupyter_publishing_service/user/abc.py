@@ -1,12 +1,29 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 
-from jupyter_publishing_service.models.sql import Collaborator
+from jupyter_publishing_service.models.rest import SearchRanking
+from jupyter_publishing_service.models.sql import Collaborator, Group
 
 
 class UserStoreABC(ABC):
+    async def start(self):
+        """
+        Prepare the store, e.g. warm a cache. Called when the service starts,
+        if the store has it (stores registered with `UserStoreABC.register`
+        don't inherit this no-op).
+
+        This must be non-blocking co-routine
+        """
+        ...
+
     @abstractmethod
-    async def search_users(self, search_string: str) -> List[Collaborator]:
+    async def search_users(
+        self,
+        search_string: Optional[str],
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Collaborator]:
         """
         Search for users
 
@@ -16,6 +33,9 @@ class UserStoreABC(ABC):
 
         Args:
             search_string (dict): partial name or email address
+            limit (int): the maximum number of users to return
+            case_sensitive (bool): whether a prefix search is case sensitive
+            ranking (SearchRanking): prefix or fuzzy (ranked) matching
 
         Returns:
             users (List[Collaborator]): Must return a list of users
@@ -23,7 +43,13 @@ class UserStoreABC(ABC):
         return NotImplemented
 
     @abstractmethod
-    async def search_groups(self, search_string: str) -> List[Collaborator]:
+    async def search_groups(
+        self,
+        search_string: Optional[str],
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Group]:
         """
         Search for groups
 
@@ -33,8 +59,24 @@ class UserStoreABC(ABC):
 
         Args:
             search_string (dict): partial name or email address
+            limit (int): the maximum number of groups to return
+            case_sensitive (bool): whether a prefix search is case sensitive
+            ranking (SearchRanking): prefix or fuzzy (ranked) matching
 
         Returns:
+            groups (List[Group]): Must return a list of groups
+        """
+
+        return NotImplemented
+
+    @abstractmethod
+    async def add_users(self, users: List[Collaborator]):
         """
+        Make newly added collaborators searchable
 
+        This must be non-blocking co-routine
+
+        Args:
+            users (List[Collaborator]): collaborators that were just stored
+        """
         return NotImplemented
@@ -0,0 +1,244 @@
+"""
+In-memory indexes for searching collaborators by name.
+"""
+import heapq
+import math
+import re
+import sys
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from jupyter_publishing_service.models.rest import SearchRanking
+
+WORD_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def _fold(name: str) -> str:
+    # Share the name itself when folding doesn't change it.
+    folded = name.casefold()
+    return name if folded == name else sys.intern(folded)
+
+
+class PrefixIndex:
+    """Sorted arrays of names, searched by prefix with binary search.
+
+    Two more arrays hold the case-folded names, in their own sorted
+    order, and the names they belong to, for case-insensitive searches.
+    Names are interned, so all arrays share one copy of each string.
+    Adding a name keeps the arrays sorted, so the index can be updated
+    as collaborators are added instead of rebuilt.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._names: List[str] = sorted({sys.intern(name) for name in names})
+        folded = sorted((_fold(name), name) for name in self._names)
+        self._folded: List[str] = [key for key, _ in folded]
+        self._folded_names: List[str] = [name for _, name in folded]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        i = bisect_left(self._names, name)
+        return i < len(self._names) and self._names[i] == name
+
+    def add(self, name: str) -> bool:
+        """Add a name to the index. Returns False if it was already there."""
+        if name in self:
+            return False
+        name = sys.intern(name)
+        insort(self._names, name)
+        key = _fold(name)
+        i = bisect_left(self._folded, key)
+        # Keep names with the same folded key in sorted order.
+        while i < len(self._folded) and self._folded[i] == key and self._folded_names[i] < name:
+            i += 1
+        self._folded.insert(i, key)
+        self._folded_names.insert(i, name)
+        return True
+
+    def memory_size(self) -> int:
+        """An estimate of the memory used by the index, in bytes."""
+        size = sum(map(sys.getsizeof, (self._names, self._folded, self._folded_names)))
+        return size + _strings_size(self._names + self._folded)
+
+    def search(
+        self, prefix: str = "", limit: Optional[int] = None, case_sensitive: bool = True
+    ) -> List[str]:
+        """Return up to `limit` names starting with `prefix`, in sorted order."""
+        if case_sensitive:
+            keys = names = self._names
+        else:
+            prefix = prefix.casefold()
+            keys, names = self._folded, self._folded_names
+        start = bisect_left(keys, prefix)
+        end = len(keys) if limit is None else min(len(keys), start + max(limit, 0))
+        matches: List[str] = []
+        for i in range(start, end):
+            if not keys[i].startswith(prefix):
+                break
+            matches.append(names[i])
+        return matches
+
+
+def _strings_size(strings: Iterable[str]) -> int:
+    """The size of the distinct string objects in `strings`."""
+    seen = set()
+    size = 0
+    for string in strings:
+        if id(string) not in seen:
+            seen.add(id(string))
+            size += sys.getsizeof(string)
+    return size
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in WORD_SEPARATORS.split(text.casefold()) if word]
+
+
+def trigrams(text: str) -> Set[str]:
+    """The trigrams of every word in `text`. Words are padded (like
+    PostgreSQL's pg_trgm), so word starts weigh more than word ends.
+    """
+    grams = set()
+    for word in _words(text):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """An inverted index from trigrams to names, for ranked fuzzy search.
+
+    Posting lists are compact arrays of name IDs. A search only gathers
+    candidates from the rarest posting lists a match must appear in, then
+    ranks those candidates by trigram similarity, with a bonus for names
+    (or words in names) that start with the query. Each name's trigrams
+    are kept as trigram IDs, all in one compact array, so that they
+    aren't computed again for every candidate of every search.
+    """
+
+    def __init__(self, names: Iterable[str] = (), min_overlap: float = 0.5):
+        self.min_overlap = min_overlap
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._gram_ids: Dict[str, int] = {}
+        # The IDs of the trigrams of name `i` are `_grams[_offsets[i]:_offsets[i + 1]]`.
+        self._grams = array("I")
+        self._offsets = array("I", [0])
+        self._postings: Dict[str, array] = defaultdict(lambda: array("I"))
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def add(self, name: str) -> bool:
+        """Add a name to the index. Returns False if it was already there."""
+        if name in self._ids:
+            return False
+        name = sys.intern(name)
+        name_id = len(self._names)
+        self._names.append(name)
+        self._ids[name] = name_id
+        grams = trigrams(name)
+        for gram in grams:
+            self._grams.append(self._gram_ids.setdefault(gram, len(self._gram_ids)))
+            self._postings[gram].append(name_id)
+        self._offsets.append(len(self._grams))
+        return True
+
+    def memory_size(self) -> int:
+        """An estimate of the memory used by the index, in bytes.
+
+        Names are shared with the prefix index, so they are not counted here.
+        """
+        size = sys.getsizeof(self._names) + sys.getsizeof(self._ids)
+        size += sum(map(sys.getsizeof, (self._gram_ids, self._grams, self._offsets)))
+        size += sys.getsizeof(self._postings) + _strings_size(self._postings)
+        return size + sum(map(sys.getsizeof, self._postings.values()))
+
+    def _score(self, query: str, query_grams: Set[str], name_id: int, shared: int) -> float:
+        name_grams = self._offsets[name_id + 1] - self._offsets[name_id]
+        score = shared / (len(query_grams) + name_grams - shared)
+        name = self._names[name_id]
+        folded = name.casefold()
+        if folded.startswith(query):
+            score += 1.0
+        elif any(word.startswith(query) for word in _words(folded)):
+            score += 0.5
+        return score
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Return up to `limit` names similar to `query`, best match first."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        query = query.casefold()
+        # A match shares at least `required` trigrams with the query, so it
+        # must appear in at least one of the (n - required + 1) rarest lists.
+        required = max(1, math.ceil(len(query_grams) * self.min_overlap))
+        postings = sorted(
+            (self._postings[gram] for gram in query_grams if gram in self._postings), key=len
+        )
+        candidates = set()
+        for posting in postings[: len(query_grams) - required + 1]:
+            candidates.update(posting)
+        scored = []
+        query_ids = {self._gram_ids[gram] for gram in query_grams if gram in self._gram_ids}
+        grams, offsets = self._grams, self._offsets
+        for name_id in candidates:
+            shared = len(query_ids.intersection(grams[offsets[name_id] : offsets[name_id + 1]]))
+            if shared >= required:
+                score = self._score(query, query_grams, name_id, shared)
+                scored.append((score, self._names[name_id]))
+        if limit is None:
+            limit = len(scored)
+        best = heapq.nsmallest(limit, scored, key=lambda item: (-item[0], item[1]))
+        return [name for _, name in best]
+
+
+class CollaboratorDirectory:
+    """The names of all collaborators, indexed for prefix
+    and fuzzy search. Both indexes share the same strings.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.prefix_index = PrefixIndex(names)
+        self.trigram_index = TrigramIndex(self.prefix_index._names)
+
+    def __len__(self) -> int:
+        return len(self.prefix_index)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.prefix_index
+
+    def add(self, name: str) -> bool:
+        """Add a name to the directory. Returns False if it was already there."""
+        if not self.prefix_index.add(name):
+            return False
+        self.trigram_index.add(name)
+        return True
+
+    def search(
+        self,
+        query: str = "",
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[str]:
+        if ranking == SearchRanking.fuzzy:
+            if len(query) >= 3:
+                return self.trigram_index.search(query, limit=limit)
+            # Too short for trigrams; fall back to a case-insensitive prefix search.
+            case_sensitive = False
+        return self.prefix_index.search(query, limit=limit, case_sensitive=case_sensitive)
+
+    def memory_size(self) -> int:
+        """An estimate of the memory used by the directory, in bytes."""
+        return self.prefix_index.memory_size() + self.trigram_index.memory_size()
@@ -1,36 +1,148 @@
+import asyncio
+import time
 from typing import List, Optional
 
-from aiocache import Cache, cached
 from sqlalchemy import select
+from traitlets import Any, Float, Instance, Integer
 from traitlets.config import LoggingConfigurable
 
-from jupyter_publishing_service.models.sql import Collaborator
+from jupyter_publishing_service.invalidation.local import USERS
+from jupyter_publishing_service.metrics import counter, gauge
+from jupyter_publishing_service.models.rest import SearchRanking
+from jupyter_publishing_service.models.sql import Collaborator, Group
 from jupyter_publishing_service.user.abc import UserStoreABC
+from jupyter_publishing_service.user.index import CollaboratorDirectory
+
+DIRECTORY_LOOKUPS = counter(
+    "publishing_user_directory_lookups",
+    "Searches served by the collaborator directory. A miss had to load it first.",
+    ("result",),
+)
+DIRECTORY_REFRESHES = counter(
+    "publishing_user_directory_refreshes",
+    "Times the collaborator directory was (re)loaded from the database.",
+)
+DIRECTORY_ENTRIES = gauge(
+    "publishing_user_directory_entries", "Names in the collaborator directory."
+)
+DIRECTORY_SIZE = gauge(
+    "publishing_user_directory_size_bytes",
+    "Estimated memory used by the collaborator directory, as of its last (re)load.",
+)
 
 
 class SQLUserStore(LoggingConfigurable):
     """A user store that searches a list of
     all collaborators already in the publishing
     service database.
+
+    Names are searched in an in-memory directory that is
+    loaded from the database when the service starts and
+    then updated as collaborators are added, here or (through
+    the invalidation bus) in other service processes. It is
+    also reloaded in the background every `refresh_interval`
+    seconds, to pick up anything the bus missed.
     """
 
-    @cached(ttl=120, cache=Cache.MEMORY)
-    async def get_all_collaborators(self) -> List[Collaborator]:
+    refresh_interval = Integer(
+        600,
+        help="Reload the collaborator directory from the database in the background "
+        "when it is older than this many seconds. Set to 0 to never reload.",
+    ).tag(config=True)
+
+    _directory = Instance(CollaboratorDirectory, allow_none=True)
+    _loaded_at = Float(0)
+    _load_lock = Instance(asyncio.Lock, args=())
+    _refresh_task = Any(allow_none=True)
+    # Names added while the directory is loading, applied to the new directory.
+    _pending = Any(allow_none=True)
+
+    async def start(self):
+        self.parent.invalidation_bus.subscribe(USERS, self._users_added)
+        await self.get_directory()
+
+    async def _load(self) -> CollaboratorDirectory:
         async with self.parent.get_session() as session:
-            stmt = select(Collaborator)
-            results = await session.exec(stmt)
-            records = results.all()
-            collaborators = [row[0] for row in records]
-        return collaborators
-
-    async def search_users(self, search_string: Optional[str]) -> List[Collaborator]:
-        collaborators = await self.get_all_collaborators()
-        if search_string:
-            return [x for x in collaborators if x.name.startswith(search_string)]
-        return collaborators
-
-    async def search_groups(self, search_string: Optional[str] = None) -> List[Collaborator]:
-        return await self.search_users(search_string)
+            results = await session.exec(select(Collaborator.name))
+            names = [row[0] for row in results.all()]
+        directory = CollaboratorDirectory(names)
+        DIRECTORY_REFRESHES.inc()
+        DIRECTORY_SIZE.set(directory.memory_size())
+        DIRECTORY_ENTRIES.set(len(directory))
+        return directory
+
+    async def _reload(self):
+        self._pending = []
+        try:
+            directory = await self._load()
+            for name in self._pending:
+                directory.add(name)
+        finally:
+            self._pending = None
+        self._directory = directory
+        self._loaded_at = time.monotonic()
+
+    async def _refresh(self):
+        try:
+            await self._reload()
+        except Exception:
+            self.log.exception("Failed to refresh the collaborator directory.")
+        finally:
+            self._refresh_task = None
+
+    async def get_directory(self) -> CollaboratorDirectory:
+        """Get the collaborator directory, loading it on first use.
+
+        Only one load or refresh runs at a time. A refresh runs in the
+        background; searches keep using the current directory meanwhile.
+        """
+        if self._directory is None:
+            DIRECTORY_LOOKUPS.inc(result="miss")
+            async with self._load_lock:
+                if self._directory is None:
+                    await self._reload()
+            return self._directory
+        DIRECTORY_LOOKUPS.inc(result="hit")
+        expired = time.monotonic() - self._loaded_at > self.refresh_interval
+        if self.refresh_interval > 0 and expired and self._refresh_task is None:
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+        return self._directory
+
+    async def add_users(self, users: List[Collaborator]):
+        self.parent.invalidation_bus.publish(USERS, [user.name for user in users])
+
+    def _users_added(self, names):
+        if self._pending is not None:
+            # A load is in progress and may have missed these users.
+            self._pending.extend(names)
+        if self._directory is not None:
+            for name in names:
+                self._directory.add(name)
+            DIRECTORY_ENTRIES.set(len(self._directory))
+
+    async def search_users(
+        self,
+        search_string: Optional[str],
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Collaborator]:
+        directory = await self.get_directory()
+        names = directory.search(
+            search_string or "", limit=limit, case_sensitive=case_sensitive, ranking=ranking
+        )
+        return [Collaborator(name=name) for name in names]
+
+    async def search_groups(
+        self,
+        search_string: Optional[str] = None,
+        limit: Optional[int] = None,
+        case_sensitive: bool = True,
+        ranking: SearchRanking = SearchRanking.prefix,
+    ) -> List[Group]:
+        return await self.parent.group_store.search(
+            search_string, limit=limit, case_sensitive=case_sensitive, ranking=ranking
+        )
 
 
 UserStoreABC.register(SQLUserStore)
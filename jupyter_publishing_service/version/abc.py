@@ -0,0 +1,37 @@
+from abc import ABCMeta, abstractmethod
+from typing import List, Optional
+
+from jupyter_publishing_service.models.rest import FileVersionModel
+from jupyter_publishing_service.models.sql import JupyterContentsModel
+
+
+class VersionStoreABC(metaclass=ABCMeta):
+    @abstractmethod
+    async def add(self, file_id: str, file: JupyterContentsModel) -> int:
+        """
+        Record the given contents as the newest version of the file
+
+        Returns the new version number
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def list(self, file_id: str) -> List[FileVersionModel]:
+        """
+        List all stored versions of the file, newest first
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def get(self, file_id: str, version: int) -> Optional[JupyterContentsModel]:
+        """
+        Get the contents of the file at the given version
+        """
+        return NotImplemented
+
+    @abstractmethod
+    async def delete(self, file_id: str):
+        """
+        Remove the whole version history of the file
+        """
+        return NotImplemented
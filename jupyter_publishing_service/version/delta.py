@@ -0,0 +1,41 @@
+"""
+Line based deltas between JSON documents.
+
+Documents are serialized with sorted keys and one value per line, so
+an edit to a notebook (e.g. changing a cell's source) touches only a
+few lines. A delta is a list of `[start, end, lines]` operations that
+replace `base[start:end]` with `lines`.
+"""
+import json
+from difflib import SequenceMatcher
+from typing import Any, List
+
+
+def to_lines(document: Any) -> List[str]:
+    return json.dumps(document, sort_keys=True, indent=0, ensure_ascii=False).split("\n")
+
+
+def from_lines(lines: List[str]) -> Any:
+    return json.loads("\n".join(lines))
+
+
+def make_delta(base: List[str], target: List[str]) -> list:
+    matcher = SequenceMatcher(None, base, target, autojunk=False)
+    return [
+        [i1, i2, target[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"
+    ]
+
+
+def apply_delta(base: List[str], delta: list) -> List[str]:
+    lines: List[str] = []
+    position = 0
+    for start, end, replacement in delta:
+        lines.extend(base[position:start])
+        lines.extend(replacement)
+        position = end
+    lines.extend(base[position:])
+    return lines
+
+
+def delta_size(delta: list) -> int:
+    return sum(len(line) for _, _, replacement in delta for line in replacement)
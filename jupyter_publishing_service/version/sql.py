@@ -0,0 +1,181 @@
+from typing import List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import col, delete, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from traitlets import Integer
+from traitlets.config import LoggingConfigurable
+
+from jupyter_publishing_service.models.rest import FileVersionModel
+from jupyter_publishing_service.models.sql import FileVersion, JupyterContentsModel
+
+from .abc import VersionStoreABC
+from .delta import apply_delta, delta_size, from_lines, make_delta, to_lines
+
+# Attempts to add a version while concurrent writers take the next numbers.
+ADD_ATTEMPTS = 5
+
+
+def _dump_contents(file: JupyterContentsModel) -> dict:
+    return file.model_dump(mode="json", exclude={"id"})
+
+
+def _load_contents(file_id: str, data: dict) -> JupyterContentsModel:
+    return JupyterContentsModel.model_validate(dict(data, id=file_id))
+
+
+class SQLVersionStore(LoggingConfigurable):
+    """Stores every version of a file's contents as a delta against
+    a periodic full snapshot (keyframe) of the contents.
+    """
+
+    keyframe_interval = Integer(
+        10,
+        help="Store the full contents every N versions. Versions in between are "
+        "stored as deltas against the previous full copy.",
+    ).tag(config=True)
+
+    max_versions = Integer(
+        0,
+        help="The number of versions kept per file. Older versions are compacted "
+        "away as new ones are added. Set to 0 to keep every version.",
+    ).tag(config=True)
+
+    async def _get_keyframe(self, session: AsyncSession, file_id: str, version: int):
+        stmt = (
+            select(FileVersion)
+            .where(FileVersion.file == file_id)
+            .where(FileVersion.version == version)
+        )
+        results = await session.exec(stmt)
+        return results.first()
+
+    async def add(self, file_id: str, file: JupyterContentsModel) -> int:
+        lines = to_lines(_dump_contents(file))
+        size = sum(len(line) for line in lines)
+        # Concurrent writers (e.g. a real-time collaboration save and a PATCH)
+        # can both pick the same next version; the one that commits second
+        # breaks `unique_file_version`, and tries again with the next one.
+        for attempt in range(1, ADD_ATTEMPTS + 1):
+            try:
+                return await self._add(file_id, lines, size)
+            except IntegrityError:
+                if attempt == ADD_ATTEMPTS:
+                    raise
+                self.log.debug("Version of %s taken concurrently, retrying.", file_id)
+
+    async def _add(self, file_id: str, lines: List[str], size: int) -> int:
+        session: AsyncSession
+        async with self.parent.get_session() as session:
+            stmt = (
+                select(FileVersion)
+                .where(FileVersion.file == file_id)
+                .order_by(col(FileVersion.version).desc())
+                .limit(1)
+            )
+            results = await session.exec(stmt)
+            latest: Optional[FileVersion] = results.first()
+            version = latest.version + 1 if latest else 1
+            new_version = FileVersion(
+                file=file_id, version=version, base=version, keyframe=True, size=size
+            )
+            if latest and version - latest.base < self.keyframe_interval:
+                keyframe = latest
+                if not latest.keyframe:
+                    keyframe = await self._get_keyframe(session, file_id, latest.base)
+                delta = make_delta(to_lines(keyframe.data), lines)
+                # Edits that rewrite most of the document are cheaper as a keyframe.
+                if delta_size(delta) < size // 2:
+                    new_version.base = keyframe.version
+                    new_version.keyframe = False
+                    new_version.data = delta
+            if new_version.keyframe:
+                new_version.data = from_lines(lines)
+            session.add(new_version)
+            if self.max_versions > 0 and version > self.max_versions:
+                await self._compact(session, file_id, version - self.max_versions + 1)
+            await session.commit()
+            return version
+
+    async def _compact(self, session: AsyncSession, file_id: str, oldest: int):
+        """Drop all versions older than `oldest`. Deltas that depended on a
+        dropped keyframe are rebased onto a new keyframe at `oldest`.
+        """
+        first = await self._get_keyframe(session, file_id, oldest)
+        if first is not None and not first.keyframe and first.base < oldest:
+            keyframe = await self._get_keyframe(session, file_id, first.base)
+            base = to_lines(keyframe.data)
+            stmt = (
+                select(FileVersion)
+                .where(FileVersion.file == file_id)
+                .where(FileVersion.base == first.base)
+                .where(FileVersion.version >= oldest)
+                .order_by(FileVersion.version)
+            )
+            results = await session.exec(stmt)
+            new_base = None
+            for row in results.all():
+                lines = apply_delta(base, row.data)
+                if new_base is None:
+                    new_base = lines
+                    row.data = from_lines(lines)
+                    row.keyframe = True
+                else:
+                    row.data = make_delta(new_base, lines)
+                row.base = oldest
+                session.add(row)
+        await session.exec(
+            delete(FileVersion)
+            .where(FileVersion.file == file_id)
+            .where(FileVersion.version < oldest)
+        )
+
+    async def list(self, file_id: str) -> List[FileVersionModel]:
+        async with self.parent.get_session() as session:
+            stmt = (
+                select(FileVersion.version, FileVersion.created, FileVersion.size)
+                .where(FileVersion.file == file_id)
+                .order_by(col(FileVersion.version).desc())
+            )
+            results = await session.exec(stmt)
+            return [
+                FileVersionModel(version=version, created=created, size=size)
+                for version, created, size in results.all()
+            ]
+
+    async def get(self, file_id: str, version: int) -> Optional[JupyterContentsModel]:
+        async with self.parent.get_session() as session:
+            # Fetch the version and the keyframe it is stored against in one query.
+            stmt = (
+                select(FileVersion)
+                .where(FileVersion.file == file_id)
+                .where(
+                    or_(
+                        FileVersion.version == version,
+                        FileVersion.version
+                        == select(FileVersion.base)
+                        .where(FileVersion.file == file_id)
+                        .where(FileVersion.version == version)
+                        .scalar_subquery(),
+                    )
+                )
+                .order_by(col(FileVersion.version).desc())
+            )
+            results = await session.exec(stmt)
+            rows = results.all()
+        if not rows or rows[0].version != version:
+            return None
+        row = rows[0]
+        if row.keyframe:
+            return _load_contents(file_id, row.data)
+        keyframe = rows[-1]
+        return _load_contents(file_id, from_lines(apply_delta(to_lines(keyframe.data), row.data)))
+
+    async def delete(self, file_id: str):
+        session: AsyncSession
+        async with self.parent.get_session() as session:
+            await session.exec(delete(FileVersion).where(FileVersion.file == file_id))
+            await session.commit()
+
+
+VersionStoreABC.register(SQLVersionStore)
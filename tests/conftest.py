@@ -0,0 +1,60 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from traitlets.config import Config
+
+from jupyter_publishing_service.app import JupyterPublishingService
+
+from .mock import MockNoOpAuthenticator, MockNoOpAuthorizer
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def service_config():
+    """Traits to override on the service (and, under "SQLStorageManager",
+    on its storage manager). Parametrize or redefine this fixture to change them.
+    """
+    return {}
+
+
+@pytest.fixture
+def service(service_config):
+    traits = dict(service_config)
+    storage_config = {
+        # In memory path.
+        "database_path": "sqlite+aiosqlite://",
+        "authorization_store_class": MockNoOpAuthorizer,
+        **traits.pop("SQLStorageManager", {}),
+    }
+    service = JupyterPublishingService(
+        **{
+            "authenticator_class": MockNoOpAuthenticator,
+            # Fail requests that run queries in a loop.
+            "query_budget": 25,
+            "query_budget_strict": True,
+            **traits,
+        },
+        config=Config({"SQLStorageManager": storage_config}),
+    )
+    service.initialize()
+    return service
+
+
+@pytest.fixture
+def app(service):
+    return service.app
+
+
+@pytest.fixture
+def async_client(app):
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.fixture
+async def start_db(service):
+    await service.storage_manager.start()
+    yield
+    await service.storage_manager.stop()
@@ -0,0 +1,73 @@
+import uuid
+from datetime import datetime
+
+from traitlets.config import LoggingConfigurable
+
+from jupyter_publishing_service.authenticator.abc import AuthenticatorABC
+from jupyter_publishing_service.authorizer.abc import AuthorizerABC
+from jupyter_publishing_service.models.sql import (
+    Collaborator,
+    JupyterContentsModel,
+    SharedFileMetadata,
+)
+
+COLLABORATORS = [
+    Collaborator(name="alice@example.com"),
+    Collaborator(name="bob@example.com"),
+    Collaborator(name="carol@example.com"),
+]
+
+
+class MockNoOpAuthenticator(LoggingConfigurable):
+    """Treats the bearer token as the user's name."""
+
+    async def authenticate(self, data) -> dict:
+        return {"name": data["token"]}
+
+
+class MockNoOpAuthorizer(LoggingConfigurable):
+    """Allows everything."""
+
+    async def authorize(self, user, data) -> bool:
+        return True
+
+
+AuthenticatorABC.register(MockNoOpAuthenticator)
+AuthorizerABC.register(MockNoOpAuthorizer)
+
+
+def mock_notebook(cells=None) -> dict:
+    return {
+        "cells": cells or [],
+        "metadata": {},
+        "nbformat": 4,
+        "nbformat_minor": 5,
+    }
+
+
+def mock_shared_notebook_content(name="Untitled.ipynb", author=None, content=None):
+    file_id = str(uuid.uuid4())
+    now = datetime.now()
+    metadata = SharedFileMetadata(
+        id=file_id,
+        author=author or COLLABORATORS[0].name,
+        name=name,
+        title=name,
+        created=now,
+        last_modified=now,
+        version=None,
+        shareable_link=None,
+        server_id=None,
+    )
+    contents = JupyterContentsModel(
+        name=name,
+        path=name,
+        type="notebook",
+        writable=True,
+        created=now,
+        last_modified=now,
+        mimetype=None,
+        content=content or mock_notebook(),
+        format="json",
+    )
+    return metadata, contents
@@ -0,0 +1,118 @@
+from functools import partial
+
+import anyio
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from jupyter_publishing_service.admission import (
+    READ,
+    SUBSCRIBE,
+    WRITE,
+    AdmissionControlMiddleware,
+    AdmissionGate,
+    UserRateLimiter,
+    admission_kind,
+)
+from jupyter_publishing_service.storage.abc import StorageManagerABC
+
+from .mock import COLLABORATORS
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_rate_limits_are_per_user(service, start_db, async_client):
+    service.rate_limiter = UserRateLimiter({READ: (0.1, 2)})
+    alice = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+    bob = {"Authorization": f"Bearer {COLLABORATORS[1].name}"}
+    async with async_client as client:
+        for _ in range(2):
+            assert (await client.get("/sharing", headers=alice)).status_code == 200
+        resp = await client.get("/sharing", headers=alice)
+        assert resp.status_code == 429
+        assert 1 <= int(resp.headers["retry-after"]) <= 10
+        assert (await client.get("/sharing", headers=bob)).status_code == 200
+
+
+def admission_client(gates, pool_wait: float = 0, release: anyio.Event = None) -> AsyncClient:
+    async def app(scope, receive, send):
+        if scope["path"] == "/slow" or admission_kind(scope) == SUBSCRIBE:
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = AdmissionControlMiddleware(app, gates, pool_wait=lambda: pool_wait)
+    return AsyncClient(transport=ASGITransport(app=middleware), base_url="http://test")
+
+
+async def test_requests_over_the_limit_are_queued_then_shed():
+    gate = AdmissionGate(READ, limit=1, max_queue=1, queue_timeout=10)
+    statuses = []
+    release = anyio.Event()
+    async with admission_client({READ: gate}, release=release) as client:
+
+        async def get(path):
+            statuses.append((await client.get(path)).status_code)
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(get, "/slow")
+            await anyio.sleep(0.05)
+            tg.start_soon(get, "/queued")
+            await anyio.sleep(0.05)
+            assert gate.in_flight == 1 and gate.waiting == 1
+            # The queue is full.
+            resp = await client.get("/shed")
+            assert resp.status_code == 503 and resp.headers["retry-after"] == "1"
+            # Health checks are exempt.
+            assert (await client.get("/health/live")).status_code == 200
+            release.set()
+    assert statuses == [200, 200]
+    assert gate.in_flight == 0
+
+
+async def test_writes_are_shed_first_when_the_database_is_slow():
+    gates = {
+        READ: AdmissionGate(READ, max_pool_wait=2),
+        WRITE: AdmissionGate(WRITE, max_pool_wait=1),
+    }
+    async with admission_client(gates, pool_wait=1.5) as client:
+        assert (await client.get("/read")).status_code == 200
+        assert (await client.post("/write")).status_code == 503
+
+
+async def test_change_feed_subscribers_dont_take_read_slots():
+    gates = {
+        READ: AdmissionGate(READ, limit=1, max_queue=0),
+        SUBSCRIBE: AdmissionGate(SUBSCRIBE, limit=2),
+    }
+    statuses = []
+    release = anyio.Event()
+    async with admission_client(gates, release=release) as client:
+
+        async def subscribe(**kwargs):
+            statuses.append((await client.get("/sharing/changes", **kwargs)).status_code)
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(partial(subscribe, params={"wait": 30}))
+            tg.start_soon(partial(subscribe, headers={"Accept": "text/event-stream"}))
+            await anyio.sleep(0.05)
+            assert gates[SUBSCRIBE].in_flight == 2
+            # Reads are still handled, including change feed polls that don't wait.
+            assert (await client.get("/read")).status_code == 200
+            assert (await client.get("/sharing/changes")).status_code == 200
+            # More subscribers are rejected right away.
+            resp = await client.get("/sharing/changes", headers={"Last-Event-ID": "1"})
+            assert resp.status_code == 503
+            release.set()
+    assert statuses == [200, 200]
+
+
+class VirtualStorageManager:
+    """A manager registered as a virtual subclass, without `pool_wait`."""
+
+
+StorageManagerABC.register(VirtualStorageManager)
+
+
+def test_pool_wait_is_optional(service):
+    service.storage_manager = VirtualStorageManager()
+    assert service._pool_wait() == 0
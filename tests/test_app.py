@@ -1,60 +1,23 @@
+import json
+
 import pytest
-from fastapi.testclient import TestClient
-from httpx import ASGITransport, AsyncClient
-from traitlets.config import Config
+import uvicorn
+from sqlmodel import SQLModel
 
-from jupyter_publishing_service.app import JupyterPublishingService
+from jupyter_publishing_service import constants
+from jupyter_publishing_service.app import JupyterPublishingService, create_worker_app
+from jupyter_publishing_service.invalidation.sql import SQLInvalidationBus
 from jupyter_publishing_service.models.rest import SharedFileRequestModel
+from jupyter_publishing_service.models.sql import SchemaVersion
+from jupyter_publishing_service.routes import lifespan
+from jupyter_publishing_service.storage.abc import StorageManagerABC
+from jupyter_publishing_service.storage.sql import SQLStorageManager
 
-from .mock import (
-    COLLABORATORS,
-    MockNoOpAuthenticator,
-    MockNoOpAuthorizer,
-    mock_shared_notebook_content,
-)
+from .mock import COLLABORATORS, mock_shared_notebook_content
 
 pytestmark = pytest.mark.anyio
 
 
-@pytest.fixture
-def anyio_backend():
-    return "asyncio"
-
-
-@pytest.fixture
-def service():
-    # In memory path.
-    db_file = "sqlite+aiosqlite://"
-    service = JupyterPublishingService(
-        authenticator_class=MockNoOpAuthenticator,
-        config=Config(
-            {
-                "SQLStorageManager": {
-                    "database_path": "sqlite+aiosqlite://",
-                    "authorization_store_class": MockNoOpAuthorizer,
-                }
-            }
-        ),
-    )
-    service.initialize()
-    return service
-
-
-@pytest.fixture
-def app(service):
-    return service.app
-
-
-@pytest.fixture
-def async_client(app):
-    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
-
-
-@pytest.fixture
-async def start_db(service):
-    await service.storage_manager.start()
-
-
 async def test_app(start_db, async_client):
     async with async_client as client:
         response = await client.get("/")
@@ -79,3 +42,84 @@ async def test_create_file(start_db, async_client):
     async with async_client as client:
         resp = await client.post("/sharing", content=request_model.model_dump_json())
     assert resp.status_code == 200
+
+
+def test_start_workers(service, monkeypatch):
+    runs = []
+    monkeypatch.setattr(uvicorn, "run", lambda app, **options: runs.append((app, options)))
+    monkeypatch.setenv(constants.WORKER_ARGV, "[]")
+    service.workers = 4
+    # Workers need a bus that reaches the other processes.
+    with pytest.raises(SystemExit):
+        service.start()
+    assert not runs
+    storage_manager = service.storage_manager
+    storage_manager.invalidation_bus = SQLInvalidationBus(parent=storage_manager)
+    service.start()
+    [(app, options)] = runs
+    assert app == "jupyter_publishing_service.app:create_worker_app"
+    assert options["factory"] and options["workers"] == 4
+    assert options["timeout_graceful_shutdown"] == service.graceful_shutdown_timeout
+
+
+def test_worker_app_skips_storage_setup(monkeypatch):
+    monkeypatch.setenv(constants.WORKER_ARGV, json.dumps(["--JupyterPublishingService.port=9999"]))
+    try:
+        app = create_worker_app()
+        service = JupyterPublishingService.instance()
+        assert service.app is app
+        assert service.port == 9999
+        assert not service.storage_manager.setup_on_start
+    finally:
+        JupyterPublishingService.clear_instance()
+
+
+async def test_health_endpoints(app, async_client):
+    async with async_client as client:
+        resp = await client.get("/health/live")
+        assert resp.json()["status"] == "alive"
+        resp = await client.get("/health/ready")
+        assert resp.status_code == 503
+
+        async with lifespan(app):
+            resp = await client.get("/health/ready")
+            assert resp.status_code == 200
+            assert resp.json()["status"] == "ready"
+
+
+async def test_setup_is_skipped_on_warm_database(tmp_path, monkeypatch):
+    database_path = f"sqlite+aiosqlite:///{tmp_path / 'database.db'}"
+    storage_manager = SQLStorageManager(database_path=database_path)
+    storage_manager.initialize()
+    await storage_manager.setup()
+    await storage_manager.stop()
+
+    def create_all(*args, **kwargs):
+        raise AssertionError("The schema should not be created again.")
+
+    monkeypatch.setattr(SQLModel.metadata, "create_all", create_all)
+    storage_manager = SQLStorageManager(database_path=database_path)
+    storage_manager.initialize()
+    await storage_manager.setup()
+    async with storage_manager.get_session() as session:
+        marker = await session.get(SchemaVersion, 1)
+    assert marker.version == storage_manager.schema_version()
+    await storage_manager.stop()
+
+
+class VirtualStorageManager:
+    """A manager registered as a virtual subclass, without the optional hooks."""
+
+    async def start(self):
+        pass
+
+
+StorageManagerABC.register(VirtualStorageManager)
+
+
+async def test_storage_manager_hooks_are_optional(service):
+    service.storage_manager = VirtualStorageManager()
+    await service._setup_storage()
+    async with lifespan(service.app):
+        assert service.ready
+    assert not service.ready
@@ -0,0 +1,105 @@
+import base64
+
+import pytest
+
+from jupyter_publishing_service.attachment.outputs import (
+    ATTACHMENT_REFERENCE_KEY,
+    attachment_to_bytes,
+    externalize_outputs,
+    inline_outputs,
+)
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+from jupyter_publishing_service.models.sql import Attachment
+
+from .mock import COLLABORATORS, mock_notebook, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+PNG = base64.b64encode(b"\x89PNG" + b"\x00" * 4096).decode()
+
+
+def notebook_with_image():
+    return mock_notebook(
+        cells=[
+            {
+                "cell_type": "code",
+                "execution_count": 1,
+                "metadata": {},
+                "source": "plot()",
+                "outputs": [
+                    {
+                        "output_type": "display_data",
+                        "metadata": {},
+                        "data": {"image/png": PNG, "text/plain": "<Figure>"},
+                    }
+                ],
+            }
+        ]
+    )
+
+
+def test_externalize_and_inline_roundtrip():
+    content = notebook_with_image()
+    new_content, attachments = externalize_outputs("file", content, threshold=1024)
+    assert len(attachments) == 1
+    bundle = new_content["cells"][0]["outputs"][0]["data"]
+    assert bundle["image/png"][ATTACHMENT_REFERENCE_KEY] == attachments[0].id
+    assert bundle["text/plain"] == "<Figure>"
+    # The original notebook is left untouched.
+    assert content == notebook_with_image()
+    assert inline_outputs(new_content, attachments) == content
+
+
+@pytest.mark.parametrize(
+    "mimetype, data, expected",
+    [
+        ("image/png", PNG, base64.b64decode(PNG)),
+        ("application/pdf", ["JVBE", "Rg==\n"], b"%PDF"),
+        ("application/javascript", "alert('hi');", b"alert('hi');"),
+        ("application/x-latex", "$x^2$", b"$x^2$"),
+        ("application/vnd.plotly.v1+json", '{"data": []}', b'{"data": []}'),
+        ("image/svg+xml", "<svg/>", b"<svg/>"),
+        ("application/x-unknown", "not base64!", b"not base64!"),
+    ],
+)
+def test_attachment_to_bytes(mimetype, data, expected):
+    attachment = Attachment(id="a", file="file", mimetype=mimetype, size=0, data=data)
+    assert attachment_to_bytes(attachment) == expected
+
+
+async def test_get_file_with_referenced_outputs(service, start_db, async_client):
+    service.storage_manager.attachment_threshold = 1024
+    metadata, contents = mock_shared_notebook_content(content=notebook_with_image())
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=[COLLABORATORS[0]], roles=[], contents=contents
+    )
+    headers = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+    async with async_client as client:
+        resp = await client.post("/sharing", content=request_model.model_dump_json())
+        assert resp.status_code == 200
+
+        url = f"/sharing/{metadata.id}"
+        resp = await client.get(url, params={"contents": 1}, headers=headers)
+        bundle = resp.json()["contents"]["content"]["cells"][0]["outputs"][0]["data"]
+        assert bundle["image/png"] == PNG
+
+        resp = await client.get(
+            url, params={"contents": 1, "outputs": "reference"}, headers=headers
+        )
+        bundle = resp.json()["contents"]["content"]["cells"][0]["outputs"][0]["data"]
+        attachment_id = bundle["image/png"][ATTACHMENT_REFERENCE_KEY]
+
+        resp = await client.get(f"{url}/attachments/{attachment_id}", headers=headers)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "image/png"
+        assert "immutable" in resp.headers["cache-control"]
+        assert resp.content == base64.b64decode(PNG)
+
+        headers["If-None-Match"] = resp.headers["etag"]
+        resp = await client.get(f"{url}/attachments/{attachment_id}", headers=headers)
+        assert resp.status_code == 304
+        # Only for attachments of the file.
+        unknown = "0" * len(attachment_id)
+        headers["If-None-Match"] = f'"{unknown}"'
+        resp = await client.get(f"{url}/attachments/{unknown}", headers=headers)
+        assert resp.status_code == 404
@@ -0,0 +1,191 @@
+import asyncio
+
+import anyio
+import httpx
+import pytest
+
+from jupyter_publishing_service.client.simple import SimpleAsyncClient
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+
+from .mock import COLLABORATORS, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+HEADERS = {"Authorization": f"Bearer {COLLABORATORS[1].name}"}
+
+
+def share_request(collaborators=COLLABORATORS[:1]) -> SharedFileRequestModel:
+    metadata, contents = mock_shared_notebook_content()
+    return SharedFileRequestModel(
+        metadata=metadata,
+        collaborators=collaborators,
+        roles=[{"name": "READER"}],
+        contents=contents,
+    )
+
+
+async def test_long_poll_lists_changes_for_recipients(start_db, async_client):
+    async with async_client as client:
+        resp = await client.get("/sharing/changes", headers=HEADERS)
+        cursor = resp.json()["cursor"]
+        request_model = share_request()
+        file_id = request_model.metadata.id
+        await client.post("/sharing", content=request_model.model_dump_json())
+        # Not shared with this user (yet).
+        resp = await client.get("/sharing/changes", params={"cursor": cursor}, headers=HEADERS)
+        assert resp.json()["changes"] == []
+
+        request_model.collaborators = COLLABORATORS[:2]
+        await client.patch(
+            f"/sharing/{file_id}", content=request_model.model_dump_json(), headers=HEADERS
+        )
+        await client.delete(f"/sharing/{file_id}", headers=HEADERS)
+        resp = await client.get("/sharing/changes", params={"cursor": cursor}, headers=HEADERS)
+        page = resp.json()
+        assert [(c["file_id"], c["kind"]) for c in page["changes"]] == [
+            (file_id, "shared"),
+            (file_id, "deleted"),
+        ]
+        assert page["cursor"] == page["changes"][-1]["cursor"]
+        resp = await client.get(
+            "/sharing/changes", params={"cursor": page["cursor"]}, headers=HEADERS
+        )
+        assert resp.json() == {"cursor": page["cursor"], "changes": []}
+
+
+async def test_long_poll_wakes_up_on_a_change(start_db, async_client):
+    async with async_client as client:
+        resp = await client.get("/sharing/changes", headers=HEADERS)
+        cursor = resp.json()["cursor"]
+        request_model = share_request(COLLABORATORS[:2])
+        result = {}
+
+        async def poll():
+            resp = await client.get(
+                "/sharing/changes", params={"cursor": cursor, "wait": 30}, headers=HEADERS
+            )
+            result.update(resp.json())
+
+        with anyio.fail_after(10):
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(poll)
+                await anyio.sleep(0.1)
+                await client.post("/sharing", content=request_model.model_dump_json())
+        assert [c["kind"] for c in result["changes"]] == ["created"]
+
+
+async def test_long_poll_wakes_up_on_changes_for_its_user_only(service, start_db, async_client):
+    manager = service.storage_manager
+    listed = []
+    list_changes = manager.change_store.list
+
+    async def counting_list(name, *args, **kwargs):
+        listed.append(name)
+        return await list_changes(name, *args, **kwargs)
+
+    manager.change_store.list = counting_list
+    async with async_client as client:
+        resp = await client.get("/sharing/changes", headers=HEADERS)
+        cursor = resp.json()["cursor"]
+        result = {}
+
+        async def poll():
+            resp = await client.get(
+                "/sharing/changes", params={"cursor": cursor, "wait": 30}, headers=HEADERS
+            )
+            result.update(resp.json())
+
+        with anyio.fail_after(10):
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(poll)
+                await anyio.sleep(0.1)
+                assert f"user:{COLLABORATORS[1].name}" in manager._change_waiters
+                # Not shared with the subscriber: it isn't woken up.
+                await client.post("/sharing", content=share_request().model_dump_json())
+                await anyio.sleep(0.2)
+                assert listed.count(COLLABORATORS[1].name) == 2
+                await client.post(
+                    "/sharing", content=share_request(COLLABORATORS[:2]).model_dump_json()
+                )
+        assert [c["kind"] for c in result["changes"]] == ["created"]
+    assert not manager._change_waiters
+
+
+@pytest.mark.parametrize(
+    "service_config",
+    [{"SQLStorageManager": {"change_retention": 0.5, "change_prune_interval": 0.05}}],
+)
+async def test_old_changes_are_pruned_periodically(start_db, async_client):
+    params = {"cursor": 0}
+    async with async_client as client:
+        await client.post("/sharing", content=share_request(COLLABORATORS[:2]).model_dump_json())
+        resp = await client.get("/sharing/changes", params=params, headers=HEADERS)
+        assert len(resp.json()["changes"]) == 1
+        with anyio.fail_after(5):
+            while True:
+                resp = await client.get("/sharing/changes", params=params, headers=HEADERS)
+                if not resp.json()["changes"]:
+                    break
+                await anyio.sleep(0.05)
+
+
+async def test_event_stream(service, start_db, async_client):
+    service.change_stream_timeout = 0.5
+    service.change_heartbeat_interval = 0.1
+    async with async_client as client:
+        resp = await client.get("/sharing/changes", headers=HEADERS)
+        cursor = resp.json()["cursor"]
+        await client.post("/sharing", content=share_request(COLLABORATORS[:2]).model_dump_json())
+        resp = await client.get(
+            "/sharing/changes", headers={**HEADERS, "Last-Event-ID": str(cursor)}
+        )
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    lines = resp.text.splitlines()
+    assert lines[0] == "retry: 1000"
+    assert lines[2] == f"id: {cursor + 1}"
+    assert lines[3] == "event: changes"
+    assert ": keepalive" in lines
+
+
+async def test_client_watch_changes_resumes_after_the_last_change():
+    requests = []
+
+    def handler(request):
+        requests.append(request.headers.get("Last-Event-ID"))
+        cursor = len(requests)
+        data = f'{{"cursor": {cursor}, "changes": []}}'
+        body = f"retry: 1000\n\n: keepalive\n\nid: {cursor}\nevent: changes\ndata: {data}\n\n"
+        return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+
+    client = SimpleAsyncClient(service_url="http://test", transport=httpx.MockTransport(handler))
+    async with client:
+        cursors = []
+        async for changes in client.watch_changes(cursor=0):
+            cursors.append(changes.cursor)
+            if len(cursors) == 2:
+                break
+    assert cursors == [1, 2]
+    assert requests == ["0", "1"]
+
+
+async def test_client_watch_changes_retries_busy_responses(monkeypatch):
+    statuses = [503, 429, 200]
+    sleeps = []
+
+    def handler(request):
+        status = statuses.pop(0)
+        if status != 200:
+            return httpx.Response(status, headers={"Retry-After": "2"})
+        body = 'event: changes\ndata: {"cursor": 1, "changes": []}\n\n'
+        return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+
+    client = SimpleAsyncClient(service_url="http://test", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    async with client:
+        async for changes in client.watch_changes(cursor=0):
+            break
+    assert changes.cursor == 1
+    assert sleeps == [2, 2]
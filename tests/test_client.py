@@ -0,0 +1,104 @@
+import httpx
+import pytest
+from httpx import ASGITransport
+
+from jupyter_publishing_service.client.simple import SimpleAsyncClient
+from jupyter_publishing_service.models.rest import SharedFileRequestModel, SyncStatus
+
+from .mock import COLLABORATORS, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_client_reuses_one_connection_pool(app, start_db):
+    timings = []
+    client = SimpleAsyncClient(
+        service_url="http://test",
+        api_token=COLLABORATORS[0].name,
+        transport=ASGITransport(app=app),
+    )
+    client.add_latency_hook(lambda *timing: timings.append(timing))
+    async with client:
+        pool = client.client
+        metadata, contents = mock_shared_notebook_content()
+        await client.add_file(
+            SharedFileRequestModel(
+                metadata=metadata, collaborators=COLLABORATORS, roles=[], contents=contents
+            )
+        )
+        files = await client.list_files()
+        assert [f.metadata.id for f in files] == [metadata.id]
+        users = await client.search_users("b")
+        assert [u.name for u in users] == ["bob@example.com"]
+        assert client.client is pool
+    assert pool.is_closed
+    assert [(method, path, status) for method, path, status, _, _ in timings] == [
+        ("POST", "/sharing", 200),
+        ("GET", "/sharing", 200),
+        ("GET", "/sharing/users", 200),
+    ]
+
+
+async def test_client_retries_idempotent_calls():
+    responses = iter([503, 502, 200, 503, 200])
+    requests = []
+
+    def handler(request):
+        requests.append(request.method)
+        status = next(responses)
+        return httpx.Response(status, json=[] if status == 200 else {})
+
+    client = SimpleAsyncClient(
+        service_url="http://test", transport=httpx.MockTransport(handler), retry_backoff=0
+    )
+    async with client:
+        assert await client.list_files() == []
+        assert requests == ["GET", "GET", "GET"]
+        # POST isn't retried.
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.create_upload(size=1)
+        assert requests[-1] == "POST" and len(requests) == 4
+
+
+async def test_sync_files_only_downloads_changes(app, start_db, tmp_path):
+    requests = []
+    client = SimpleAsyncClient(
+        service_url="http://test",
+        api_token=COLLABORATORS[0].name,
+        transport=ASGITransport(app=app),
+        sync_cache_dir=str(tmp_path),
+    )
+    client.add_latency_hook(lambda method, path, *_: requests.append((method, path)))
+    files = []
+    async with client:
+        for name in ("a.ipynb", "b.ipynb"):
+            metadata, contents = mock_shared_notebook_content(name=name)
+            request = SharedFileRequestModel(
+                metadata=metadata, collaborators=COLLABORATORS, roles=[], contents=contents
+            )
+            await client.add_file(request)
+            files.append(request)
+
+        results = await client.sync_files()
+        assert sorted(r.status for r in results) == [SyncStatus.added, SyncStatus.added]
+        cached = await client.get_cached_file(files[0].metadata.id)
+        assert cached.contents.content == files[0].contents.content
+
+        # Change one file and delete the other.
+        files[0].metadata.version = 2
+        await client.update_file(files[0])
+        await client.delete_file(files[1].metadata.id)
+
+        requests.clear()
+        results = {r.file_id: r.status for r in await client.sync_files()}
+        assert results == {
+            files[0].metadata.id: SyncStatus.updated,
+            files[1].metadata.id: SyncStatus.removed,
+        }
+        assert requests == [("GET", "/sharing"), ("GET", f"/sharing/{files[0].metadata.id}")]
+        assert await client.get_cached_file(files[1].metadata.id) is None
+
+        requests.clear()
+        results = await client.sync_files()
+        assert [r.status for r in results] == [SyncStatus.unchanged]
+        assert requests == [("GET", "/sharing")]
@@ -0,0 +1,60 @@
+import pytest
+
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+
+from .mock import COLLABORATORS, mock_notebook, mock_shared_notebook_content
+
+pytest.importorskip("jupyter_server")
+
+from jupyter_publishing_service.file.contents_manager import (  # noqa: E402
+    ContentsManagerFileStore,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(
+    params=[
+        "jupyter_server.services.contents.largefilemanager.AsyncLargeFileManager",
+        # Saves files in one go.
+        "jupyter_server.services.contents.filemanager.AsyncFileContentsManager",
+    ]
+)
+def file_store(service, tmp_path, request):
+    storage_manager = service.storage_manager
+    storage_manager.file_store = ContentsManagerFileStore(
+        parent=storage_manager,
+        log=storage_manager.log,
+        root_dir=str(tmp_path),
+        chunk_size=1000,
+        contents_manager_class=request.param,
+    )
+    return storage_manager.file_store
+
+
+@pytest.mark.parametrize("cells", [1, 100])
+async def test_contents_manager_file_store(start_db, file_store, tmp_path, async_client, cells):
+    metadata, contents = mock_shared_notebook_content(
+        content=mock_notebook(
+            cells=[{"cell_type": "markdown", "metadata": {}, "source": "é" * 20}] * cells
+        )
+    )
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=[COLLABORATORS[0]], roles=[], contents=contents
+    )
+    headers = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+    async with async_client as client:
+        resp = await client.post("/sharing", content=request_model.model_dump_json())
+        assert resp.status_code == 200
+        # Saving again replaces the stored file.
+        resp = await client.patch(
+            f"/sharing/{metadata.id}", content=request_model.model_dump_json(), headers=headers
+        )
+        assert resp.status_code == 200
+        assert [p.name for p in tmp_path.iterdir()] == [f"{metadata.id}.json"]
+
+        resp = await client.get(f"/sharing/{metadata.id}?contents=1", headers=headers)
+        assert resp.json()["contents"]["content"] == contents.content
+
+        await client.delete(f"/sharing/{metadata.id}", headers=headers)
+    assert await file_store.get(metadata.id) is None
@@ -0,0 +1,77 @@
+import pytest
+
+from jupyter_publishing_service.authorizer.sqlrbac import SQLRoleBasedAuthorizer
+from jupyter_publishing_service.group.abc import GroupStoreABC
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+from jupyter_publishing_service.models.sql import Group, Permission, Role
+
+from .mock import COLLABORATORS, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+ALICE, BOB, CAROL = (c.name for c in COLLABORATORS)
+
+
+def headers(name):
+    return {"Authorization": f"Bearer {name}"}
+
+
+async def test_share_with_group(service, start_db, async_client):
+    metadata, _ = mock_shared_notebook_content()
+    request_model = SharedFileRequestModel(
+        metadata=metadata,
+        collaborators=[COLLABORATORS[0]],
+        groups=[Group(name="team")],
+        roles=[Role(name="READER")],
+    )
+    async with async_client as client:
+        # Only existing groups can be shared with.
+        resp = await client.post("/sharing", content=request_model.model_dump_json())
+        assert resp.status_code == 400
+        # Nothing was written.
+        resp = await client.get("/sharing", headers=headers(ALICE))
+        assert resp.json() == []
+
+        resp = await client.put(
+            "/sharing/groups/team/members",
+            json={"members": [{"name": BOB}, {"name": CAROL}]},
+            headers=headers(ALICE),
+        )
+        assert resp.json() == {"name": "team", "owner": ALICE, "members": [BOB, CAROL]}
+
+        resp = await client.post("/sharing", content=request_model.model_dump_json())
+        assert resp.status_code == 200
+
+        resp = await client.get("/sharing", headers=headers(BOB))
+        assert [f["metadata"]["id"] for f in resp.json()] == [metadata.id]
+
+        resp = await client.get("/sharing/groups", params={"substring": "te"}, headers=headers(BOB))
+        assert resp.json() == [{"name": "team", "owner": ALICE}]
+
+        # Only the owner can change the group.
+        resp = await client.delete(f"/sharing/groups/team/members/{CAROL}", headers=headers(BOB))
+        assert resp.status_code == 403
+        resp = await client.delete(f"/sharing/groups/team/members/{CAROL}", headers=headers(ALICE))
+        assert resp.json()["members"] == [BOB]
+
+        resp = await client.get("/sharing", headers=headers(CAROL))
+        assert resp.json() == []
+
+    # Group members are authorized by the group's roles.
+    authorizer = SQLRoleBasedAuthorizer(parent=service.storage_manager)
+    read = {"permissions": [Permission(name="READ")], "file_id": metadata.id}
+    write = {"permissions": [Permission(name="WRITE")], "file_id": metadata.id}
+    assert await authorizer.authorize({"name": BOB}, read)
+    assert not await authorizer.authorize({"name": BOB}, write)
+
+
+class VirtualGroupStore:
+    """A store registered as a virtual subclass, without the optional `start`."""
+
+
+GroupStoreABC.register(VirtualGroupStore)
+
+
+async def test_group_store_start_is_optional(service):
+    service.storage_manager.group_store = VirtualGroupStore()
+    await service.storage_manager.start()
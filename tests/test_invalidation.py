@@ -0,0 +1,91 @@
+import pytest
+from traitlets.config import Config
+
+from jupyter_publishing_service.invalidation.abc import InvalidationBusABC
+from jupyter_publishing_service.invalidation.local import LocalInvalidationBus
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+from jupyter_publishing_service.models.sql import Collaborator
+from jupyter_publishing_service.storage.sql import SQLStorageManager
+
+from .mock import COLLABORATORS, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+
+def test_local_bus_delivers_to_subscribers():
+    bus = LocalInvalidationBus()
+    received = []
+    bus.subscribe("files", received.append)
+    bus.publish("files", ["a", "a", "b"])
+    bus.publish("users", ["c"])
+    assert received == [{"a", "b"}]
+
+
+class VirtualBus:
+    """A bus registered as a virtual subclass, without the optional hooks."""
+
+    def subscribe(self, topic, callback):
+        pass
+
+    def publish(self, topic, keys):
+        pass
+
+
+InvalidationBusABC.register(VirtualBus)
+
+
+async def test_bus_hooks_are_optional(service):
+    service.storage_manager.invalidation_bus = VirtualBus()
+    await service.storage_manager.start()
+    await service.storage_manager.stop()
+
+
+@pytest.fixture
+async def storage_managers(tmp_path):
+    """Two storage managers sharing a database, like two replicas."""
+    config = Config(
+        {
+            "SQLStorageManager": {
+                "database_path": f"sqlite+aiosqlite:///{tmp_path / 'database.db'}",
+                "invalidation_bus_class": (
+                    "jupyter_publishing_service.invalidation.sql.SQLInvalidationBus"
+                ),
+            },
+            # Changes are sent and received explicitly below.
+            "SQLInvalidationBus": {"poll_interval": 60, "flush_interval": 60},
+        }
+    )
+    managers = [SQLStorageManager(config=config) for _ in range(2)]
+    for manager in managers:
+        manager.initialize()
+        await manager.start()
+    yield managers
+    for manager in managers:
+        await manager.stop()
+
+
+async def test_changes_reach_other_processes(storage_managers):
+    writer, reader = storage_managers
+    metadata, contents = mock_shared_notebook_content()
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=[COLLABORATORS[0]], roles=[], contents=contents
+    )
+    await writer.add(request_model)
+    await writer.invalidation_bus.flush()
+    await reader.invalidation_bus.poll()
+    await reader.get_serialized(metadata.id)
+    assert len(reader.response_cache) == 1
+
+    request_model.metadata.title = "Updated"
+    request_model.collaborators = [Collaborator(name="dave@example.com")]
+    await writer.update(metadata.id, request_model)
+    await writer.add_group_members(
+        "course", "dave@example.com", [Collaborator(name="erin@example.com")]
+    )
+    assert len(reader.response_cache) == 1
+    await writer.invalidation_bus.flush()
+    await reader.invalidation_bus.poll()
+    assert len(reader.response_cache) == 0
+    assert await reader.group_store.get_groups("erin@example.com") == {"course"}
+    assert b"Updated" in await reader.get_serialized(metadata.id)
+    assert [c.name for c in await reader.search_users("dave")] == ["dave@example.com"]
@@ -0,0 +1,63 @@
+import pytest
+
+from jupyter_publishing_service.limits import LIMIT_BREACHES
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+from jupyter_publishing_service.upload.local import LocalUploadStore
+
+from .mock import COLLABORATORS, mock_notebook, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+HEADERS = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+
+
+@pytest.fixture
+def service_config():
+    return {"max_body_size": 1024, "body_size_limits": {"PATCH /sharing/*": 16}}
+
+
+async def test_declared_body_size_is_rejected_early(start_db, async_client):
+    before = LIMIT_BREACHES.value(limit="body", rule="*")
+    async with async_client as client:
+        resp = await client.post("/sharing", content=b"x" * 2048)
+    assert resp.status_code == 413
+    assert LIMIT_BREACHES.value(limit="body", rule="*") == before + 1
+
+
+async def test_streamed_body_is_rejected(start_db, async_client):
+    async def body():
+        for _ in range(10):
+            yield b"x" * 10
+
+    before = LIMIT_BREACHES.value(limit="body", rule="PATCH /sharing/*")
+    async with async_client as client:
+        resp = await client.patch("/sharing/some-file", content=body(), headers=HEADERS)
+    assert resp.status_code == 413
+    assert LIMIT_BREACHES.value(limit="body", rule="PATCH /sharing/*") == before + 1
+
+
+async def test_uploads_larger_than_the_contents_limit_are_rejected(service, start_db, async_client):
+    service.storage_manager.upload_store.max_contents_size = 100
+    async with async_client as client:
+        resp = await client.post("/sharing/uploads", json={"size": 101}, headers=HEADERS)
+    assert resp.status_code == 413
+
+
+async def test_contents_larger_than_the_limit_are_rejected(service, start_db, async_client):
+    # Below the body size limits, but over the contents limit.
+    service.storage_manager.max_contents_size = 300
+    cell = {"cell_type": "markdown", "metadata": {}, "source": "x" * 300}
+    metadata, contents = mock_shared_notebook_content(content=mock_notebook([cell]))
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=COLLABORATORS[:1], roles=[], contents=contents
+    )
+    before = LIMIT_BREACHES.value(limit="contents", rule="add")
+    async with async_client as client:
+        resp = await client.post("/sharing", content=request_model.model_dump_json())
+        assert resp.status_code == 413
+        assert LIMIT_BREACHES.value(limit="contents", rule="add") == before + 1
+        # Nothing was written.
+        resp = await client.get(f"/sharing/{metadata.id}", headers=HEADERS)
+        assert resp.status_code == 404
+    # Uploads default to the same limit.
+    assert LocalUploadStore(parent=service.storage_manager).max_contents_size == 300
@@ -0,0 +1,73 @@
+import pytest
+
+from jupyter_publishing_service.metrics import (
+    REQUEST_DURATION,
+    STORE_CALL_DURATION,
+    Histogram,
+    MetricsRegistry,
+)
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+
+from .mock import COLLABORATORS, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+
+def test_histogram_exposition():
+    registry = MetricsRegistry()
+    latency = registry.register(
+        Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1))
+    )
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5, route="/a")
+    assert latency.count(route="/a") == 3
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram"]
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 5.55' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+
+async def test_metrics_endpoint(start_db, async_client):
+    route = "/sharing/{file_id}"
+    metadata, contents = mock_shared_notebook_content()
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=[COLLABORATORS[0]], roles=[], contents=contents
+    )
+    headers = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+    requests = REQUEST_DURATION.count(method="GET", route=route, status=200)
+    store_calls = STORE_CALL_DURATION.count(store="metadata_store", method="get")
+    async with async_client as client:
+        resp = await client.post("/sharing", content=request_model.model_dump_json())
+        assert resp.status_code == 200
+        resp = await client.get(f"/sharing/{metadata.id}", headers=headers)
+        assert resp.status_code == 200
+        resp = await client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert REQUEST_DURATION.count(method="GET", route=route, status=200) == requests + 1
+    assert STORE_CALL_DURATION.count(store="metadata_store", method="get") > store_calls
+    assert "# TYPE publishing_http_request_duration_seconds histogram" in resp.text
+    assert "publishing_http_response_size_bytes_bucket{" in resp.text
+    assert "publishing_user_directory_lookups_total{" in resp.text
+
+
+@pytest.mark.parametrize("service_config", [{"metrics_enabled": False}])
+async def test_metrics_can_be_disabled(service, async_client):
+    assert "get" not in vars(service.storage_manager.metadata_store)
+    async with async_client as client:
+        resp = await client.get("/metrics")
+    assert resp.status_code == 404
+
+
+@pytest.mark.parametrize("service_config", [{"metrics_token": "secret"}])
+async def test_metrics_token(async_client):
+    async with async_client as client:
+        assert (await client.get("/metrics")).status_code == 401
+        resp = await client.get("/metrics", headers={"Authorization": "Bearer wrong"})
+        assert resp.status_code == 401
+        resp = await client.get("/metrics", headers={"Authorization": "Bearer secret"})
+        assert resp.status_code == 200
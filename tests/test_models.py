@@ -0,0 +1,26 @@
+import pytest
+from pydantic import ValidationError
+
+from jupyter_publishing_service.models.sql import apply_validated
+
+from .mock import mock_notebook, mock_shared_notebook_content
+
+
+def test_assignments_are_validated():
+    _, contents = mock_shared_notebook_content()
+    with pytest.raises(ValidationError):
+        contents.content = "not a notebook"
+
+
+def test_apply_validated_copies_set_fields_as_they_are():
+    _, current = mock_shared_notebook_content(name="old.ipynb")
+    current.id = "file"
+    notebook = mock_notebook([{"cell_type": "markdown", "metadata": {}, "source": "# Hi"}])
+    _, source = mock_shared_notebook_content(name="new.ipynb", content=notebook)
+    assert apply_validated(current, source) is current
+    assert current.name == current.path == "new.ipynb"
+    # Not copied, nor validated again.
+    assert current.content is source.content
+    # Fields not set on the source are kept.
+    assert "id" not in source.model_fields_set
+    assert current.id == "file"
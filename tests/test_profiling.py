@@ -0,0 +1,37 @@
+import pytest
+
+from jupyter_publishing_service.app import JupyterPublishingService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def service_config(tmp_path):
+    return {"profiling_token": "secret", "profile_dir": str(tmp_path)}
+
+
+async def test_profile_a_request(start_db, async_client, tmp_path):
+    async with async_client as client:
+        resp = await client.get("/", headers={"X-Profile-Token": "wrong"})
+        assert "x-profile-id" not in resp.headers
+        resp = await client.get("/", headers={"X-Profile-Token": "secret"})
+        profile_id = resp.headers["x-profile-id"]
+        # Rate-limited.
+        resp = await client.get("/", headers={"X-Profile-Token": "secret"})
+        assert "x-profile-id" not in resp.headers
+    assert (tmp_path / f"{profile_id}.pstats").exists()
+    assert "cumulative" in (tmp_path / f"{profile_id}.txt").read_text()
+
+
+def test_profiling_is_off_without_a_token():
+    service = JupyterPublishingService()
+    service.init_webapp()
+    assert not any(m.cls.__name__ == "ProfilingMiddleware" for m in service.app.user_middleware)
+
+
+async def test_token_is_only_accepted_in_the_header(start_db, async_client):
+    async with async_client as client:
+        resp = await client.get("/health/live", params={"profile_token": "secret"})
+        assert "x-profile-id" not in resp.headers
+        resp = await client.get("/health/live", headers={"X-Profile-Token": "secret"})
+    assert resp.headers["x-profile-id"].endswith("-GET-health_live")
@@ -0,0 +1,59 @@
+import logging
+
+import pytest
+
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+from jupyter_publishing_service.queries import QueryBudgetExceeded, parameter_shape
+
+from .mock import COLLABORATORS, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+HEADERS = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+
+
+@pytest.fixture
+def service_config():
+    return {
+        "query_budget": 15,
+        # Log every query.
+        "SQLStorageManager": {"slow_query_threshold": 1e-9},
+    }
+
+
+def add_file_request(collaborators=COLLABORATORS[:1]) -> str:
+    metadata, contents = mock_shared_notebook_content()
+    return SharedFileRequestModel(
+        metadata=metadata, collaborators=collaborators, roles=[], contents=contents
+    ).model_dump_json()
+
+
+def test_parameter_shape():
+    assert parameter_shape(("alice", 1)) == ("str", "int")
+    assert parameter_shape({"name": "alice"}) == {"name": "str"}
+    assert parameter_shape([("a",), ("b",)]) == "2 x ('str',)"
+
+
+async def test_server_timing_header(start_db, async_client):
+    async with async_client as client:
+        resp = await client.get("/sharing", headers=HEADERS)
+    assert resp.status_code == 200
+    assert resp.headers["server-timing"].startswith("db;dur=")
+    assert 'queries"' in resp.headers["server-timing"]
+
+
+async def test_query_budget(start_db, async_client):
+    async with async_client as client:
+        resp = await client.post("/sharing", content=add_file_request())
+        assert resp.status_code == 200
+        # Adds each collaborator one by one.
+        with pytest.raises(QueryBudgetExceeded, match="Repeated statements: 3 x SELECT"):
+            await client.post("/sharing", content=add_file_request(COLLABORATORS))
+
+
+async def test_slow_queries_are_logged(start_db, async_client, caplog):
+    with caplog.at_level(logging.WARNING):
+        async with async_client as client:
+            await client.get("/sharing", headers=HEADERS)
+    assert "Slow query" in caplog.text
+    assert "parameters: ('str',)" in caplog.text
@@ -0,0 +1,120 @@
+import anyio
+import pytest
+
+from jupyter_publishing_service.metrics import STORE_CALL_DURATION
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+from jupyter_publishing_service.storage.abc import StorageManagerABC
+from jupyter_publishing_service.storage.cache import ResponseCache
+
+from .mock import COLLABORATORS, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+HEADERS = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+
+
+async def test_concurrent_misses_share_one_load():
+    cache = ResponseCache(max_size=100)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await anyio.sleep(0.01)
+        return b"data"
+
+    results = []
+
+    async def get():
+        results.append(await cache.get(("file",), load))
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(10):
+            tg.start_soon(get)
+    assert results == [b"data"] * 10 and len(loads) == 1
+    assert await cache.get(("file",), load) == b"data" and len(loads) == 1
+
+
+async def test_eviction_by_size():
+    cache = ResponseCache(max_size=40)
+
+    async def load():
+        return b"x" * 10
+
+    for i in range(5):
+        await cache.get((f"file{i}",), load)
+    assert cache.size == 40 and ("file0",) not in cache
+    await cache.get(("file1",), load)
+    await cache.get(("file5",), load)
+    # file1 was used recently, so file2 was evicted instead.
+    assert ("file1",) in cache and ("file2",) not in cache
+
+    async def load_large():
+        return b"x" * 11
+
+    # Larger than a quarter of the cache.
+    await cache.get(("large",), load_large)
+    assert ("large",) not in cache and cache.size == 40
+
+
+async def test_invalidation_during_a_load_is_not_cached():
+    cache = ResponseCache(max_size=100)
+
+    async def load():
+        cache.invalidate("file")
+        return b"old"
+
+    assert await cache.get(("file", True), load) == b"old"
+    assert ("file", True) not in cache
+
+
+async def test_get_is_cached_until_the_file_changes(start_db, async_client):
+    metadata, contents = mock_shared_notebook_content()
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=[COLLABORATORS[0]], roles=[], contents=contents
+    )
+    url = f"/sharing/{metadata.id}"
+    params = {"contents": True, "collaborators": True}
+    loads = STORE_CALL_DURATION.count(store="file_store", method="get")
+    async with async_client as client:
+        await client.post("/sharing", content=request_model.model_dump_json())
+        for _ in range(3):
+            resp = await client.get(url, params=params, headers=HEADERS)
+            assert resp.status_code == 200
+        assert STORE_CALL_DURATION.count(store="file_store", method="get") == loads + 1
+
+        request_model.metadata.title = "Updated"
+        resp = await client.patch(url, content=request_model.model_dump_json(), headers=HEADERS)
+        resp = await client.get(url, params=params, headers=HEADERS)
+        assert resp.json()["metadata"]["title"] == "Updated"
+        assert resp.json()["collaborator_roles"][0]["name"] == COLLABORATORS[0].name
+
+        await client.delete(url, headers=HEADERS)
+        resp = await client.get(url, params=params, headers=HEADERS)
+        assert resp.status_code == 404
+
+
+class WithoutGetSerialized:
+    """A manager registered as a virtual subclass, without `get_serialized`."""
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getattr__(self, name):
+        if name == "get_serialized":
+            raise AttributeError(name)
+        return getattr(self._manager, name)
+
+
+StorageManagerABC.register(WithoutGetSerialized)
+
+
+async def test_get_serialized_is_optional(service, start_db, async_client):
+    service.storage_manager = WithoutGetSerialized(service.storage_manager)
+    metadata, contents = mock_shared_notebook_content()
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=[COLLABORATORS[0]], roles=[], contents=contents
+    )
+    async with async_client as client:
+        await client.post("/sharing", content=request_model.model_dump_json())
+        resp = await client.get(f"/sharing/{metadata.id}", headers=HEADERS)
+    assert resp.json()["metadata"]["id"] == metadata.id
@@ -0,0 +1,60 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from jupyter_publishing_service.models.rest import (
+    ChangeKind,
+    FileChangeModel,
+    SharedFileRequestModel,
+    SharedFileResponseModel,
+)
+from jupyter_publishing_service.models.sql import Collaborator, CollaboratorRole
+from jupyter_publishing_service.responses import FastJSONResponse
+from jupyter_publishing_service.serialization import dumps
+
+from .mock import COLLABORATORS, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+HEADERS = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+
+
+def test_dumps_matches_jsonable_encoder():
+    metadata, contents = mock_shared_notebook_content()
+    response = SharedFileResponseModel(
+        metadata=metadata,
+        contents=contents,
+        collaborator_roles=[CollaboratorRole(name="alice@example.com", file=metadata.id)],
+    )
+    change = FileChangeModel(
+        cursor=1, file_id=metadata.id, kind=ChangeKind.created, created=datetime(2024, 1, 2, 3, 4)
+    )
+    for content in (
+        response,
+        [response, response],
+        [Collaborator(name="alice@example.com")],
+        change,
+        {"index": 1, "checksum": "abc", "kind": ChangeKind.shared, "at": datetime(2024, 1, 2)},
+    ):
+        assert json.loads(dumps(content)) == jsonable_encoder(content)
+
+
+def test_response_class():
+    response = FastJSONResponse({"a": [1, 2]})
+    assert response.body == b'{"a":[1,2]}'
+    assert response.headers["content-type"] == "application/json"
+
+
+async def test_routes_serialize_models(start_db, async_client):
+    metadata, contents = mock_shared_notebook_content()
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=COLLABORATORS[:1], roles=[], contents=contents
+    )
+    async with async_client as client:
+        resp = await client.post("/sharing", content=request_model.model_dump_json())
+        assert resp.json()["metadata"]["created"] == metadata.created.isoformat()
+        resp = await client.get(f"/sharing/{metadata.id}/versions", headers=HEADERS)
+        assert resp.headers["content-type"] == "application/json"
+        assert [version["version"] for version in resp.json()] == [1]
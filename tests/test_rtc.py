@@ -0,0 +1,249 @@
+import asyncio
+import json
+import time
+
+import pytest
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+from jupyter_publishing_service.rtc.patch import PatchError, apply_patch
+from jupyter_publishing_service.rtc.room import RTC_SAVES
+
+from .mock import COLLABORATORS, mock_notebook, mock_shared_notebook_content
+
+HEADERS = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+
+CELL = {"id": "a", "cell_type": "markdown", "source": "# Title", "metadata": {}}
+
+
+def test_apply_patch_is_all_or_nothing():
+    document = {"cells": [CELL], "metadata": {}}
+    apply_patch(
+        document,
+        [
+            {"op": "replace", "path": "/cells/0/source", "value": "# New title"},
+            {"op": "add", "path": "/cells/-", "value": {"id": "b"}},
+            {"op": "add", "path": "/metadata/a~1b", "value": 1},
+        ],
+    )
+    assert document["cells"][0]["source"] == "# New title"
+    assert document["cells"][1] == {"id": "b"}
+    assert document["metadata"] == {"a/b": 1}
+
+    with pytest.raises(PatchError):
+        apply_patch(
+            document,
+            [
+                {"op": "remove", "path": "/cells/1"},
+                {"op": "replace", "path": "/cells/0/source", "value": "Lost"},
+                {"op": "remove", "path": "/cells/5"},
+            ],
+        )
+    assert len(document["cells"]) == 2
+    assert document["cells"][0]["source"] == "# New title"
+
+
+@pytest.fixture
+def test_client(service):
+    service.room_manager.save_interval = 60
+    with TestClient(service.app) as client:
+        yield client
+
+
+def share_request(source: str) -> SharedFileRequestModel:
+    metadata, contents = mock_shared_notebook_content(
+        content=mock_notebook([{**CELL, "source": source}])
+    )
+    return SharedFileRequestModel(
+        metadata=metadata, collaborators=COLLABORATORS, roles=[], contents=contents
+    )
+
+
+@pytest.fixture
+def file_id(test_client):
+    request_model = share_request("# Title")
+    test_client.post("/sharing", content=request_model.model_dump_json())
+    return request_model.metadata.id
+
+
+def get_source(test_client, file_id: str) -> str:
+    resp = test_client.get(f"/sharing/{file_id}", params={"contents": True}, headers=HEADERS)
+    return resp.json()["contents"]["content"]["cells"][0]["source"]
+
+
+def test_updates_are_shared_and_saved(test_client, file_id):
+    url = f"/sharing/{file_id}/rtc"
+    saves = RTC_SAVES.value()
+    update = {"op": "replace", "path": "/cells/0/source", "value": "# Edited"}
+    with test_client.websocket_connect(url, headers=HEADERS) as alice:
+        state = alice.receive_json()
+        assert state["revision"] == 0 and state["writable"]
+        assert state["content"]["cells"][0]["source"] == "# Title"
+        with test_client.websocket_connect(f"{url}?token={COLLABORATORS[1].name}") as bob:
+            assert bob.receive_json()["type"] == "state"
+            alice.send_json({"type": "update", "id": 1, "ops": [update]})
+            assert alice.receive_json() == {"type": "ack", "revision": 1, "id": 1}
+            assert bob.receive_json() == {
+                "type": "update",
+                "revision": 1,
+                "ops": [update],
+                "user": COLLABORATORS[0].name,
+            }
+            bob.send_json({"type": "update", "id": 2, "ops": [{"op": "remove", "path": "/x"}]})
+            assert bob.receive_json()["type"] == "error"
+            # Not a notebook any more: rejected, and undone.
+            invalid = [update, {"op": "replace", "path": "/cells", "value": "cells"}]
+            bob.send_json({"type": "update", "id": 3, "ops": invalid})
+            assert bob.receive_json() == {
+                "type": "error",
+                "detail": "A notebook's cells must be a list.",
+                "id": 3,
+            }
+        # Not saved on every update.
+        versions = test_client.get(f"/sharing/{file_id}/versions", headers=HEADERS).json()
+        assert len(versions) == 1
+    # Saved (in the background) when the last collaborator leaves.
+    for _ in range(100):
+        if RTC_SAVES.value() > saves:
+            break
+        time.sleep(0.01)
+    assert get_source(test_client, file_id) == "# Edited"
+
+
+def test_changes_outside_the_room_are_sent(test_client, file_id):
+    with test_client.websocket_connect(f"/sharing/{file_id}/rtc", headers=HEADERS) as alice:
+        alice.receive_json()
+        request_model = share_request("# Patched")
+        request_model.metadata.id = file_id
+        resp = test_client.patch(
+            f"/sharing/{file_id}", content=request_model.model_dump_json(), headers=HEADERS
+        )
+        assert resp.status_code == 200
+        state = alice.receive_json()
+        assert state["revision"] == 1
+        assert state["content"]["cells"][0]["source"] == "# Patched"
+
+
+def test_unauthenticated_connections_are_refused(test_client, file_id):
+    with pytest.raises(WebSocketDisconnect) as e:
+        with test_client.websocket_connect(f"/sharing/{file_id}/rtc"):
+            pass
+    assert e.value.code == 1008
+
+
+async def open_edited_room(service, source: str):
+    # Fresh models, as a request would bring.
+    request_model = SharedFileRequestModel.model_validate_json(
+        share_request("# Title").model_dump_json()
+    )
+    await service.storage_manager.add(request_model)
+    rooms = service.room_manager
+    room = await rooms.get_room(request_model.metadata.id)
+    connection = rooms.join(room, COLLABORATORS[0].name, writable=True)
+    update = {"op": "replace", "path": "/cells/0/source", "value": source}
+    room.receive(connection, json.dumps({"type": "update", "ops": [update]}))
+    return rooms, room, connection
+
+
+def saved_source(service, room) -> str:
+    async def get():
+        response = await service.storage_manager.get(room.file_id, contents=True)
+        return response.contents.content["cells"][0]["source"]
+
+    return get()
+
+
+@pytest.mark.anyio
+async def test_reconnecting_to_a_closing_room_rejoins_it(service, start_db, monkeypatch):
+    rooms, room, connection = await open_edited_room(service, "# Edited")
+    update_contents = service.storage_manager.update_contents
+    saved = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_update_contents(*args):
+        await release.wait()
+        response = await update_contents(*args)
+        saved.set()
+        return response
+
+    monkeypatch.setattr(service.storage_manager, "update_contents", slow_update_contents)
+    rooms.leave(room, connection)
+    await asyncio.sleep(0)
+    # Still being saved: the collaborator gets the same room back, edits included.
+    assert await rooms.get_room(room.file_id) is room
+    connection = rooms.join(room, COLLABORATORS[0].name, writable=True)
+    release.set()
+    await asyncio.wait_for(saved.wait(), 5)
+    await asyncio.sleep(0)
+    assert await rooms.get_room(room.file_id) is room
+    assert await saved_source(service, room) == "# Edited"
+    rooms.leave(room, connection)
+    await asyncio.wait_for(asyncio.gather(*rooms._tasks), 5)
+    assert room.file_id not in rooms._rooms
+
+
+@pytest.mark.anyio
+async def test_failed_saves_of_a_closing_room_are_retried(service, start_db, monkeypatch):
+    service.room_manager.save_interval = 0.01
+    rooms, room, connection = await open_edited_room(service, "# Edited")
+    update_contents = service.storage_manager.update_contents
+    attempts = []
+
+    async def flaky_update_contents(*args):
+        attempts.append(args)
+        if len(attempts) < 3:
+            raise ConnectionError("The database is down.")
+        return await update_contents(*args)
+
+    monkeypatch.setattr(service.storage_manager, "update_contents", flaky_update_contents)
+    rooms.leave(room, connection)
+    # Open until saved.
+    assert await rooms.get_room(room.file_id) is room
+    await asyncio.wait_for(asyncio.gather(*rooms._tasks), 5)
+    assert len(attempts) == 3
+    assert room.file_id not in rooms._rooms
+    assert await saved_source(service, room) == "# Edited"
+
+
+@pytest.mark.anyio
+async def test_saves_that_keep_failing_are_given_up(service, start_db, monkeypatch):
+    service.room_manager.save_interval = 0.01
+    service.room_manager.max_save_failures = 3
+    rooms, room, connection = await open_edited_room(service, "# Edited")
+    attempts = []
+
+    async def failing_update_contents(*args):
+        attempts.append(args)
+        raise ValueError("Can't be saved.")
+
+    monkeypatch.setattr(service.storage_manager, "update_contents", failing_update_contents)
+    rooms.leave(room, connection)
+    await asyncio.wait_for(asyncio.gather(*rooms._tasks), 5)
+    assert len(attempts) == 3
+    assert room.file_id not in rooms._rooms
+
+
+@pytest.mark.anyio
+async def test_changes_made_while_saving_are_reloaded(service, start_db, monkeypatch):
+    rooms, room, connection = await open_edited_room(service, "# Edited")
+    update_contents = service.storage_manager.update_contents
+    patched = share_request("# Patched")
+    patched.metadata.id = room.file_id
+
+    async def update_contents_and_patch(*args):
+        response = await update_contents(*args)
+        # Someone else updates the file while the room is saving.
+        request_model = SharedFileRequestModel.model_validate_json(patched.model_dump_json())
+        await service.storage_manager.update(room.file_id, request_model)
+        return response
+
+    monkeypatch.setattr(service.storage_manager, "update_contents", update_contents_and_patch)
+    await room.save()
+    await asyncio.wait_for(asyncio.gather(*rooms._tasks), 5)
+    assert room.contents.content["cells"][0]["source"] == "# Patched"
+    messages = []
+    while not connection.queue.empty():
+        messages.append(json.loads(connection.queue.get_nowait()))
+    assert messages[-1]["type"] == "state"
+    assert messages[-1]["content"]["cells"][0]["source"] == "# Patched"
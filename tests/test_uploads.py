@@ -0,0 +1,97 @@
+import hashlib
+
+import pytest
+
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+
+from .mock import COLLABORATORS, mock_notebook, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+HEADERS = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+
+
+@pytest.fixture
+def upload_dir(service, tmp_path):
+    service.storage_manager.upload_store.upload_dir = str(tmp_path)
+    return tmp_path
+
+
+def checksum(chunk: bytes) -> dict:
+    return dict(HEADERS, **{"X-Checksum-SHA256": hashlib.sha256(chunk).hexdigest()})
+
+
+async def test_chunked_upload(start_db, upload_dir, async_client):
+    metadata, contents = mock_shared_notebook_content()
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=[COLLABORATORS[0]], roles=[]
+    )
+    cells = [{"cell_type": "markdown", "metadata": {}, "source": "x" * 100}] * 20
+    contents.content = mock_notebook(cells=cells)
+    data = contents.model_dump_json().encode()
+    chunk_size = len(data) // 3 + 1
+    chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    async with async_client as client:
+        resp = await client.post("/sharing", content=request_model.model_dump_json())
+        assert resp.status_code == 200
+
+        resp = await client.post(
+            "/sharing/uploads",
+            json={"size": len(data), "chunk_size": chunk_size},
+            headers=HEADERS,
+        )
+        upload_id = resp.json()["id"]
+        url = f"/sharing/uploads/{upload_id}"
+
+        # A corrupted chunk is rejected.
+        resp = await client.put(f"{url}/chunks/0", content=b"oops", headers=checksum(chunks[0]))
+        assert resp.status_code == 400
+
+        for index in (2, 0):
+            resp = await client.put(
+                f"{url}/chunks/{index}", content=chunks[index], headers=checksum(chunks[index])
+            )
+            assert resp.status_code == 200
+
+        # Committing before all chunks arrived fails.
+        resp = await client.post(f"{url}/commit", json={"file_id": metadata.id}, headers=HEADERS)
+        assert resp.status_code == 400
+
+        # Resume: the service reports which chunks it has.
+        resp = await client.get(url, headers=HEADERS)
+        assert sorted(resp.json()["chunks"]) == ["0", "2"]
+        resp = await client.put(f"{url}/chunks/1", content=chunks[1], headers=checksum(chunks[1]))
+        assert resp.status_code == 200
+
+        resp = await client.post(f"{url}/commit", json={"file_id": metadata.id}, headers=HEADERS)
+        assert resp.status_code == 200
+        assert resp.json()["metadata"]["version"] == 1
+
+        resp = await client.get(f"/sharing/{metadata.id}?contents=1", headers=HEADERS)
+        assert resp.json()["contents"]["content"] == contents.content
+        assert not list(upload_dir.iterdir())
+
+
+async def test_uploads_belong_to_their_owner(start_db, upload_dir, async_client):
+    async with async_client as client:
+        resp = await client.post("/sharing/uploads", json={}, headers=HEADERS)
+        upload_id = resp.json()["id"]
+        other = {"Authorization": f"Bearer {COLLABORATORS[1].name}"}
+        resp = await client.get(f"/sharing/uploads/{upload_id}", headers=other)
+        assert resp.status_code == 404
+
+
+async def test_commit_is_bounded_by_the_contents_limit(service, start_db, upload_dir, async_client):
+    # Even when the upload store doesn't enforce the limit itself.
+    service.storage_manager.upload_store.max_contents_size = 0
+    service.storage_manager.max_contents_size = 100
+    chunk = b"x" * 64
+    async with async_client as client:
+        resp = await client.post("/sharing/uploads", json={"chunk_size": 64}, headers=HEADERS)
+        url = f"/sharing/uploads/{resp.json()['id']}"
+        for index in range(2):
+            resp = await client.put(f"{url}/chunks/{index}", content=chunk, headers=checksum(chunk))
+            assert resp.status_code == 200
+        resp = await client.post(f"{url}/commit", json={"file_id": "file"}, headers=HEADERS)
+        assert resp.status_code == 413
@@ -0,0 +1,111 @@
+import pytest
+
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+from jupyter_publishing_service.models.sql import Collaborator
+from jupyter_publishing_service.user.abc import UserStoreABC
+from jupyter_publishing_service.user.index import PrefixIndex, TrigramIndex
+from jupyter_publishing_service.user.sql import DIRECTORY_LOOKUPS, DIRECTORY_SIZE
+
+from .mock import COLLABORATORS, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+HEADERS = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+
+
+def test_prefix_index():
+    index = PrefixIndex(["bob", "Bea", "alice", "bert"])
+    assert index.search("b") == ["bert", "bob"]
+    assert index.search("b", limit=1) == ["bert"]
+    assert index.search("B", case_sensitive=False) == ["Bea", "bert", "bob"]
+    assert index.add("barbara")
+    assert not index.add("barbara")
+    assert index.search("ba") == ["barbara"]
+    assert index.search("z") == []
+
+
+def test_trigram_index():
+    index = TrigramIndex(["john.smith@example.com", "jane.smyth@example.com", "alice@example.com"])
+    assert index.search("smith") == ["john.smith@example.com", "jane.smyth@example.com"]
+    assert index.search("smith", limit=1) == ["john.smith@example.com"]
+    assert index.add("smithers@example.com")
+    assert not index.add("smithers@example.com")
+    # Names starting with the query rank first.
+    assert index.search("smith")[0] == "smithers@example.com"
+    assert index.search("zzz") == []
+
+
+async def test_search_users(start_db, async_client):
+    metadata, _ = mock_shared_notebook_content()
+    request_model = SharedFileRequestModel(metadata=metadata, collaborators=COLLABORATORS, roles=[])
+    async with async_client as client:
+        resp = await client.post("/sharing", content=request_model.model_dump_json())
+        assert resp.status_code == 200
+
+        resp = await client.get("/sharing/users", params={"substring": "b"}, headers=HEADERS)
+        assert resp.json() == [{"name": "bob@example.com"}]
+
+        resp = await client.get(
+            "/sharing/users",
+            params={"substring": "CAR", "case_sensitive": False},
+            headers=HEADERS,
+        )
+        assert resp.json() == [{"name": "carol@example.com"}]
+
+        resp = await client.get("/sharing/users", params={"limit": 2}, headers=HEADERS)
+        assert len(resp.json()) == 2
+
+        resp = await client.get(
+            "/sharing/users", params={"substring": "karol", "ranking": "fuzzy"}, headers=HEADERS
+        )
+        assert resp.json() == [{"name": "carol@example.com"}]
+
+        # Queries too short for trigrams fall back to a case-insensitive prefix search.
+        resp = await client.get(
+            "/sharing/users", params={"substring": "B", "ranking": "fuzzy"}, headers=HEADERS
+        )
+        assert resp.json() == [{"name": "bob@example.com"}]
+
+
+async def test_index_is_updated_by_new_collaborators(service, start_db):
+    storage_manager = service.storage_manager
+    assert await storage_manager.search_users("dave") == []
+    metadata, _ = mock_shared_notebook_content()
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=[Collaborator(name="dave@example.com")], roles=[]
+    )
+    await storage_manager.add(request_model)
+    assert await storage_manager.search_users("dave") == [Collaborator(name="dave@example.com")]
+
+
+async def test_directory_is_warmed_and_refreshed(service, start_db):
+    user_store = service.storage_manager.user_store
+    hits = DIRECTORY_LOOKUPS.value(result="hit")
+    assert await user_store.search_users("") == []
+    assert DIRECTORY_LOOKUPS.value(result="hit") == hits + 1
+
+    # Written by another service instance.
+    async with service.storage_manager.get_session() as session:
+        session.add(Collaborator(name="erin@example.com"))
+        await session.commit()
+    assert await user_store.search_users("erin") == []
+
+    # An expired directory is still used while it is refreshed in the background.
+    user_store.refresh_interval = 1
+    user_store._loaded_at -= 2
+    assert await user_store.search_users("erin") == []
+    await user_store._refresh_task
+    assert await user_store.search_users("erin") == [Collaborator(name="erin@example.com")]
+    assert DIRECTORY_SIZE.value() > 0
+
+
+class VirtualUserStore:
+    """A store registered as a virtual subclass, without the optional `start`."""
+
+
+UserStoreABC.register(VirtualUserStore)
+
+
+async def test_user_store_start_is_optional(service):
+    service.storage_manager.user_store = VirtualUserStore()
+    await service.storage_manager.start()
@@ -0,0 +1,108 @@
+import pytest
+
+from jupyter_publishing_service.models.rest import SharedFileRequestModel
+from jupyter_publishing_service.models.sql import FileVersion
+from jupyter_publishing_service.version.delta import apply_delta, make_delta
+
+from .mock import COLLABORATORS, mock_notebook, mock_shared_notebook_content
+
+pytestmark = pytest.mark.anyio
+
+HEADERS = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+
+
+def notebook(i):
+    cells = [{"cell_type": "markdown", "metadata": {}, "source": f"cell {n}"} for n in range(50)]
+    cells[i % 50]["source"] = f"edited in version {i}"
+    return mock_notebook(cells=cells)
+
+
+def test_delta_roundtrip():
+    base = ["a", "b", "c", "d"]
+    target = ["a", "x", "c", "d", "e"]
+    assert apply_delta(base, make_delta(base, target)) == target
+
+
+async def test_update_records_versions(start_db, async_client):
+    metadata, contents = mock_shared_notebook_content(content=notebook(0))
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=[COLLABORATORS[0]], roles=[], contents=contents
+    )
+    url = f"/sharing/{metadata.id}"
+    async with async_client as client:
+        resp = await client.post("/sharing", content=request_model.model_dump_json())
+        assert resp.json()["metadata"]["version"] == 1
+        for i in range(1, 4):
+            request_model.contents.content = notebook(i)
+            resp = await client.patch(url, content=request_model.model_dump_json(), headers=HEADERS)
+            assert resp.json()["metadata"]["version"] == i + 1
+
+        resp = await client.get(f"{url}/versions", headers=HEADERS)
+        assert [v["version"] for v in resp.json()] == [4, 3, 2, 1]
+        for i in range(4):
+            resp = await client.get(f"{url}/versions/{i + 1}", headers=HEADERS)
+            assert resp.json()["content"] == notebook(i)
+        resp = await client.get(f"{url}/versions/5", headers=HEADERS)
+        assert resp.status_code == 404
+
+
+async def test_metadata_updates_keep_the_version(start_db, async_client):
+    metadata, contents = mock_shared_notebook_content(content=notebook(0))
+    request_model = SharedFileRequestModel(
+        metadata=metadata, collaborators=[COLLABORATORS[0]], roles=[], contents=contents
+    )
+    url = f"/sharing/{metadata.id}"
+    async with async_client as client:
+        await client.post("/sharing", content=request_model.model_dump_json())
+        request_model.contents = None
+        request_model.metadata.title = "Renamed"
+        for version in (7, 0):
+            request_model.metadata.version = version
+            resp = await client.patch(url, content=request_model.model_dump_json(), headers=HEADERS)
+            assert resp.status_code == 200
+            assert resp.json()["metadata"]["version"] == 1
+        resp = await client.get(url, headers=HEADERS)
+        assert resp.json()["metadata"]["title"] == "Renamed"
+        assert resp.json()["metadata"]["version"] == 1
+
+
+async def test_versions_are_compacted(service, start_db):
+    storage_manager = service.storage_manager
+    storage_manager.version_store.keyframe_interval = 4
+    storage_manager.version_store.max_versions = 3
+    _, contents = mock_shared_notebook_content()
+    for i in range(6):
+        contents.content = notebook(i)
+        await storage_manager.version_store.add("file", contents)
+
+    versions = await storage_manager.list_versions("file")
+    assert [v.version for v in versions] == [6, 5, 4]
+    for i in range(3, 6):
+        file = await storage_manager.get_version("file", i + 1)
+        assert file.content == notebook(i)
+    async with storage_manager.get_session() as session:
+        rows = (await session.exec(FileVersion.__table__.select())).all()
+    assert sum(row.keyframe for row in rows) == 1
+
+
+async def test_a_version_taken_concurrently_is_retried(service, start_db):
+    version_store = service.storage_manager.version_store
+    _, contents = mock_shared_notebook_content()
+    for i in range(2):
+        contents.content = notebook(i)
+        await version_store.add("file", contents)
+    get_keyframe = version_store._get_keyframe
+
+    async def get_keyframe_while_another_writer_adds(session, file_id, version):
+        # Between reading the latest version and adding the next one.
+        version_store._get_keyframe = get_keyframe
+        await version_store.add(file_id, contents)
+        return await get_keyframe(session, file_id, version)
+
+    version_store._get_keyframe = get_keyframe_while_another_writer_adds
+    contents.content = notebook(2)
+    assert await version_store.add("file", contents) == 4
+    versions = await version_store.list("file")
+    assert [v.version for v in versions] == [4, 3, 2, 1]
+    file = await version_store.get("file", 4)
+    assert file.content == notebook(2)
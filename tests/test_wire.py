@@ -0,0 +1,110 @@
+import pytest
+from httpx import ASGITransport
+
+from jupyter_publishing_service.client import simple
+from jupyter_publishing_service.client.simple import SimpleAsyncClient
+from jupyter_publishing_service.models.rest import (
+    SharedFileRequestModel,
+    SharedFileResponseModel,
+)
+from jupyter_publishing_service.models.sql import CollaboratorRole
+from jupyter_publishing_service.serialization import (
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    encode,
+)
+
+from .mock import COLLABORATORS, mock_notebook, mock_shared_notebook_content
+
+msgpack = pytest.importorskip("msgpack")
+
+pytestmark = pytest.mark.anyio
+
+HEADERS = {"Authorization": f"Bearer {COLLABORATORS[0].name}"}
+MSGPACK_HEADERS = {**HEADERS, "Accept": MSGPACK_MEDIA_TYPE}
+
+
+def notebook_request() -> SharedFileRequestModel:
+    cell = {
+        "cell_type": "code",
+        "execution_count": 1,
+        "metadata": {"tags": ["x"]},
+        "source": "print('héllo')",
+        "outputs": [{"output_type": "stream", "name": "stdout", "text": "héllo\n"}],
+    }
+    metadata, contents = mock_shared_notebook_content(content=mock_notebook([cell]))
+    return SharedFileRequestModel(
+        metadata=metadata, collaborators=COLLABORATORS[:1], roles=[], contents=contents
+    )
+
+
+def test_formats_round_trip_to_the_same_model():
+    request = notebook_request()
+    response = SharedFileResponseModel(
+        metadata=request.metadata,
+        contents=request.contents,
+        collaborator_roles=[CollaboratorRole(name="alice@example.com", file=request.metadata.id)],
+    )
+    from_json = SharedFileResponseModel.model_validate_json(encode(response, JSON_MEDIA_TYPE))
+    from_msgpack = SharedFileResponseModel.model_validate(
+        msgpack.unpackb(encode(response, MSGPACK_MEDIA_TYPE))
+    )
+    assert from_msgpack == from_json
+
+
+async def test_routes_negotiate_the_format(start_db, async_client):
+    request = notebook_request()
+    file_id = request.metadata.id
+    async with async_client as client:
+        resp = await client.post(
+            "/sharing",
+            content=msgpack.packb(request.model_dump(mode="json")),
+            headers={"Content-Type": MSGPACK_MEDIA_TYPE, "Accept": MSGPACK_MEDIA_TYPE},
+        )
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == MSGPACK_MEDIA_TYPE
+        assert msgpack.unpackb(resp.content)["metadata"]["id"] == file_id
+
+        url = f"/sharing/{file_id}?contents=1"
+        as_json = await client.get(url, headers=HEADERS)
+        as_msgpack = await client.get(url, headers=MSGPACK_HEADERS)
+        assert as_json.headers["content-type"] == JSON_MEDIA_TYPE
+        assert as_msgpack.headers["content-type"] == MSGPACK_MEDIA_TYPE
+        assert as_msgpack.headers["vary"] == "Accept"
+        assert msgpack.unpackb(as_msgpack.content) == as_json.json()
+        assert len(as_msgpack.content) < len(as_json.content)
+
+        resp = await client.post(
+            "/sharing",
+            content=b"\xc1",
+            headers={"Content-Type": MSGPACK_MEDIA_TYPE},
+        )
+        assert resp.status_code == 400
+
+
+async def test_client_wire_format(app, start_db):
+    request = notebook_request()
+    client = SimpleAsyncClient(
+        service_url="http://test",
+        api_token=COLLABORATORS[0].name,
+        transport=ASGITransport(app=app),
+        wire_format="msgpack",
+    )
+    async with client:
+        added = await client.add_file(request)
+        file = await client.get_file(request.metadata.id, contents=True)
+        assert file.contents.content == request.contents.content
+        request.contents.content["cells"][0]["source"] = "print('bye')"
+        updated = await client.update_file(request)
+        assert updated.metadata.version == added.metadata.version + 1
+        [listed] = await client.list_files()
+        assert listed.metadata.id == request.metadata.id
+        version = await client.get_version(request.metadata.id, 1)
+        assert version.content["cells"][0]["source"] == "print('héllo')"
+
+
+def test_client_wire_format_requires_msgpack(monkeypatch):
+    monkeypatch.setattr(simple, "msgpack", None)
+    with pytest.raises(ImportError, match="requires msgpack"):
+        SimpleAsyncClient(wire_format="msgpack")
+    assert SimpleAsyncClient(wire_format="JSON").wire_format == "json"